@@ -0,0 +1,242 @@
+#analytics.py - Batch analytics over the transcripts directory
+#
+# Parses the transcripts in a process pool into a compact columnar store (NumPy arrays in one
+# .npz file): per interview its username, UID, model, start/end time, duration and number of
+# responses, per turn its role and length, and per interviewer turn how closely it matches each
+# question of config.MAIN_QUESTIONS and each probe of config.FOLLOW_UP_PROBES. Updates are
+# incremental: only transcripts that are new or whose mtime/size changed since the last run are
+# parsed. Construct coverage across the whole corpus is then a few array operations.
+#
+#   python analytics.py [--directory ../data/transcripts/] [--workers 8] [--threshold 0.6]
+
+import argparse
+import hashlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+import config
+from journal import atomic_write, read_transcript
+from planner import WORD, coverage_items, match_score, question_keywords
+from streaming import stored_closing_code
+
+ROLES = ("assistant", "user")
+
+# Interview-level columns; turn-level columns are "turn_*" and "scores"
+INTERVIEW_COLUMNS = ("transcript", "mtime", "size", "username", "uid", "api", "model", "closing_code",
+                     "start", "end", "duration", "n_responses", "n_turns", "turn_offset")
+
+
+def items_key(items):
+    """Fingerprint of the coverage items; stored scores are recomputed when it changes."""
+    return hashlib.sha256(repr(items).encode()).hexdigest()[:16]
+
+
+_keywords = None
+
+
+def _item_keywords():
+    global _keywords
+    if _keywords is None:
+        _keywords = [question_keywords(text) for _, _, text in coverage_items()]
+    return _keywords
+
+
+def _parse_time(value):
+    # "2024-10-16 18:11:17 CDT": all times are Central Time, so the zone name is dropped
+    try:
+        return datetime.strptime(value.rsplit(" ", 1)[0], "%Y-%m-%d %H:%M:%S").timestamp()
+    except (AttributeError, ValueError):
+        return np.nan
+
+
+def parse_transcript(path):
+    """Header fields, turns and question match scores of one transcript (runs in a worker)."""
+    fields, messages = read_transcript(path)
+    turns = [(m["role"], m["content"]) for m in messages]
+    # The initial "Hi" sent to Anthropic models is not a response
+    if fields.get("API") == "anthropic" and turns and turns[0] == ("user", "Hi"):
+        turns = turns[1:]
+
+    closing_code = ""
+    if turns and turns[-1][0] == "assistant":
+        closing_code = stored_closing_code(turns[-1][1]) or ""
+
+    keywords = _item_keywords()
+    scores = np.zeros((len(turns), len(keywords)), dtype=np.float16)
+    for i, (role, content) in enumerate(turns):
+        if role == "assistant":
+            words = set(WORD.findall(content.lower()))
+            scores[i] = [match_score(k, words) for k in keywords]
+
+    start, end = _parse_time(fields.get("Start Time (CT)")), _parse_time(fields.get("End Time (CT)"))
+    stat = os.stat(path)
+    return {
+        "transcript": os.path.basename(path),
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "username": fields.get("Username", ""),
+        "uid": fields.get("UID", "None"),
+        "api": fields.get("API", ""),
+        "model": fields.get("Model", ""),
+        "closing_code": closing_code,
+        "start": start,
+        "end": end,
+        "duration": end - start,
+        "n_responses": sum(role == "user" for role, _ in turns),
+        "n_turns": len(turns),
+        "turn_role": np.array([ROLES.index(role) for role, _ in turns], dtype=np.int8),
+        "turn_chars": np.array([len(content) for _, content in turns], dtype=np.int32),
+        "turn_words": np.array([len(content.split()) for _, content in turns], dtype=np.int32),
+        "scores": scores,
+    }
+
+
+class TranscriptStore:
+    """Columnar store of parsed transcripts, kept in one compressed .npz file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.columns = self._load()
+
+    def _load(self):
+        items = coverage_items()
+        if os.path.exists(self.path):
+            with np.load(self.path, allow_pickle=False) as data:
+                columns = {name: data[name] for name in data.files}
+            if str(columns.get("items_key")) == items_key(items):
+                return columns
+        return self._empty(items)
+
+    @staticmethod
+    def _empty(items):
+        columns = {name: np.array([], dtype=dtype) for name, dtype in [
+            ("transcript", "U"), ("mtime", np.float64), ("size", np.int64), ("username", "U"), ("uid", "U"),
+            ("api", "U"), ("model", "U"), ("closing_code", "U"), ("start", np.float64), ("end", np.float64),
+            ("duration", np.float32), ("n_responses", np.int16), ("n_turns", np.int32), ("turn_offset", np.int64),
+            ("turn_interview", np.int32), ("turn_role", np.int8), ("turn_chars", np.int32), ("turn_words", np.int32),
+        ]}
+        columns["scores"] = np.zeros((0, len(items)), dtype=np.float16)
+        columns["item_construct"] = np.array([construct for construct, _, _ in items])
+        columns["item_kind"] = np.array([kind for _, kind, _ in items])
+        columns["items_key"] = np.array(items_key(items))
+        return columns
+
+    def __len__(self):
+        return len(self.columns["transcript"])
+
+    def update(self, directory, workers=None):
+        """Parse the new and changed transcripts of `directory`; returns (parsed, removed)."""
+        current = {entry.name: (entry.stat().st_mtime, entry.stat().st_size)
+                   for entry in os.scandir(directory) if entry.name.endswith(".txt")}
+        c = self.columns
+        known = {name: (mtime, size) for name, mtime, size in zip(c["transcript"].tolist(), c["mtime"].tolist(), c["size"].tolist())}
+        keep = np.array([current.get(name) == known[name] for name in c["transcript"].tolist()], dtype=bool)
+        changed = sorted(name for name, stamp in current.items() if known.get(name) != stamp)
+        paths = [os.path.join(directory, name) for name in changed]
+
+        if len(paths) > 1 and (workers or 0) != 1:
+            chunksize = max(1, min(64, len(paths) // (4 * (workers or os.cpu_count() or 1))))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed = list(pool.map(parse_transcript, paths, chunksize=chunksize))
+        else:
+            parsed = [parse_transcript(path) for path in paths]
+
+        removed = sum(name not in current for name in known)
+        self.columns = self._merge(keep, parsed)
+        return len(parsed), removed
+
+    def _merge(self, keep, parsed):
+        """Columns of the kept interviews followed by the newly parsed ones."""
+        c = self.columns
+        turn_keep = np.repeat(keep, c["n_turns"])
+        columns = {name: c[name] for name in ("item_construct", "item_kind", "items_key")}
+        for name in INTERVIEW_COLUMNS[:-1]:
+            dtype = str if c[name].dtype.kind == "U" else c[name].dtype
+            columns[name] = np.concatenate([c[name][keep], np.array([p[name] for p in parsed], dtype=dtype)])
+        for name in ("turn_role", "turn_chars", "turn_words", "scores"):
+            columns[name] = np.concatenate([c[name][turn_keep]] + [p[name] for p in parsed])
+        columns["turn_offset"] = np.concatenate([[0], np.cumsum(columns["n_turns"])[:-1]]).astype(np.int64)
+        columns["turn_interview"] = np.repeat(np.arange(len(columns["transcript"]), dtype=np.int32), columns["n_turns"])
+        return columns
+
+    def save(self):
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **self.columns)
+        atomic_write(self.path, buffer.getvalue())
+
+    def coverage(self, threshold=None):
+        """Per interview and construct: whether a matching main question or probe was asked.
+
+        Returns (constructs, covered, probed): `covered` and `probed` are boolean arrays of shape
+        (interviews, constructs), `probed` counting follow-up probes only.
+        """
+        threshold = config.ANALYTICS_MATCH_THRESHOLD if threshold is None else threshold
+        c = self.columns
+        constructs = list(dict.fromkeys(c["item_construct"].tolist()))
+        # Items x constructs membership, one column per construct
+        membership = c["item_construct"][:, None] == np.array(constructs)[None, :]
+        probes = c["item_kind"] == "probe"
+        n = len(self)
+        if not len(c["scores"]):
+            empty = np.zeros((n, len(constructs)), dtype=bool)
+            return constructs, empty, empty.copy()
+
+        asked = c["scores"] >= threshold
+        # Any matching turn per interview (reduceat needs valid offsets; empty interviews are masked)
+        has_turns = c["n_turns"] > 0
+        per_interview = np.zeros((n, asked.shape[1]), dtype=bool)
+        per_interview[has_turns] = np.logical_or.reduceat(asked, c["turn_offset"][has_turns], axis=0)
+        covered = (per_interview.astype(np.int32) @ membership.astype(np.int32)) > 0
+        probed = (per_interview[:, probes].astype(np.int32) @ membership[probes].astype(np.int32)) > 0
+        return constructs, covered, probed
+
+    def summary(self, threshold=None):
+        """Corpus totals and construct coverage as printable lines."""
+        c = self.columns
+        n = len(self)
+        if not n:
+            return ["No transcripts."]
+        user = c["turn_role"] == 1
+        lines = [
+            f"Interviews:        {n} ({(c['closing_code'] != '').sum()} ended with a closing code)",
+            f"Responses:         mean {c['n_responses'].mean():.1f}, median {np.median(c['n_responses']):.0f}",
+            f"Duration:          median {np.nanmedian(c['duration']) / 60:.1f} min" if np.isfinite(c["duration"]).any() else "Duration:          unknown",
+            f"Response length:   mean {c['turn_words'][user].mean():.0f} words" if user.any() else "Response length:   no responses",
+            "Models:            " + ", ".join(f"{m} ({k})" for m, k in zip(*np.unique(c["model"], return_counts=True))),
+            "",
+            f"{'construct':<26} {'covered':>8} {'by probe':>9}",
+        ]
+        constructs, covered, probed = self.coverage(threshold)
+        for j, construct in enumerate(constructs):
+            lines.append(f"{construct:<26} {covered[:, j].mean():>8.0%} {probed[:, j].mean():>9.0%}")
+        return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the transcript store and report construct coverage.")
+    parser.add_argument("--directory", default=config.TRANSCRIPTS_DIRECTORY)
+    parser.add_argument("--store", default=config.ANALYTICS_STORE)
+    parser.add_argument("--workers", type=int, default=config.ANALYTICS_WORKERS, help="parser processes (default: all cores)")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="share of a question's keywords an interviewer turn must contain to count as asking it")
+    args = parser.parse_args()
+
+    store = TranscriptStore(args.store)
+    start = time.perf_counter()
+    parsed, removed = store.update(args.directory, args.workers)
+    if parsed or removed:
+        store.save()
+    print(f"Parsed {parsed} new or changed transcripts, dropped {removed} ({time.perf_counter() - start:.1f} s)")
+    start = time.perf_counter()
+    lines = store.summary(args.threshold)
+    print("\n".join(lines))
+    print(f"(computed in {(time.perf_counter() - start) * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
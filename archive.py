@@ -0,0 +1,347 @@
+#archive.py - Bundled, compressed Drive uploads of finished interviews
+#
+# With config.ARCHIVE, finished transcripts (and with ARCHIVE_BACKUPS their journals) are not
+# uploaded one by one. They are recorded in a local manifest database and, once the oldest has
+# waited ARCHIVE_WINDOW seconds or ARCHIVE_MAX_BYTES are pending, packed into one .tar.gz that goes
+# through the upload queue like a transcript (resumable upload, checksum verified by Drive). Each
+# archive starts with manifest.json, listing its members with their sizes and MD5 checksums; the
+# local manifest maps every transcript to its archive and Drive file ID. Once an archive's upload
+# is verified, the journals it contains and the local copy of the archive are deleted.
+#
+#   python archive.py --seal                                # bundle everything pending now
+#   python archive.py --locate User_2024-10-16_18-11-17.txt
+#   python archive.py --status
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import tarfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import config
+import metrics
+from journal import atomic_write
+from upload_queue import file_checksum, get_upload_queue, upload_key_for
+
+logger = logging.getLogger(__name__)
+
+_archiver = None
+_archiver_lock = threading.Lock()
+
+# An archive still being built after this long was abandoned by a crashed process; its members
+# go back to the pending ones
+SEAL_TIMEOUT = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    checksum TEXT,
+    added_at REAL NOT NULL,
+    archive TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS members_pending ON members (archive, added_at);
+CREATE TABLE IF NOT EXISTS archives (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'sealing',
+    created_at REAL NOT NULL,
+    members INTEGER,
+    bytes INTEGER,
+    compressed_bytes INTEGER,
+    checksum TEXT,
+    file_id TEXT,
+    collected_at REAL
+);
+"""
+
+
+class Archiver:
+    """Bundles pending files into archives for the upload queue and cleans up after verified uploads.
+
+    Members are named "transcripts/<file>" or "backups/<file>" inside the archives. Several
+    processes can share one manifest database: each archive is claimed by one of them.
+    """
+
+    def __init__(self, db_path, queue, directory=None):
+        self.db_path = db_path
+        self.queue = queue
+        self.directory = directory or config.ARCHIVE_DIRECTORY
+        self.stopping = threading.Event()
+        self.thread = None
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def start(self):
+        """Start the thread that seals due archives and collects uploaded ones (idempotent)."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._work, name="drive-archive", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def _work(self):
+        while not self.stopping.is_set():
+            try:
+                self.seal()
+                self.collect()
+            except Exception as e:
+                logger.warning("Archiving failed: %s", e)
+            self.stopping.wait(config.ARCHIVE_CHECK_INTERVAL)
+
+    def add(self, path, kind="transcripts", checksum=None):
+        """Add a file to the next archive; adding the same file name twice is a no-op.
+
+        With the MD5 `checksum` of the file as written, a file that changed or was damaged on
+        disk before it was archived is reported instead of archived.
+        """
+        name = f"{kind}/{os.path.basename(path)}"
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR IGNORE INTO members (name, path, size, checksum, added_at) VALUES (?, ?, ?, ?, ?)",
+                (name, os.path.abspath(path), os.path.getsize(path), checksum, time.time()),
+            )
+        return name
+
+    def seal(self, force=False):
+        """Build the archives that are due (all pending files with `force`); returns their names."""
+        sealed = []
+        while True:
+            name = self._claim(force)
+            if name is None:
+                return sealed
+            if self._build(name):
+                sealed.append(name)
+
+    def _claim(self, force):
+        """Atomically assign the next batch of pending files to a new archive, or return None."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            stale = [row[0] for row in db.execute(
+                "SELECT name FROM archives WHERE status = 'sealing' AND created_at < ?", (now - SEAL_TIMEOUT,))]
+            for name in stale:
+                db.execute("UPDATE members SET archive = NULL WHERE archive = ?", (name,))
+                db.execute("DELETE FROM archives WHERE name = ?", (name,))
+            rows = db.execute(
+                "SELECT name, size, added_at FROM members WHERE archive IS NULL AND error IS NULL "
+                "ORDER BY added_at, name"
+            ).fetchall()
+            pending = sum(size for _, size, _ in rows)
+            if not rows or not (force or pending >= config.ARCHIVE_MAX_BYTES or now - rows[0][2] >= config.ARCHIVE_WINDOW):
+                db.execute("COMMIT")
+                return None
+            batch, size = [], 0
+            for member, member_size, _ in rows:
+                if batch and size + member_size > config.ARCHIVE_MAX_BYTES:
+                    break
+                batch.append(member)
+                size += member_size
+            name = f"interviews_{time.strftime('%Y-%m-%d_%H-%M-%S', time.localtime(now))}_{uuid.uuid4().hex[:8]}.tar.gz"
+            db.execute("INSERT INTO archives (name, path, created_at) VALUES (?, ?, ?)",
+                       (name, os.path.abspath(os.path.join(self.directory, name)), now))
+            db.executemany("UPDATE members SET archive = ? WHERE name = ?", [(name, member) for member in batch])
+            db.execute("COMMIT")
+            return name
+
+    def _build(self, name):
+        """Write the archive of the claimed files and enqueue its upload; False if none was readable."""
+        with self._connect() as db:
+            rows = db.execute("SELECT name, path, checksum FROM members WHERE archive = ? ORDER BY added_at, name",
+                              (name,)).fetchall()
+            path = db.execute("SELECT path FROM archives WHERE name = ?", (name,)).fetchone()[0]
+        contents, errors = [], []
+        for member, member_path, checksum in rows:
+            try:
+                with open(member_path, "rb") as f:
+                    data = f.read()
+            except OSError as e:
+                errors.append((str(e), member))
+                continue
+            actual = hashlib.md5(data, usedforsecurity=False).hexdigest()
+            if checksum is not None and actual != checksum:
+                errors.append((f"{member_path} does not match the checksum it was written with", member))
+                continue
+            contents.append((member, data, actual))
+        for error, member in errors:
+            logger.error("Not archiving %s: %s", member, error)
+
+        manifest = {
+            "archive": name,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S %Z"),
+            "members": [{"name": member, "size": len(data), "md5": checksum} for member, data, checksum in contents],
+        }
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+            for member, data in [("manifest.json", json.dumps(manifest, indent=1).encode())] + \
+                                [(member, data) for member, data, _ in contents]:
+                info = tarfile.TarInfo(member)
+                info.size = len(data)
+                info.mtime = int(time.time())
+                tar.addfile(info, io.BytesIO(data))
+        checksum = atomic_write(path, buffer.getvalue()) if contents else None
+
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany("UPDATE members SET archive = NULL, error = ? WHERE name = ?", errors)
+            # Journals are recorded without a checksum; the archived one decides whether they can be deleted
+            db.executemany("UPDATE members SET checksum = ? WHERE name = ?",
+                           [(checksum, member) for member, _, checksum in contents])
+            if contents:
+                db.execute(
+                    "UPDATE archives SET status = 'queued', members = ?, bytes = ?, compressed_bytes = ?, checksum = ? "
+                    "WHERE name = ?",
+                    (len(contents), sum(len(data) for _, data, _ in contents), len(buffer.getvalue()), checksum, name),
+                )
+            else:
+                db.execute("DELETE FROM archives WHERE name = ?", (name,))
+            db.execute("COMMIT")
+        if contents:
+            self.queue.enqueue(path, name, mimetype="application/gzip", checksum=checksum)
+            logger.info("Archived %d files in %s (%d bytes)", len(contents), name, len(buffer.getvalue()))
+        return bool(contents)
+
+    def collect(self):
+        """Delete the journals and local archives covered by a verified upload; returns the archives collected."""
+        with self._connect() as db:
+            queued = db.execute("SELECT name, path, checksum FROM archives WHERE status = 'queued'").fetchall()
+        collected = []
+        for name, path, checksum in queued:
+            job = self.queue.job(upload_key_for(name))
+            if job is None:
+                # Sealed, but the process stopped before it was enqueued
+                self.queue.enqueue(path, name, mimetype="application/gzip", checksum=checksum)
+                continue
+            status, file_id = job
+            if status != "done":
+                continue
+            # The upload queue checked the archive against its checksum and Drive against the bytes sent
+            with self._connect() as db:
+                backups = db.execute("SELECT path, checksum FROM members WHERE archive = ? AND name LIKE 'backups/%'",
+                                     (name,)).fetchall()
+            for backup, backup_checksum in backups:
+                try:
+                    # A journal that was written to again since it was archived is kept
+                    if file_checksum(backup) == backup_checksum:
+                        os.remove(backup)
+                except FileNotFoundError:
+                    pass
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            with self._connect() as db:
+                db.execute("UPDATE archives SET status = 'collected', file_id = ?, collected_at = ? WHERE name = ?",
+                           (file_id, time.time(), name))
+            collected.append(name)
+        return collected
+
+    def locate(self, file_name):
+        """Where a transcript or journal is kept: one dict per archived copy (member, archive, status, file ID)."""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT m.name, m.archive, m.error, a.status, a.file_id FROM members m "
+                "LEFT JOIN archives a ON a.name = m.archive WHERE m.name IN (?, ?)",
+                (f"transcripts/{file_name}", f"backups/{file_name}"),
+            ).fetchall()
+        located = []
+        for member, archive, error, status, file_id in rows:
+            if status == "queued":
+                job = self.queue.job(upload_key_for(archive))
+                if job is not None and job[0] == "done":
+                    status, file_id = "uploaded", job[1]
+            located.append({"member": member, "archive": archive, "status": "error" if error else status or "pending",
+                            "file_id": file_id, "error": error})
+        return located
+
+    def stats(self):
+        """Pending files and bytes, and archives by status."""
+        with self._connect() as db:
+            pending = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM members WHERE archive IS NULL AND error IS NULL"
+            ).fetchone()
+            errors = db.execute("SELECT COUNT(*) FROM members WHERE error IS NOT NULL").fetchone()[0]
+            archives = dict(db.execute("SELECT status, COUNT(*) FROM archives GROUP BY status").fetchall())
+        return {"pending_files": pending[0], "pending_bytes": pending[1], "errors": errors, **archives}
+
+
+def get_archiver():
+    """Return the process-wide archiver, starting its thread on first use."""
+    global _archiver
+    with _archiver_lock:
+        if _archiver is None:
+            _archiver = Archiver(config.ARCHIVE_DB, get_upload_queue()).start()
+            metrics.register_gauge(
+                "interview_archive_pending_files", "Files waiting for the next archive.",
+                lambda: _archiver.stats()["pending_files"],
+            )
+        return _archiver
+
+
+def ship_transcript(transcript_file, checksum=None, journal_file=None):
+    """Hand a finished transcript to Google Drive: via the next archive with config.ARCHIVE
+    (with its journal if ARCHIVE_BACKUPS), otherwise as an upload of its own."""
+    if not config.ARCHIVE:
+        get_upload_queue().enqueue(transcript_file, os.path.basename(transcript_file), checksum=checksum)
+        return
+    archiver = get_archiver()
+    archiver.add(transcript_file, "transcripts", checksum)
+    if config.ARCHIVE_BACKUPS and journal_file is not None and os.path.exists(journal_file):
+        archiver.add(journal_file, "backups")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bundle finished interviews into archives for Google Drive.")
+    parser.add_argument("--seal", action="store_true", help="archive all pending files now")
+    parser.add_argument("--locate", metavar="FILE", help="show the archive holding a transcript or journal")
+    parser.add_argument("--status", action="store_true", help="show pending files and archives by status")
+    args = parser.parse_args()
+
+    archiver = Archiver(config.ARCHIVE_DB, get_upload_queue())
+    if args.seal:
+        sealed = archiver.seal(force=True)
+        for name in sealed:
+            print(f"Sealed {name}")
+        # Upload here rather than waiting for an app process
+        while any(archiver.queue.job(upload_key_for(name))[0] in ("pending", "in_progress") for name in sealed):
+            time.sleep(1)
+        for name in archiver.collect():
+            print(f"Uploaded {name}; cleaned up its journals")
+    if args.locate:
+        located = archiver.locate(os.path.basename(args.locate))
+        if not located:
+            print(f"{args.locate} has not been archived")
+        for entry in located:
+            print(f"{entry['member']}: {entry['archive'] or '-'} ({entry['status']}"
+                  + (f", Drive file {entry['file_id']}" if entry["file_id"] else "")
+                  + (f": {entry['error']}" if entry["error"] else "") + ")")
+    if args.status or not (args.seal or args.locate):
+        print("\n".join(f"{key}: {value}" for key, value in archiver.stats().items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#async_engine.py - asyncio execution mode of the interview engine
+#
+# Same sessions, events and persistence as engine.py, but model calls use the async OpenAI and
+# Anthropic clients, so one event loop can multiplex thousands of concurrent streaming turns
+# instead of blocking one thread per live interview. Disk work after a reply (backups, the final
+# transcript) runs in the default thread pool so it never blocks the loop.
+
+import asyncio
+import contextlib
+import itertools
+import logging
+import time
+
+import clients
+import config
+from engine import InterviewEngine
+from openers import get_opening
+from prompt_cache import anthropic_usage, openai_usage
+from rate_limit import get_rate_limiter, retry_delay
+from router import order_routes, route_key
+from streaming import closing_code_automaton
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class AsyncInterviewEngine(InterviewEngine):
+    """Interview engine whose turns are async generators of engine events.
+
+    Registry calls (a local SQLite database or an HTTP service) and file I/O run in the default
+    thread pool, so one slow call does not stall the other streams of the process.
+    """
+
+    async def aopen(self, response_id=None):
+        """Resume the interview of `response_id` or start a new one (see `resume` and `start`)."""
+        return await asyncio.to_thread(lambda: self.resume(response_id) or self.start(response_id=response_id))
+
+    async def aget(self, session_id):
+        """The registered session with its messages in memory (reloaded from disk if it was idle), or None."""
+        session = self.get(session_id)
+        if session is not None:
+            await asyncio.to_thread(session.load)
+        return session
+
+    async def astream_reply(self, session, turn):
+        """Async version of `stream_reply`: routes run as tasks, so a hedged or failed-over
+        request is cancelled outright instead of being drained."""
+        routes = order_routes(self.routes)
+        if len(routes) == 1:
+            attempt = self._attempt(turn, routes[0], 0)
+            try:
+                async with contextlib.aclosing(self._aroute_reply(session, attempt, routes[0])) as deltas:
+                    async for text_delta in deltas:
+                        yield text_delta
+            finally:
+                turn.update(attempt)
+            return
+
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        attempts, tasks = [], []
+        winner = None
+        failed = 0
+
+        async def run(i):
+            try:
+                async with contextlib.aclosing(self._aroute_reply(session, attempts[i], routes[i])) as deltas:
+                    async for text_delta in deltas:
+                        events.put_nowait((i, text_delta, None))
+                events.put_nowait((i, None, None))
+            except Exception as e:
+                events.put_nowait((i, None, e))
+
+        def start_next():
+            attempts.append(self._attempt(turn, routes[len(attempts)], len(attempts)))
+            tasks.append(asyncio.create_task(run(len(attempts) - 1)))
+            return None if config.HEDGE_AFTER is None else loop.time() + config.HEDGE_AFTER
+
+        deadline = start_next()
+        try:
+            while True:
+                if winner is None and deadline is not None and len(attempts) < len(routes):
+                    try:
+                        i, text_delta, error = await asyncio.wait_for(events.get(), max(0, deadline - loop.time()))
+                    except asyncio.TimeoutError:
+                        logger.info("No first token for %s after %ss, hedging with %s", session.username, config.HEDGE_AFTER, routes[len(attempts)].provider)
+                        deadline = start_next()
+                        continue
+                else:
+                    i, text_delta, error = await events.get()
+                if winner is None and error is None:
+                    winner = i
+                    for j, task in enumerate(tasks):
+                        if j != winner:
+                            task.cancel()
+                if i == winner:
+                    if error is not None:
+                        raise error
+                    if text_delta is None:
+                        return
+                    yield text_delta
+                elif winner is None:
+                    failed += 1
+                    logger.warning("%s failed for %s: %s", routes[i].provider, session.username, error)
+                    if failed == len(attempts):
+                        if len(attempts) == len(routes):
+                            raise error
+                        deadline = start_next()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if winner is not None:
+                turn.update(attempts[winner], hedged=len(attempts) > 1 and config.HEDGE_AFTER is not None)
+
+    async def _aroute_reply(self, session, attempt, route):
+        """Async version of `_route_reply`."""
+        api_kwargs = self.build_api_kwargs(session, attempt, route)
+        tokens, priority = self._admission(attempt)
+        limiter = get_rate_limiter(route.provider)
+        try:
+            for retry in itertools.count():
+                attempt["queue_wait"] = attempt.get("queue_wait", 0) + await limiter.acquire_async(tokens, priority)
+                succeeded = False
+                try:
+                    async with contextlib.aclosing(self._astream_once(api_kwargs, attempt, route)) as deltas:
+                        async for text_delta in deltas:
+                            if not succeeded:
+                                succeeded = self._route_succeeded(attempt, route)
+                            yield text_delta
+                    if not succeeded:
+                        self._route_succeeded(attempt, route)
+                    return
+                except Exception as e:
+                    if not self._should_retry(session, attempt, e, retry):
+                        if not succeeded:
+                            self._route_failed(route, e)
+                        raise
+                await asyncio.sleep(retry_delay(retry))
+        finally:
+            await asyncio.to_thread(self._settle, attempt, route, tokens)
+
+    async def _astream_once(self, api_kwargs, turn, route):
+        client = clients.get_async_client(route.provider, route.api_key)
+        start = time.perf_counter()
+        try:
+            if route.provider == "openai":
+                stream = await client.chat.completions.create(**api_kwargs)
+                try:
+                    async for chunk in stream:
+                        if chunk.usage is not None:
+                            turn.update(openai_usage(chunk.usage))
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            turn.setdefault("ttft", time.perf_counter() - start)
+                            yield chunk.choices[0].delta.content
+                finally:
+                    await stream.close()
+            elif route.provider == "anthropic":
+                async with client.messages.stream(**api_kwargs) as stream:
+                    started = False
+                    try:
+                        async for event in stream:
+                            if event.type == "message_start":
+                                started = True
+                            elif event.type == "content_block_delta" and event.delta.type == "text_delta" and event.delta.text:
+                                turn.setdefault("ttft", time.perf_counter() - start)
+                                yield event.delta.text
+                    finally:
+                        # A stream that failed before message_start has no usage snapshot
+                        if started:
+                            turn.update(anthropic_usage(stream.current_message_snapshot.usage))
+        finally:
+            turn["stream_seconds"] = time.perf_counter() - start
+
+    async def astream_turn(self, session, user_message=None):
+        """Async version of `stream_turn`."""
+        # A blocking acquire would stall the whole loop, so a concurrent turn is an error instead
+        if not session.lock.acquire(blocking=False):
+            raise RuntimeError("A turn is already running for this session.")
+        try:
+            turn, opening = await asyncio.to_thread(self._begin_turn, session, user_message)
+            started = time.perf_counter()
+            if not opening:
+                for event in await asyncio.to_thread(list, self._backup(session)):
+                    yield event
+            pooled = await asyncio.to_thread(get_opening, self.provider) if opening else None
+            message_interviewer = ""
+            closing_matcher = closing_code_automaton(config.CLOSING_MESSAGES.keys()).matcher()
+
+            if pooled is not None:
+                turn["opening_pool"] = True
+                message_interviewer = pooled
+                yield {"type": "delta", "text": pooled}
+            else:
+                try:
+                    deltas = self.astream_reply(session, turn)
+                    async for text_delta in deltas:
+                        message_interviewer += text_delta
+                        visible = closing_matcher.feed(text_delta)
+                        if closing_matcher.matched:
+                            break
+                        if visible:
+                            yield {"type": "delta", "text": visible}
+                    await deltas.aclose()
+                    for event in self._flush_event(closing_matcher):
+                        yield event
+                    await asyncio.to_thread(self._reply_succeeded, session, turn, opening, message_interviewer)
+                except Exception as e:
+                    message_interviewer = self._reply_failed(session, turn, opening, e)
+                    yield {"type": "error", "error": str(e)}
+
+            finish = self._finish_turn(session, turn, message_interviewer, closing_matcher.matched, started)
+            while (event := await asyncio.to_thread(next, finish, _DONE)) is not _DONE:
+                yield event
+        finally:
+            session.lock.release()
+
+    async def acancel(self, session):
+        """Async version of `cancel`."""
+        for event in await asyncio.to_thread(list, self.cancel(session)):
+            yield event
+
+
+_engines = {}
+
+
+def get_async_engine(provider, api_key, fallbacks=()):
+    """Process-wide async engine per provider, API key and fallback routes."""
+    key = (clients.registry_key(provider, api_key),) + tuple(route_key(route) for route in fallbacks)
+    engine = _engines.get(key)
+    if engine is None:
+        engine = _engines[key] = AsyncInterviewEngine(provider, api_key, fallbacks)
+    return engine
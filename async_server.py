@@ -0,0 +1,158 @@
+#async_server.py - asyncio HTTP/SSE service for high participant counts
+#
+# Same endpoints and events as server.py, but every turn runs on the event loop with the async
+# provider clients (async_engine.py), so concurrent interviews do not each hold a thread.
+# Uses tornado, which is installed with streamlit.
+#
+# Start with: python async_server.py [--port 8000] [--processes 0]
+# (--processes 0 forks one event loop per CPU core. Sessions live in the memory of one process, so
+# process i listens on --port + i, and the balancer must send all requests of a session to the
+# port that created it, e.g. by routing on a cookie or the session ID.)
+
+import argparse
+import json
+import os
+
+import tornado.httpserver
+import tornado.ioloop
+import tornado.netutil
+import tornado.process
+import tornado.web
+from tornado.iostream import StreamClosedError
+
+import config
+import metrics
+from async_engine import get_async_engine
+from router import fallback_routes
+
+
+def api_key():
+    key = os.environ.get("API_KEY")
+    if key is None:
+        import streamlit as st
+        key = st.secrets["API_KEY"]
+    return key
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    @property
+    def engine(self):
+        return get_async_engine(self.settings["api_provider"], self.settings["api_key"], self.settings["fallbacks"])
+
+    def json_body(self):
+        try:
+            return json.loads(self.request.body or b"{}")
+        except json.JSONDecodeError:
+            raise tornado.web.HTTPError(400, reason="Invalid JSON body.")
+
+    async def session_or_404(self, session_id):
+        session = await self.engine.aget(session_id)
+        if session is None:
+            raise tornado.web.HTTPError(404, reason="Unknown interview session.")
+        return session
+
+    async def stream_events(self, events):
+        """Send engine events as Server-Sent Events."""
+        self.set_header("Content-Type", "text/event-stream")
+        self.set_header("Cache-Control", "no-cache")
+        self.set_header("X-Accel-Buffering", "no")
+        try:
+            async for event in events:
+                self.write(f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n")
+                await self.flush()
+        except StreamClosedError:
+            pass
+        finally:
+            await events.aclose()
+
+
+class SessionsHandler(BaseHandler):
+    async def post(self):
+        uid = self.json_body().get("uid")
+        session = await self.engine.aopen(uid)
+        self.set_status(201)
+        self.write({"session_id": session.session_id, "username": session.username})
+
+
+class SessionHandler(BaseHandler):
+    async def get(self, session_id):
+        session = await self.session_or_404(session_id)
+        self.write({
+            "messages": session.visible_messages(),
+            "active": session.active,
+            "awaiting_reply": session.awaiting_reply,
+            "closing_code": session.closing_code,
+        })
+
+
+class TurnsHandler(BaseHandler):
+    async def post(self, session_id):
+        session = await self.session_or_404(session_id)
+        if not session.active:
+            raise tornado.web.HTTPError(409, reason="The interview is no longer active.")
+        if session.lock.locked():
+            raise tornado.web.HTTPError(409, reason="A turn is already running for this session.")
+        content = self.json_body().get("content")
+        if session.messages and not session.awaiting_reply and not content:
+            raise tornado.web.HTTPError(400, reason="'content' is required after the opening turn.")
+        if not session.messages or session.awaiting_reply:
+            content = None
+        await self.stream_events(self.engine.astream_turn(session, content))
+
+
+class CancelHandler(BaseHandler):
+    async def post(self, session_id):
+        session = await self.session_or_404(session_id)
+        await self.stream_events(self.engine.acancel(session))
+
+
+def make_app(provider=None, key=None):
+    provider = provider or config.API
+    return tornado.web.Application(
+        [
+            (r"/sessions", SessionsHandler),
+            (r"/sessions/([0-9a-f]+)", SessionHandler),
+            (r"/sessions/([0-9a-f]+)/turns", TurnsHandler),
+            (r"/sessions/([0-9a-f]+)/cancel", CancelHandler),
+        ],
+        api_provider=provider,
+        api_key=key or api_key(),
+        fallbacks=fallback_routes(provider),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the asyncio interview HTTP/SSE service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--provider", default=config.API, choices=["openai", "anthropic"])
+    parser.add_argument("--processes", type=int, default=1, help="event loop processes (0: one per core)")
+    args = parser.parse_args()
+
+    for directory in [config.TRANSCRIPTS_DIRECTORY, config.BACKUPS_DIRECTORY]:
+        os.makedirs(directory, exist_ok=True)
+
+    if args.processes != 1:
+        tornado.process.fork_processes(args.processes)
+    # One port per forked process, like the metrics port: a shared port would hand a session's
+    # requests to processes that do not hold it
+    port = args.port + (tornado.process.task_id() or 0)
+    sockets = tornado.netutil.bind_sockets(port, args.host)
+    # Resume uploads queued before a restart (after forking: threads do not survive a fork)
+    from upload_queue import get_upload_queue
+    get_upload_queue()
+    if config.ARCHIVE:
+        from archive import get_archiver
+        get_archiver()
+    if config.METRICS_PORT is not None:
+        # One metrics port per forked process
+        metrics.start_server(config.METRICS_PORT + (tornado.process.task_id() or 0))
+
+    server = tornado.httpserver.HTTPServer(make_app(args.provider))
+    server.add_sockets(sockets)
+    print(f"Interview service on http://{args.host}:{port}", flush=True)
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == "__main__":
+    main()
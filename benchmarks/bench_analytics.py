@@ -0,0 +1,92 @@
+#bench_analytics.py - Transcript analytics: re-parsing every file vs. the incremental columnar store
+#
+# Usage (from the repository root): python benchmarks/bench_analytics.py [--transcripts 5000] [--workers 8]
+#
+# Generates a corpus of synthetic transcripts (interviewer questions from config.MAIN_QUESTIONS and
+# FOLLOW_UP_PROBES, answers from benchmarks/respondent.py) and measures: parsing the whole corpus in
+# one process, as every analysis did before; building the store of analytics.py with a process pool;
+# updating it after 1% new transcripts arrived; and computing construct coverage from the store.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config  # noqa: E402
+from respondent import SimulatedRespondent  # noqa: E402
+
+
+def write_corpus(directory, start, count, rng):
+    from journal import format_transcript
+    probes = list(config.FOLLOW_UP_PROBES.values())
+    for n in range(start, start + count):
+        respondent = SimulatedRespondent(seed=n)
+        messages = [{"role": "system", "content": config.SYSTEM_PROMPT}]
+        for question in rng.sample(config.MAIN_QUESTIONS, rng.randint(4, len(config.MAIN_QUESTIONS))):
+            for text in [question["text"]] + ([rng.choice(probes)] if rng.random() < 0.3 else []):
+                messages.append({"role": "assistant", "content": f"Thank you, that is helpful. {text}"})
+                messages.append({"role": "user", "content": respondent.answer(text)})
+        messages.append({"role": "assistant", "content": config.CLOSING_MESSAGES["x7y8"]})
+        metadata = {"api": "openai", "model": rng.choice(["gpt-4o-mini", "gpt-4o"]),
+                    "start_time": f"2024-10-16 18:{rng.randint(0, 29):02d}:00 CDT",
+                    "end_time": f"2024-10-16 18:{rng.randint(30, 59):02d}:00 CDT",
+                    "username": f"OpenAI_{n}", "uid": f"R_{n}"}
+        with open(os.path.join(directory, f"OpenAI_{n}.txt"), "w") as f:
+            f.write(format_transcript(messages, metadata))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcript analytics: full re-parse vs. incremental columnar store.")
+    parser.add_argument("--transcripts", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: all cores)")
+    args = parser.parse_args()
+
+    from analytics import TranscriptStore, parse_transcript
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, "transcripts")
+        os.makedirs(directory)
+        rng = random.Random(0)
+        write_corpus(directory, 0, args.transcripts, rng)
+        store_path = os.path.join(tmp, "analytics", "transcripts.npz")
+
+        start = time.perf_counter()
+        for entry in os.scandir(directory):
+            parse_transcript(entry.path)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store = TranscriptStore(store_path)
+        store.update(directory, args.workers)
+        store.save()
+        build = time.perf_counter() - start
+
+        added = max(1, args.transcripts // 100)
+        write_corpus(directory, args.transcripts, added, rng)
+        start = time.perf_counter()
+        store = TranscriptStore(store_path)
+        parsed, _ = store.update(directory, args.workers)
+        store.save()
+        incremental = time.perf_counter() - start
+
+        start = time.perf_counter()
+        constructs, covered, probed = store.coverage()
+        coverage = time.perf_counter() - start
+
+        print(f"{args.transcripts} transcripts, {len(store.columns['turn_role'])} turns; "
+              f"store {os.path.getsize(store_path) / 1024:.0f} KiB on disk")
+        print(f"Parse all, one process:      {sequential:.2f} s")
+        print(f"Build store, process pool:   {build:.2f} s ({args.workers or os.cpu_count()} workers)")
+        print(f"Update after {parsed} new files:  {incremental:.2f} s")
+        print(f"Construct coverage:          {coverage * 1000:.1f} ms "
+              f"({len(constructs)} constructs, mean {covered.mean():.0%} covered, {probed.mean():.0%} by probe)")
+
+
+if __name__ == "__main__":
+    main()
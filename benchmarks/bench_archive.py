@@ -0,0 +1,122 @@
+#bench_archive.py - Drive API calls and upload time: one upload per transcript vs. bundled archives
+#
+# Usage (from the repository root): python benchmarks/bench_archive.py [--transcripts 500] [--latency 0.15]
+#
+# Writes synthetic transcripts with their journals (as benchmarks/bench_analytics.py does) and
+# drains them through the upload queue of upload_queue.py, once enqueued one by one and once
+# bundled by archive.py. Drive is simulated: each API call costs --latency seconds plus the time
+# to send its bytes at --mbps, and calls are counted as drive.upload_file_to_drive makes them (a
+# lookup by upload key, then one multipart request, or one request to start a resumable upload
+# plus one per chunk). Reports API calls, bytes sent, time until everything is uploaded, and the
+# local journals left afterwards.
+
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config  # noqa: E402
+from bench_analytics import write_corpus  # noqa: E402
+
+
+class FakeDrive:
+    """Counts the API calls and bytes of uploads and takes as long as they would."""
+
+    def __init__(self, latency, mbps):
+        self.latency = latency
+        self.bytes_per_second = mbps * 1e6 / 8
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.bytes = 0
+
+    def upload(self, path, name, mimetype, upload_key):
+        import drive
+        size = os.path.getsize(path)
+        if size >= drive.RESUMABLE_MIN_BYTES:
+            calls = 2 + math.ceil(size / config.UPLOAD_CHUNK_SIZE)
+        else:
+            calls = 2
+        time.sleep(calls * self.latency + size / self.bytes_per_second)
+        with self.lock:
+            self.calls += calls
+            self.bytes += size
+        return f"drive_{upload_key}"
+
+
+def write_journals(transcripts, backups):
+    from journal import close_journal, journal_path, open_journal, read_transcript
+    for entry in os.scandir(transcripts):
+        fields, messages = read_transcript(entry.path)
+        path = journal_path(backups, entry.name[:-4])
+        journal = open_journal(path)
+        journal.sync_messages(messages)
+        journal.write_metadata({"username": fields.get("Username"), "uid": fields.get("UID")})
+        close_journal(path)
+
+
+def wait_for(queue):
+    while queue.stats()["depth"]:
+        time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive uploads: one per transcript vs. bundled archives.")
+    parser.add_argument("--transcripts", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.15, help="seconds per simulated Drive API call")
+    parser.add_argument("--mbps", type=float, default=50, help="simulated upload bandwidth")
+    args = parser.parse_args()
+
+    from archive import Archiver
+    from upload_queue import UploadQueue
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.JOURNAL_FSYNC_EVERY = 10**6
+        transcripts, backups = os.path.join(tmp, "transcripts"), os.path.join(tmp, "backups")
+        os.makedirs(transcripts)
+        write_corpus(transcripts, 0, args.transcripts, random.Random(0))
+        write_journals(transcripts, backups)
+        total = sum(entry.stat().st_size for directory in (transcripts, backups) for entry in os.scandir(directory))
+        print(f"{args.transcripts} transcripts and journals, {total / 2**20:.1f} MiB; "
+              f"{config.UPLOAD_WORKERS} upload workers, {args.latency * 1000:.0f} ms per API call, {args.mbps:.0f} Mbit/s")
+        print(f"{'':<22} {'uploads':>8} {'API calls':>10} {'MiB sent':>9} {'time':>9} {'journals left':>14}")
+
+        drive = FakeDrive(args.latency, args.mbps)
+        queue = UploadQueue(os.path.join(tmp, "per_file.sqlite3"), drive.upload).start()
+        start = time.perf_counter()
+        for entry in os.scandir(transcripts):
+            queue.enqueue(entry.path, entry.name)
+        wait_for(queue)
+        elapsed = time.perf_counter() - start
+        queue.stop()
+        print(f"{'one per transcript':<22} {queue.stats()['done']:>8} {drive.calls:>10} {drive.bytes / 2**20:>9.1f} "
+              f"{elapsed:>7.1f} s {len(os.listdir(backups)):>14}")
+
+        drive = FakeDrive(args.latency, args.mbps)
+        queue = UploadQueue(os.path.join(tmp, "archived.sqlite3"), drive.upload).start()
+        archiver = Archiver(os.path.join(tmp, "archive.sqlite3"), queue, os.path.join(tmp, "archives"))
+        start = time.perf_counter()
+        for entry in os.scandir(transcripts):
+            archiver.add(entry.path, "transcripts")
+            archiver.add(os.path.join(backups, entry.name[:-4] + ".jsonl"), "backups")
+        sealed = archiver.seal(force=True)
+        seal = time.perf_counter() - start
+        wait_for(queue)
+        archiver.collect()
+        elapsed = time.perf_counter() - start
+        queue.stop()
+        print(f"{'archives':<22} {len(sealed):>8} {drive.calls:>10} {drive.bytes / 2**20:>9.1f} "
+              f"{elapsed:>7.1f} s {len(os.listdir(backups)):>14}")
+        print(f"(sealing took {seal:.2f} s; {archiver.locate('OpenAI_0.txt')[0]['member']} is in "
+              f"{archiver.locate('OpenAI_0.txt')[0]['archive']})")
+
+
+if __name__ == "__main__":
+    main()
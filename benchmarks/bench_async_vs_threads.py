@@ -0,0 +1,143 @@
+#bench_async_vs_threads.py - Load test of the threaded and the asyncio execution modes
+#
+# Usage (from the repository root): python benchmarks/bench_async_vs_threads.py [--sessions 200] [--turns 3]
+#
+# Starts the fake model API (benchmarks/fake_llm.py) in its own process and runs the same number
+# of concurrent interviews through engine.py (one thread per session) and async_engine.py (one
+# event loop), each mode in a fresh process. Reports time to first token percentiles, peak
+# threads, memory and "sessions per core": concurrent sessions divided by the CPU cores the
+# mode kept busy (CPU seconds / wall seconds).
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_llm import base_urls, spawn  # noqa: E402
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def configure(tmp, sessions):
+    import config
+    config.TRANSCRIPTS_DIRECTORY = os.path.join(tmp, "transcripts")
+    config.BACKUPS_DIRECTORY = os.path.join(tmp, "backups")
+    config.OPENING_POOL_DIRECTORY = os.path.join(tmp, "openings")
+    config.OPENING_POOL_SIZE = 0  # always generate the opening live
+    config.REGISTRY_DB = os.path.join(tmp, "registry.sqlite3")
+    config.RATE_LIMIT_REQUESTS_PER_MINUTE = config.RATE_LIMIT_TOKENS_PER_MINUTE = None
+    config.METRICS_LOG = None
+    config.HTTP_MAX_CONNECTIONS = config.HTTP_MAX_KEEPALIVE_CONNECTIONS = sessions
+
+
+def run_threads(sessions, turns):
+    from engine import InterviewEngine
+    engine = InterviewEngine("openai", "sk-benchmark")
+    ttfts, peak_threads = [], [0]
+
+    def interview(i):
+        session = engine.start(response_id=f"bench-{i}", username=f"bench_threads_{i}", register=False)
+        for turn in range(turns):
+            start, first = time.perf_counter(), None
+            for event in engine.stream_turn(session, None if turn == 0 else f"Answer {turn}"):
+                if event["type"] == "delta" and first is None:
+                    first = time.perf_counter() - start
+                    peak_threads[0] = max(peak_threads[0], threading.active_count())
+            ttfts.append(first)
+
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(interview, range(sessions)))
+    return ttfts, peak_threads[0]
+
+
+def run_async(sessions, turns):
+    from async_engine import AsyncInterviewEngine
+    engine = AsyncInterviewEngine("openai", "sk-benchmark")
+    ttfts, peak_threads = [], [0]
+
+    async def interview(i):
+        session = engine.start(response_id=f"bench-{i}", username=f"bench_async_{i}", register=False)
+        for turn in range(turns):
+            start, first = time.perf_counter(), None
+            async for event in engine.astream_turn(session, None if turn == 0 else f"Answer {turn}"):
+                if event["type"] == "delta" and first is None:
+                    first = time.perf_counter() - start
+                    peak_threads[0] = max(peak_threads[0], threading.active_count())
+            ttfts.append(first)
+
+    async def main():
+        await asyncio.gather(*(interview(i) for i in range(sessions)))
+
+    asyncio.run(main())
+    return ttfts, peak_threads[0]
+
+
+def run_mode(mode, sessions, turns):
+    """Run one mode in this process and return its measurements."""
+    with tempfile.TemporaryDirectory() as tmp:
+        configure(tmp, sessions)
+        wall, cpu = time.perf_counter(), time.process_time()
+        ttfts, peak_threads = (run_threads if mode == "threads" else run_async)(sessions, turns)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    ttfts = [t for t in ttfts if t is not None]
+    return {
+        "mode": mode,
+        "turns": len(ttfts),
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "sessions_per_core": sessions / max(cpu / wall, 1e-9),
+        "ttft_p50_ms": statistics.median(ttfts) * 1000,
+        "ttft_p99_ms": percentile(ttfts, 99) * 1000,
+        "peak_threads": peak_threads,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--ttft", type=float, default=0.3, help="time to first token of the fake API")
+    parser.add_argument("--mode", choices=["threads", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.sessions, args.turns)))
+        return
+
+    fake, port = spawn("--ttft", args.ttft)
+    try:
+        env = dict(os.environ, **base_urls(port))
+        results = []
+        for mode in ("threads", "async"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--sessions", str(args.sessions), "--turns", str(args.turns)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        fake.terminate()
+
+    print(f"{args.sessions} concurrent sessions x {args.turns} turns, fake API time to first token {args.ttft * 1000:.0f} ms")
+    print(f"{'mode':>8} {'turns':>6} {'wall s':>7} {'cpu s':>6} {'sess/core':>10} {'ttft p50':>9} {'ttft p99':>9} {'threads':>8} {'rss MB':>7}")
+    for r in results:
+        print(f"{r['mode']:>8} {r['turns']:>6} {r['wall_s']:>7.2f} {r['cpu_s']:>6.2f} {r['sessions_per_core']:>10.0f} "
+              f"{r['ttft_p50_ms']:>8.0f}ms {r['ttft_p99_ms']:>8.0f}ms {r['peak_threads']:>8} {r['max_rss_mb']:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#bench_closing_codes.py - Compare the per-delta closing-code scan with the streaming matcher
+#
+# Usage (from the repository root): python benchmarks/bench_closing_codes.py
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from streaming import closing_code_automaton
+
+WORDS = "the visual made compound interest much easier to follow because I could see it grow".split()
+
+
+def make_deltas(n_chars, seed=0):
+    """Split a long, code-free reply into token-sized deltas."""
+    rng = random.Random(seed)
+    deltas, total = [], 0
+    while total < n_chars:
+        delta = " " + rng.choice(WORDS)
+        deltas.append(delta)
+        total += len(delta)
+    return deltas
+
+
+def scan_full_reply(deltas, codes):
+    """Current approach: rescan the whole accumulated reply on every delta and once after."""
+    reply = ""
+    for delta in deltas:
+        reply += delta
+        if any(code in reply for code in codes):
+            break
+    return any(code in reply for code in codes)
+
+
+def scan_incremental(deltas, codes):
+    matcher = closing_code_automaton(codes).matcher()
+    displayed = ""
+    for delta in deltas:
+        displayed += matcher.feed(delta)
+        if matcher.matched:
+            break
+    return matcher.matched is not None
+
+
+def best_of(function, *args, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    codes = list(config.CLOSING_MESSAGES.keys())
+    print(f"{'reply chars':>12} {'deltas':>8} {'full scan (ms)':>15} {'incremental (ms)':>17} {'speedup':>8}")
+    for n_chars in (1_000, 4_000, 16_000, 64_000):
+        deltas = make_deltas(n_chars)
+        assert scan_full_reply(deltas, codes) == scan_incremental(deltas, codes)
+        full = best_of(scan_full_reply, deltas, codes)
+        incremental = best_of(scan_incremental, deltas, codes)
+        print(f"{n_chars:>12} {len(deltas):>8} {full * 1000:>15.2f} {incremental * 1000:>17.2f} {full / incremental:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#bench_drive_service.py - Per-upload overhead of getting a Drive service, before and after caching
+#
+# Usage (from the repository root): python benchmarks/bench_drive_service.py
+# No network access is needed: a throwaway service account key is generated, and only the work
+# done before the upload request is sent (credentials, discovery, transport) is timed.
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.oauth2.service_account import Credentials
+from googleapiclient.discovery import build
+
+import drive
+
+UPLOADS = 20
+
+
+def write_fake_key(path):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    with open(path, "w") as f:
+        json.dump({
+            "type": "service_account",
+            "project_id": "benchmark",
+            "private_key_id": "0",
+            "private_key": pem,
+            "client_email": "benchmark@benchmark.iam.gserviceaccount.com",
+            "client_id": "0",
+            "token_uri": "https://oauth2.googleapis.com/token",
+        }, f)
+
+
+def legacy_setup():
+    """What every upload used to do: read the key file and build a new service."""
+    creds = Credentials.from_service_account_file(drive.KEY_PATH, scopes=drive.SCOPES)
+    service = build("drive", "v3", credentials=creds)
+    return service.files()
+
+
+def cached_setup():
+    service = drive.authenticate_google_drive()
+    drive.thread_http()
+    return service.files()
+
+
+def measure(setup):
+    timings = []
+    for _ in range(UPLOADS):
+        start = time.perf_counter()
+        setup()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[0], timings[len(timings) // 2], sum(timings) / len(timings)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        drive.KEY_PATH = os.path.join(tmp, "service-account.json")
+        write_fake_key(drive.KEY_PATH)
+        print(f"Overhead per upload over {UPLOADS} uploads (ms)")
+        print(f"{'':>8} {'min':>8} {'median':>8} {'mean':>8}")
+        for label, setup in (("before", legacy_setup), ("after", cached_setup)):
+            fastest, median, mean = measure(setup)
+            print(f"{label:>8} {fastest * 1000:>8.2f} {median * 1000:>8.2f} {mean * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
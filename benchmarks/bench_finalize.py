@@ -0,0 +1,114 @@
+#bench_finalize.py - End-of-interview latency: the old save/verify/rewrite loop vs. engine.finalize
+#
+# Usage (from the repository root): python benchmarks/bench_finalize.py [--repeat 20]
+#
+# For interviews of increasing length, measures the time from the closing code until the
+# participant's final screen is complete. The old path (as in the original interview.py and
+# utils.py) wrote the transcript, slept 0.1 s in its retry loop, checked the file size, read the
+# file back to check it was not "nearly empty", and rewrote it once more before uploading. The
+# engine renders the closing message first ("end" event), then writes the transcript once,
+# atomically, and hands it to the upload queue ("saved" event). Uploads are no-ops here.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config  # noqa: E402
+
+WORDS = "the chart showed how my savings would grow over ten years with compound interest".split()
+
+
+def configure(tmp):
+    config.TRANSCRIPTS_DIRECTORY = os.path.join(tmp, "transcripts")
+    config.BACKUPS_DIRECTORY = os.path.join(tmp, "backups")
+    config.SESSIONS_DIRECTORY = os.path.join(tmp, "sessions")
+    config.UPLOAD_QUEUE_DB = os.path.join(tmp, "upload_queue.sqlite3")
+    config.REGISTRY_DB = os.path.join(tmp, "registry.sqlite3")
+    config.METRICS_LOG = None
+    for directory in [config.TRANSCRIPTS_DIRECTORY, config.BACKUPS_DIRECTORY]:
+        os.makedirs(directory, exist_ok=True)
+
+
+def make_session(engine, turns, rng):
+    session = engine.start(register=False)
+    session.messages.append({"role": "system", "content": config.SYSTEM_PROMPT})
+    for _ in range(turns):
+        session.messages.append({"role": "assistant", "content": " ".join(rng.choices(WORDS, k=30)) + "?"})
+        session.messages.append({"role": "user", "content": " ".join(rng.choices(WORDS, k=rng.randint(20, 120)))})
+    # Journaled turn by turn while the interview ran
+    list(engine._backup(session))
+    return session
+
+
+def old_finalize(session, queue):
+    """The closing sequence of the original interview.py and utils.py."""
+    from journal import format_transcript
+    path = os.path.join(config.TRANSCRIPTS_DIRECTORY, f"{session.username}.txt")
+    text = format_transcript(session.messages, session.metadata())
+    stored = False
+    retries = 0
+    while not stored and retries < 10:
+        with open(path, "w") as t:
+            t.write(text)
+        stored = os.path.exists(path) and os.path.getsize(path) > 0
+        time.sleep(0.1)
+        retries += 1
+    with open(path, "r") as f:
+        if len(f.read().strip()) < 10:
+            raise RuntimeError("nearly empty")
+    # save_interview_data_to_drive rewrote the transcript before uploading it
+    with open(path, "w") as t:
+        t.write(format_transcript(session.messages, session.metadata()))
+    queue.enqueue(path, os.path.basename(path))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-of-interview latency of the old and the new finalization.")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure(tmp)
+        from engine import InterviewEngine
+        from upload_queue import get_upload_queue
+        queue = get_upload_queue()
+        queue.upload = lambda path, name, mimetype, upload_key: "fake-file-id"
+        engine = InterviewEngine("openai", "sk-benchmark")
+        rng = random.Random(0)
+
+        print(f"{'turns':>6} {'old: screen done':>17} {'new: closing shown':>19} {'new: saved':>11}   (p50 / p99 ms)")
+        for turns in (10, 30, 100):
+            old, shown, saved = [], [], []
+            for _ in range(args.repeat):
+                session = make_session(engine, turns, rng)
+                start = time.perf_counter()
+                old_finalize(session, queue)
+                old.append(time.perf_counter() - start)
+
+                session = make_session(engine, turns, rng)
+                start = time.perf_counter()
+                for event in engine._close(session, "x7y8", config.CLOSING_MESSAGES["x7y8"]):
+                    if event["type"] == "end":
+                        shown.append(time.perf_counter() - start)
+                    elif event["type"] == "saved":
+                        saved.append(time.perf_counter() - start)
+
+            def ms(values):
+                return f"{percentile(values, 50) * 1000:.1f} / {percentile(values, 99) * 1000:.1f}"
+            print(f"{turns:>6} {ms(old):>17} {ms(shown):>19} {ms(saved):>11}")
+        queue.stop()
+
+
+if __name__ == "__main__":
+    main()
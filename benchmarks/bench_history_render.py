@@ -0,0 +1,129 @@
+#bench_history_render.py - Cost of redrawing the chat history on a Streamlit rerun vs. interview length
+#
+# Usage (from the repository root): python benchmarks/bench_history_render.py [--repeat 20]
+#
+# For interviews of increasing length, measures (1) the history step alone: the original loop
+# over session.visible_messages(), which rebuilds the message list and scans every message for
+# closing codes on each rerun, vs. history.HistoryRenderer, which decides each message once and
+# then only looks at new ones; and (2) the history part of a page rerun in Streamlit's AppTest with
+# either version, including emitting the chat elements, which Streamlit requires on every rerun.
+# Pass --no-usage-stats to see how much of that is Streamlit's per-element usage statistics.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config  # noqa: E402
+
+WORDS = "the chart showed how my savings would grow over ten years with compound interest".split()
+
+
+def configure(tmp):
+    config.SESSIONS_DIRECTORY = os.path.join(tmp, "sessions")
+    config.REGISTRY_DB = os.path.join(tmp, "registry.sqlite3")
+    config.METRICS_LOG = None
+
+
+def make_session(engine, turns, rng):
+    session = engine.start(register=False)
+    session.messages.append({"role": "system", "content": config.SYSTEM_PROMPT})
+    for _ in range(turns):
+        session.messages.append({"role": "assistant", "content": " ".join(rng.choices(WORDS, k=40)) + "?"})
+        session.messages.append({"role": "user", "content": " ".join(rng.choices(WORDS, k=rng.randint(20, 120)))})
+    return session
+
+
+def old_history(session):
+    """The history decisions of the original interview.py, made again on every rerun."""
+    rendered = []
+    for message in session.visible_messages():
+        avatar = config.AVATAR_INTERVIEWER if message["role"] == "assistant" else config.AVATAR_RESPONDENT
+        rendered.append((message["role"], avatar, message["content"]))
+    return rendered
+
+
+def page(session, incremental):
+    """Page script for AppTest: the history followed by the chat input, as in interview.py."""
+    import time
+
+    import streamlit as st
+
+    import config
+    from history import HistoryRenderer
+
+    start = time.perf_counter()
+    if incremental:
+        if "history" not in st.session_state:
+            st.session_state.history = HistoryRenderer()
+        rendered = st.session_state.history.visible(session)
+    else:
+        rendered = []
+        for message in session.visible_messages():
+            avatar = config.AVATAR_INTERVIEWER if message["role"] == "assistant" else config.AVATAR_RESPONDENT
+            rendered.append((message["role"], avatar, message["content"]))
+    for role, avatar, content in rendered:
+        with st.chat_message(role, avatar=avatar):
+            st.markdown(content)
+    st.session_state.history_seconds = time.perf_counter() - start
+    st.chat_input("Your message here")
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rerun cost of the chat history: full replay vs. incremental renderer.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--no-usage-stats", action="store_true", help="turn off Streamlit usage statistics")
+    args = parser.parse_args()
+
+    from streamlit import config as st_config
+    from streamlit.testing.v1 import AppTest
+    if args.no_usage_stats:
+        st_config.set_option("browser.gatherUsageStats", False)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure(tmp)
+        from engine import InterviewEngine
+        from history import HistoryRenderer
+        engine = InterviewEngine("openai", "sk-benchmark")
+        rng = random.Random(0)
+
+        print(f"{'turns':>6} {'history: old':>13} {'history: new':>13} {'rerun: old':>11} {'rerun: new':>11}   (median ms)")
+        for turns in (10, 30, 100, 300):
+            session = make_session(engine, turns, rng)
+            renderer = HistoryRenderer()
+            assert renderer.visible(session) == old_history(session)
+            step_old = timed(lambda: old_history(session), args.repeat)
+            step_new = timed(lambda: renderer.visible(session), args.repeat)
+
+            reruns = {}
+            for incremental in (False, True):
+                at = AppTest.from_function(page, kwargs={"session": session, "incremental": incremental},
+                                           default_timeout=60)
+                at.run()
+                times = []
+                for _ in range(args.repeat):
+                    at.run()
+                    times.append(at.session_state.history_seconds)
+                reruns[incremental] = sorted(times)[len(times) // 2]
+                assert not at.exception and len(at.chat_message) == len(old_history(session))
+
+            print(f"{turns:>6} {step_old * 1000:>13.2f} {step_new * 1000:>13.2f} "
+                  f"{reruns[False] * 1000:>11.1f} {reruns[True] * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
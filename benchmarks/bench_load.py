@@ -0,0 +1,264 @@
+#bench_load.py - End-to-end load test: N concurrent interviews against the fake model API
+#
+# Usage (from the repository root):
+#   python benchmarks/bench_load.py [--sessions 50] [--questions 8] [--mode threads|async] [--provider openai|anthropic]
+#
+# Starts benchmarks/fake_llm.py, which asks the questions of config.MAIN_QUESTIONS and sends the
+# closing code after --questions answers, and runs --sessions interviews at the same time through
+# the real turn logic (engine.py or async_engine.py) with simulated respondents
+# (benchmarks/respondent.py). Each interview runs until the closing code, so journals, backups,
+# the final transcript and the upload queue (with a no-op uploader) are all exercised.
+# Reports throughput, latency percentiles, file I/O volume and memory per session.
+
+import argparse
+import asyncio
+import gc
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_llm import base_urls, spawn  # noqa: E402
+from respondent import SimulatedRespondent  # noqa: E402
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] if values else float("nan")
+
+
+def rss_mb():
+    """Current resident memory (falls back to the peak where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def io_counters():
+    """Bytes passed to read/write system calls by this process (Linux only)."""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return {"read": int(fields["rchar"]), "written": int(fields["wchar"]), "write_calls": int(fields["syscw"])}
+    except (OSError, KeyError):
+        return None
+
+
+def disk_usage(directory):
+    files, size = 0, 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, name))
+    return files, size
+
+
+def configure(tmp, sessions, spill_after):
+    import config
+    config.TRANSCRIPTS_DIRECTORY = os.path.join(tmp, "transcripts")
+    config.BACKUPS_DIRECTORY = os.path.join(tmp, "backups")
+    config.SESSIONS_DIRECTORY = os.path.join(tmp, "sessions")
+    config.OPENING_POOL_DIRECTORY = os.path.join(tmp, "openings")
+    config.OPENING_POOL_SIZE = 0  # always generate the opening live
+    config.UPLOAD_QUEUE_DB = os.path.join(tmp, "upload_queue.sqlite3")
+    config.RATE_LIMIT_DB = os.path.join(tmp, "rate_limit.sqlite3")
+    config.REGISTRY_DB = os.path.join(tmp, "registry.sqlite3")
+    config.RATE_LIMIT_REQUESTS_PER_MINUTE = config.RATE_LIMIT_TOKENS_PER_MINUTE = None
+    config.METRICS_LOG = os.path.join(tmp, "metrics", "turns.jsonl")
+    config.HTTP_MAX_CONNECTIONS = config.HTTP_MAX_KEEPALIVE_CONNECTIONS = sessions
+    config.SESSION_SPILL_AFTER = spill_after
+    for directory in [config.TRANSCRIPTS_DIRECTORY, config.BACKUPS_DIRECTORY]:
+        os.makedirs(directory, exist_ok=True)
+
+
+class Recorder:
+    """Collects the measurements of all interviews (thread-safe)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ttft, self.turn, self.finalize = [], [], []
+        self.turns = self.completed = self.errors = 0
+
+    def turn_done(self, ttft, duration, error):
+        with self.lock:
+            self.turns += 1
+            self.errors += error
+            self.turn.append(duration)
+            if ttft is not None:
+                self.ttft.append(ttft)
+
+    def interview_done(self, finalize):
+        with self.lock:
+            self.completed += 1
+            if finalize is not None:
+                self.finalize.append(finalize)
+
+
+class TurnClock:
+    """Times one turn from its events: first text, reply end and (at the end) the saved transcript."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.ttft = self.end = self.saved = None
+        self.message = ""
+        self.error = False
+
+    def event(self, event):
+        now = time.perf_counter()
+        if event["type"] == "delta" and self.ttft is None:
+            self.ttft = now - self.start
+        elif event["type"] == "error":
+            self.error = True
+        elif event["type"] == "end":
+            self.end = now
+            self.message = event["message"]
+        elif event["type"] == "saved":
+            self.saved = now
+
+    def record(self, recorder, session):
+        recorder.turn_done(self.ttft, (self.end or time.perf_counter()) - self.start, self.error)
+        if not session.active:
+            recorder.interview_done(self.saved - self.end if self.saved and self.end else None)
+
+
+def run_threads(engine, sessions, max_turns, think_time, recorder):
+    def interview(i):
+        respondent, pause = SimulatedRespondent(seed=i), random.Random(i)
+        session = engine.start(response_id=f"bench-{i}", username=f"bench_{i}", register=False)
+        message = None
+        for _ in range(max_turns):
+            clock = TurnClock()
+            for event in engine.stream_turn(session, message):
+                clock.event(event)
+            clock.record(recorder, session)
+            if not session.active:
+                break
+            time.sleep(pause.uniform(0, 2 * think_time))
+            message = respondent.answer(clock.message)
+        return session
+
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        return list(pool.map(interview, range(sessions)))
+
+
+def run_async(engine, sessions, max_turns, think_time, recorder):
+    async def interview(i):
+        respondent, pause = SimulatedRespondent(seed=i), random.Random(i)
+        session = engine.start(response_id=f"bench-{i}", username=f"bench_{i}", register=False)
+        message = None
+        for _ in range(max_turns):
+            clock = TurnClock()
+            async for event in engine.astream_turn(session, message):
+                clock.event(event)
+            clock.record(recorder, session)
+            if not session.active:
+                break
+            await asyncio.sleep(pause.uniform(0, 2 * think_time))
+            message = respondent.answer(clock.message)
+        return session
+
+    async def main():
+        return await asyncio.gather(*(interview(i) for i in range(sessions)))
+
+    return asyncio.run(main())
+
+
+def wait_for_uploads(queue, timeout=60):
+    deadline = time.monotonic() + timeout
+    while queue.stats()["depth"] and time.monotonic() < deadline:
+        time.sleep(0.1)
+    return queue.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test with the fake model API.")
+    parser.add_argument("--sessions", type=int, default=50, help="concurrent interviews")
+    parser.add_argument("--questions", type=int, default=8, help="respondent answers before the closing code")
+    parser.add_argument("--mode", choices=["threads", "async"], default="threads")
+    parser.add_argument("--provider", choices=["openai", "anthropic"], default="openai")
+    parser.add_argument("--ttft", type=float, default=0.3, help="time to first token of the fake API (seconds)")
+    parser.add_argument("--tokens-per-second", type=float, default=60)
+    parser.add_argument("--tokens", type=int, default=40, help="tokens per interviewer reply")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean respondent pause between turns (seconds)")
+    parser.add_argument("--spill-after", type=float, default=None,
+                        help="move finished sessions idle for this many seconds to disk before measuring memory (default: keep them)")
+    args = parser.parse_args()
+
+    fake, port = spawn(
+        "--ttft", args.ttft, "--tokens-per-second", args.tokens_per_second, "--tokens", args.tokens,
+        "--close-after", args.questions,
+    )
+    os.environ.update(base_urls(port))
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            configure(tmp, args.sessions, args.spill_after)
+            if args.mode == "threads":
+                from engine import InterviewEngine as Engine
+            else:
+                from async_engine import AsyncInterviewEngine as Engine
+            from upload_queue import get_upload_queue
+            queue = get_upload_queue()
+            # Reads the transcript like a real upload would, without any network call
+            queue.upload = lambda path, name, mimetype, upload_key: (open(path, "rb").read(), "fake-file-id")[1]
+            engine = Engine(args.provider, "sk-benchmark")
+            recorder = Recorder()
+            # Load the provider SDK and the tokenizer before the memory baseline
+            import clients
+            from context import count_text_tokens
+            clients.get_client(args.provider, "sk-benchmark")
+            count_text_tokens("warm up")
+
+            gc.collect()
+            rss_before, io_before = rss_mb(), io_counters()
+            wall = time.perf_counter()
+            run = run_threads if args.mode == "threads" else run_async
+            sessions = run(engine, args.sessions, args.questions + 2, args.think_time, recorder)
+            wall = time.perf_counter() - wall
+            uploads = wait_for_uploads(queue)
+            from session_store import get_session_store
+            store = get_session_store()
+            if args.spill_after is not None:
+                time.sleep(args.spill_after)
+                store.sweep()
+            store_stats = store.stats()
+            gc.collect()
+            rss_after, io_after = rss_mb(), io_counters()
+            files, disk_bytes = disk_usage(tmp)
+            queue.stop()
+            del sessions
+    finally:
+        fake.terminate()
+
+    ms = lambda values, q: percentile(values, q) * 1000  # noqa: E731
+    print(f"{args.sessions} concurrent {args.provider} interviews ({args.mode}), {args.questions} answers each, "
+          f"fake API: ttft {args.ttft * 1000:.0f} ms, {args.tokens} tokens at {args.tokens_per_second:.0f}/s")
+    print(f"Completed interviews:  {recorder.completed}/{args.sessions} ({recorder.errors} turn errors)")
+    print(f"Throughput:            {recorder.turns / wall:.1f} turns/s, {recorder.completed / wall * 60:.1f} interviews/min ({wall:.1f} s)")
+    print(f"Time to first token:   p50 {ms(recorder.ttft, 50):.0f} ms, p90 {ms(recorder.ttft, 90):.0f} ms, p99 {ms(recorder.ttft, 99):.0f} ms")
+    print(f"Turn time:             p50 {ms(recorder.turn, 50):.0f} ms, p90 {ms(recorder.turn, 90):.0f} ms, p99 {ms(recorder.turn, 99):.0f} ms")
+    if recorder.finalize:
+        print(f"End -> transcript:     p50 {ms(recorder.finalize, 50):.1f} ms, p99 {ms(recorder.finalize, 99):.1f} ms, mean {statistics.mean(recorder.finalize) * 1000:.1f} ms")
+    print(f"Uploads:               {uploads['done']} done, {uploads['failed']} failed, {uploads['depth']} still queued")
+    print(f"Files on disk:         {files} files, {disk_bytes / 1024:.0f} KiB ({disk_bytes / max(recorder.completed, 1) / 1024:.1f} KiB per interview)")
+    if io_before and io_after:
+        written = io_after["written"] - io_before["written"]
+        print(f"File and socket I/O:   {written / 2**20:.1f} MiB written in {io_after['write_calls'] - io_before['write_calls']} write calls, "
+              f"{(io_after['read'] - io_before['read']) / 2**20:.1f} MiB read")
+    print(f"Memory:                {rss_after - rss_before:.1f} MiB for {args.sessions} finished sessions "
+          f"({(rss_after - rss_before) * 1024 / args.sessions:.0f} KiB per session)")
+    print(f"Session store:         {store_stats['resident']} in memory ({store_stats['memory_bytes_per_session'] / 1024:.1f} KiB of messages "
+          f"and usage each), {store_stats['spilled']} moved to disk")
+
+
+if __name__ == "__main__":
+    main()
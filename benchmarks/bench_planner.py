@@ -0,0 +1,93 @@
+#bench_planner.py - Input tokens per turn with the full outline vs. the question planner
+#
+# Usage (from the repository root): python benchmarks/bench_planner.py [--sessions 50]
+#
+# Simulates interviews with benchmarks/respondent.py. Without the planner, the interviewer asks
+# the questions of config.MAIN_QUESTIONS in order with the full outline as system prompt; with it,
+# the interviewer asks the next focus of the plan and gets config.PLANNER_SYSTEM_PROMPT plus the
+# per-turn directive. For each, reports the input tokens per turn as estimated by
+# InterviewEngine.build_api_kwargs (the prompt-size part of the time to first token), turns per
+# interview, constructs covered at the end (planner.coverage) and the time to build a request
+# (including the plan).
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config  # noqa: E402
+from respondent import SimulatedRespondent  # noqa: E402
+
+FULL_SYSTEM_PROMPT = config.SYSTEM_PROMPT
+
+
+def configure(tmp):
+    config.SESSIONS_DIRECTORY = os.path.join(tmp, "sessions")
+    config.REGISTRY_DB = os.path.join(tmp, "registry.sqlite3")
+    config.METRICS_LOG = None
+
+
+def interview(engine, provider, use_planner, seed, max_turns=30):
+    """One simulated interview; returns (input tokens per turn, turns, constructs covered, request build seconds)."""
+    import planner
+    config.PLANNER = use_planner
+    config.SYSTEM_PROMPT = config.PLANNER_SYSTEM_PROMPT if use_planner else FULL_SYSTEM_PROMPT
+    respondent = SimulatedRespondent(seed=seed)
+    session = engine.start(register=False)
+    if provider == "openai":
+        session.messages.append({"role": "system", "content": config.SYSTEM_PROMPT})
+    session.messages.append({"role": "assistant", "content": config.OPENING_MESSAGE})
+    tokens, build_seconds = [], 0.0
+    for n in range(max_turns):
+        session.messages.append({"role": "user", "content": respondent.answer(session.messages[-1]["content"])})
+        turn = {"turn": n + 1}
+        start = time.perf_counter()
+        engine.build_api_kwargs(session, turn)
+        build_seconds += time.perf_counter() - start
+        if use_planner:
+            focus = planner.next_focus(list(session.messages))
+            if focus is None:
+                break
+            construct, kind = focus
+            question = next(text for c, k, text in planner.coverage_items() if c == construct and k == kind)
+        else:
+            if n >= len(config.MAIN_QUESTIONS):
+                break
+            question = config.MAIN_QUESTIONS[n]["text"]
+        tokens.append(turn["estimated_input_tokens"])
+        session.messages.append({"role": "assistant", "content": f"Thank you. {question}"})
+    covered = sum(planner.coverage(list(session.messages)).values())
+    return tokens, len(tokens), covered, build_seconds / max(1, len(tokens))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Input tokens per turn: full outline vs. question planner.")
+    parser.add_argument("--sessions", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure(tmp)
+        from engine import InterviewEngine
+        from planner import coverage_items
+        n_constructs = len(dict.fromkeys(c for c, _, _ in coverage_items()))
+        print(f"{'':<22} {'input tokens/turn':>18} {'turns':>6} {'covered':>8} {'request build':>14}")
+        for provider in ("openai", "anthropic"):
+            engine = InterviewEngine(provider, "sk-benchmark")
+            for use_planner in (False, True):
+                runs = [interview(engine, provider, use_planner, seed) for seed in range(args.sessions)]
+                label = f"{provider}, {'planner' if use_planner else 'full outline'}"
+                per_turn = statistics.mean(t for tokens, _, _, _ in runs for t in tokens)
+                turns = statistics.mean(n for _, n, _, _ in runs)
+                covered = statistics.mean(c for _, _, c, _ in runs)
+                build = statistics.mean(s for _, _, _, s in runs) * 1000
+                print(f"{label:<22} {per_turn:>18.0f} {turns:>6.1f} {covered:>5.1f}/{n_constructs} {build:>11.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#bench_replay.py - Replay runner against the local fake model API: concurrency and the reply cache
+#
+# Usage (from the repository root): python benchmarks/bench_replay.py [--transcripts 20] [--concurrency 8]
+#
+# Writes synthetic transcripts (see bench_analytics.py), starts benchmarks/fake_llm.py and replays
+# every interviewer turn with an OpenAI and an Anthropic model: once one case at a time, once with
+# --concurrency cases at once, and once more from the reply cache. Prints the per-configuration
+# report of replay.py (latency, output tokens, closing-code behavior) and the wall time of each run.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config  # noqa: E402
+from bench_analytics import write_corpus  # noqa: E402
+from fake_llm import base_urls, spawn  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay runner against the fake model API.")
+    parser.add_argument("--transcripts", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ttft", type=float, default=0.1, help="time to first token of the fake API (seconds)")
+    args = parser.parse_args()
+
+    fake, port = spawn("--ttft", args.ttft, "--tokens-per-second", 400, "--tokens", 40, "--close-after", 10)
+    os.environ.update(base_urls(port))
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            config.SESSIONS_DIRECTORY = os.path.join(tmp, "sessions")
+            config.RATE_LIMIT_DB = os.path.join(tmp, "rate_limit.sqlite3")
+            config.RATE_LIMIT_REQUESTS_PER_MINUTE = config.RATE_LIMIT_TOKENS_PER_MINUTE = None
+            config.METRICS_LOG = None
+            directory = os.path.join(tmp, "transcripts")
+            os.makedirs(directory)
+            write_corpus(directory, 0, args.transcripts, random.Random(0))
+
+            from replay import Configuration, ReplayRunner, ReplyCache, load_cases, report
+            cases = load_cases(directory)
+            configurations = [Configuration(f"{model} / config.py", provider, model, config.SYSTEM_PROMPT)
+                              for provider, model in [("openai", "gpt-4o-mini"), ("anthropic", "claude-3-5-sonnet-20240620")]]
+            print(f"{args.transcripts} transcripts, {len(cases)} interviewer turns per configuration")
+            for label, concurrency, cache_name in [("one at a time", 1, "sequential"),
+                                                   (f"{args.concurrency} at a time", args.concurrency, "concurrent"),
+                                                   ("rerun from the cache", args.concurrency, "concurrent")]:
+                runner = ReplayRunner("sk-benchmark", ReplyCache(os.path.join(tmp, f"{cache_name}.sqlite3")), concurrency)
+                print(f"\n== {label}")
+                for configuration in configurations:
+                    start = time.perf_counter()
+                    results = runner.run(configuration, cases)
+                    print("\n".join(report(configuration, results)))
+                    print(f"  wall time {time.perf_counter() - start:.2f} s")
+    finally:
+        fake.terminate()
+
+
+if __name__ == "__main__":
+    main()
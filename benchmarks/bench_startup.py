@@ -0,0 +1,97 @@
+#bench_startup.py - Import-time budget for the modules loaded by the app entry point
+#
+# Usage (from the repository root): python benchmarks/bench_startup.py [--budget-ms 100] [--runs 5]
+#
+# Runs `python -X importtime` on the local modules that interview.py imports (streamlit itself
+# is imported first, so its fixed cost is not counted), reports the slowest imports and exits
+# with status 1 if the median cost exceeds the budget or a lazily loaded library was imported.
+
+import argparse
+import ast
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINT = os.path.join(ROOT, "interview.py")
+
+STARTUP_BUDGET_MS = 100
+# Libraries that must only be imported when first used, not when the app starts
+LAZY_MODULES = ("googleapiclient", "google.oauth2", "google_auth_httplib2", "openai", "anthropic", "httpx")
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def local_imports(path):
+    """Top-level modules of this repository imported by the entry point."""
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            candidates = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            candidates = [node.module]
+        else:
+            continue
+        for name in candidates:
+            top = name.split(".")[0]
+            if os.path.exists(os.path.join(ROOT, f"{top}.py")) and top not in names:
+                names.append(top)
+    return names
+
+
+def run_importtime(modules):
+    code = "import streamlit\n" + "".join(f"import {name}\n" for name in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"Importing the app modules failed:\n{result.stderr}")
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, len(indent), int(self_us), int(cumulative_us)))
+    # Everything imported after streamlit is attributable to the app's own modules
+    streamlit_index = max(i for i, entry in enumerate(entries) if entry[0] == "streamlit" and entry[1] == 1)
+    return entries[streamlit_index + 1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    modules = local_imports(ENTRY_POINT)
+    totals = []
+    for _ in range(args.runs):
+        entries = run_importtime(modules)
+        # Top-level entries (indent of one) carry the cumulative cost of each import tree
+        totals.append(sum(cumulative for _, indent, _, cumulative in entries if indent == 1) / 1000)
+
+    print(f"App modules: {', '.join(modules)}")
+    print(f"Import time after streamlit: median {statistics.median(totals):.1f} ms over {args.runs} runs "
+          f"(budget {args.budget_ms:.0f} ms)")
+    print("Slowest imports (self time, last run):")
+    for name, _, self_us, _ in sorted(entries, key=lambda entry: -entry[2])[:10]:
+        print(f"  {self_us / 1000:>8.1f} ms  {name}")
+
+    failed = False
+    eager = sorted({name for name, *_ in entries if name.startswith(LAZY_MODULES)})
+    if eager:
+        print(f"FAIL: lazily loaded libraries imported at startup: {', '.join(eager[:10])}")
+        failed = True
+    if statistics.median(totals) > args.budget_ms:
+        print("FAIL: startup import time over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#fake_llm.py - Local stand-in for the model APIs' streaming endpoints, for load tests
+#
+# Usage (from the repository root): python benchmarks/fake_llm.py --port 8911 --ttft 0.3 --tokens-per-second 60
+# Then point the SDKs at it: OPENAI_BASE_URL=http://127.0.0.1:8911/v1, ANTHROPIC_BASE_URL=http://127.0.0.1:8911
+#
+# Serves POST /v1/chat/completions (OpenAI chunk format) and POST /v1/messages (Anthropic event
+# format) with stream=True, with a configurable time to first token, token rate and reply length.
+# Replies ask the interview questions of config.MAIN_QUESTIONS in order; with --close-after N,
+# the reply after the N-th respondent message is the closing code, so interviews end and are saved
+# like real ones. Costs nothing and needs no key.
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import tornado.ioloop
+import tornado.web
+from tornado.iostream import StreamClosedError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config  # noqa: E402
+
+WORDS = "Could you tell me more about how that visual helped you understand the topic".split()
+
+
+def message_text(content):
+    """Text of a message whose content is a string or a list of content blocks."""
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+def reply_tokens(options, messages):
+    """Tokens of the next interviewer reply for a request's messages."""
+    answers = sum(1 for m in messages if m.get("role") == "user" and message_text(m.get("content", "")) != "Hi")
+    if options.close_after and answers >= options.close_after:
+        return [options.closing_code]
+    question = config.MAIN_QUESTIONS[answers % len(config.MAIN_QUESTIONS)]["text"].split()
+    filler = [WORDS[i % len(WORDS)] for i in range(max(0, options.tokens - len(question)))]
+    words = filler + question
+    return [(" " if i else "") + word for i, word in enumerate(words)]
+
+
+def prompt_tokens(request):
+    text = message_text(request.get("system", ""))
+    return (len(text) + sum(len(message_text(m.get("content", ""))) for m in request.get("messages", []))) // 4
+
+
+class StreamingHandler(tornado.web.RequestHandler):
+    async def post(self):
+        try:
+            await self.stream(self.settings["options"], json.loads(self.request.body))
+        except StreamClosedError:
+            pass  # the client stopped reading, e.g. after a closing code
+
+
+class ChatCompletionsHandler(StreamingHandler):
+    async def stream(self, options, request):
+        created = int(time.time())
+
+        def chunk(delta, finish_reason=None, usage=None):
+            body = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": request.get("model", "fake"),
+                "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if usage is not None:
+                body["usage"] = usage
+            return f"data: {json.dumps(body)}\n\n"
+
+        self.set_header("Content-Type", "text/event-stream")
+        await asyncio.sleep(options.ttft)
+        tokens = reply_tokens(options, request.get("messages", []))
+        self.write(chunk({"role": "assistant", "content": ""}))
+        for token in tokens:
+            self.write(chunk({"content": token}))
+            await self.flush()
+            await asyncio.sleep(1 / options.tokens_per_second)
+        self.write(chunk({}, finish_reason="stop"))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            n_prompt = prompt_tokens(request)
+            self.write(chunk(None, usage={
+                "prompt_tokens": n_prompt,
+                "completion_tokens": len(tokens),
+                "total_tokens": n_prompt + len(tokens),
+            }))
+        self.write("data: [DONE]\n\n")
+        await self.flush()
+
+
+class MessagesHandler(StreamingHandler):
+    async def stream(self, options, request):
+
+        def event(name, data):
+            self.write(f"event: {name}\ndata: {json.dumps(dict(type=name, **data))}\n\n")
+
+        self.set_header("Content-Type", "text/event-stream")
+        await asyncio.sleep(options.ttft)
+        tokens = reply_tokens(options, request.get("messages", []))
+        event("message_start", {"message": {
+            "id": "msg_fake", "type": "message", "role": "assistant", "model": request.get("model", "fake"),
+            "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": prompt_tokens(request), "output_tokens": 1,
+                      "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0},
+        }})
+        event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+        for token in tokens:
+            event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": token}})
+            await self.flush()
+            await asyncio.sleep(1 / options.tokens_per_second)
+        event("content_block_stop", {"index": 0})
+        event("message_delta", {"delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": len(tokens)}})
+        event("message_stop", {})
+        await self.flush()
+
+
+def make_app(options):
+    return tornado.web.Application(
+        [(r"/v1/chat/completions", ChatCompletionsHandler), (r"/v1/messages", MessagesHandler)],
+        options=options,
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fake streaming model API for load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8911)
+    parser.add_argument("--ttft", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=60)
+    parser.add_argument("--tokens", type=int, default=40, help="tokens per reply")
+    parser.add_argument("--close-after", type=int, default=0, help="reply with the closing code after this many respondent messages (0: never)")
+    parser.add_argument("--closing-code", default="x7y8")
+    return parser.parse_args(argv)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn(*args):
+    """Start the fake API in a subprocess on a free port; returns (process, port) once it listens."""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--port", str(port), *map(str, args)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    process.stdout.readline()
+    return process, port
+
+
+def base_urls(port):
+    """Environment variables pointing both SDKs at a fake API on `port`."""
+    return {"OPENAI_BASE_URL": f"http://127.0.0.1:{port}/v1", "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{port}"}
+
+
+def main():
+    options = parse_args()
+    make_app(options).listen(options.port, options.host)
+    print(f"Fake model API on http://{options.host}:{options.port}/v1", flush=True)
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == "__main__":
+    main()
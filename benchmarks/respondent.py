@@ -0,0 +1,97 @@
+#respondent.py - Simulated interview respondent for load tests
+#
+# Answers the interviewer's questions with plausible free text: the question is matched to the
+# closest entry of config.MAIN_QUESTIONS and the answer is built from phrases about its
+# constructs, padded to a random length. Deterministic for a given seed.
+
+import os
+import random
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config  # noqa: E402
+
+CONSTRUCT_PHRASES = {
+    "context": [
+        "I mostly used YouTube videos and a budgeting app when I was trying to understand my student loans.",
+        "A friend recommended a personal finance blog, and I also read the guides from my bank.",
+    ],
+    "visualization": [
+        "There was a chart showing how the balance grows every year, with the interest in a different color.",
+        "The app had a pie chart of my spending categories that updated every month.",
+    ],
+    "interest": [
+        "The animation made it feel like a story instead of a table of numbers, so I remembered it.",
+        "It was surprising to see how big the difference was, and that caught my attention.",
+    ],
+    "engagement": [
+        "Yes, I ended up watching a few more videos on investing afterwards.",
+        "It made me curious enough to try the calculator with my own numbers.",
+    ],
+    "comprehension": [
+        "Seeing the curve bend upward made compound interest click for me in a way the formula never did.",
+        "The visual broke the topic into steps, so I could follow where the money was going.",
+    ],
+    "self_regulated_learning": [
+        "It showed me what I did not understand yet, so I looked up how index funds work next.",
+        "I used it to decide which topic to read about first and which to skip.",
+    ],
+    "preference": [
+        "I usually prefer visuals first and then text for the details.",
+        "Short videos work best for me, but I like to have a written summary as well.",
+    ],
+    "difficulty": [
+        "Some charts had too many lines and no labels, so I could not tell what they compared.",
+        "A graph with a logarithmic axis confused me until someone explained it.",
+    ],
+    "adaptation": [
+        "I used to skip charts, but now I look at them first to get the big picture.",
+        "Over time I started pausing videos to study the graphs instead of just listening.",
+    ],
+    "application": [
+        "A retirement calculator chart convinced me to increase my monthly contribution.",
+        "Comparing two loan offers side by side in a chart helped me pick the cheaper one.",
+    ],
+    "design": [
+        "Ideally it would be interactive, with a slider for the interest rate and the number of years.",
+        "Simple colors, clear labels and a short explanation next to the chart would be ideal.",
+    ],
+}
+FILLER = [
+    "I am not completely sure, but that is how I remember it.",
+    "It was a while ago, so some details are fuzzy.",
+    "That is probably the best example I can think of.",
+    "I think that experience shaped how I approach these topics now.",
+]
+
+
+def _words(text):
+    return set(re.findall(r"[a-z]+", text.lower()))
+
+
+class SimulatedRespondent:
+    """Answers interview questions from config.MAIN_QUESTIONS with construct-specific phrases."""
+
+    def __init__(self, seed=None, min_words=15, max_words=80):
+        self.random = random.Random(seed)
+        self.min_words = min_words
+        self.max_words = max_words
+        self.answers = 0
+
+    def match_question(self, question):
+        """The entry of config.MAIN_QUESTIONS whose words appear most completely in `question`."""
+        words = _words(question)
+        return max(config.MAIN_QUESTIONS, key=lambda q: len(words & _words(q["text"])) / len(_words(q["text"])))
+
+    def answer(self, question):
+        """An answer to the interviewer's latest message."""
+        self.answers += 1
+        constructs = self.match_question(question)["constructs"]
+        sentences = [self.random.choice(CONSTRUCT_PHRASES.get(c, FILLER)) for c in constructs]
+        target = self.random.randint(self.min_words, self.max_words)
+        while len(" ".join(sentences).split()) < target:
+            sentences.append(self.random.choice(FILLER))
+        return " ".join(sentences)
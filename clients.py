@@ -0,0 +1,178 @@
+#clients.py - Process-wide pooled LLM API clients shared across sessions and reruns
+
+import atexit
+import hashlib
+import threading
+import time
+import weakref
+
+import config
+
+# httpx and the provider SDKs are imported lazily, when the first client is built
+
+# One pooled client per (provider, API key) for the whole process. Streamlit re-executes
+# interview.py on every interaction, but imported modules stay cached, so this registry
+# (and the keep-alive connections inside it) survives reruns and is shared by all sessions.
+_registry_lock = threading.Lock()
+_registry = {}
+_async_registry = weakref.WeakKeyDictionary()  # event loop -> {key: async client}
+_prewarmed = set()
+
+
+class PooledClient:
+    """A provider SDK client bound to its own tuned httpx connection pool."""
+
+    def __init__(self, provider, client, http_client):
+        self.provider = provider
+        self.client = client
+        self.http_client = http_client
+        self.created_at = time.monotonic()
+        self.consecutive_failures = 0
+        self.lock = threading.Lock()
+
+    def is_healthy(self):
+        """False once the client is too old or has failed too often in a row."""
+        if time.monotonic() - self.created_at > config.HTTP_CLIENT_MAX_AGE:
+            return False
+        return self.consecutive_failures < config.HTTP_CLIENT_MAX_FAILURES
+
+    def retire(self):
+        """Close the connection pool after a grace period so in-flight streams can finish.
+
+        The grace is at least HTTP_TIMEOUT: a stream still waiting on the server must not have
+        its connection closed under it before its own timeout would have ended it.
+        """
+        grace = max(config.HTTP_CLIENT_RETIRE_GRACE, config.HTTP_TIMEOUT)
+        timer = threading.Timer(grace, self.http_client.close)
+        timer.daemon = True
+        timer.start()
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _build_http_client(asynchronous=False):
+    """Create an httpx client with connection limits and keep-alive tuned for streaming."""
+    import httpx
+    limits = httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(config.HTTP_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT)
+    client_class = httpx.AsyncClient if asynchronous else httpx.Client
+    return client_class(
+        limits=limits,
+        timeout=timeout,
+        http2=config.HTTP2 and _http2_available(),
+        follow_redirects=True,
+    )
+
+
+def _build_client(provider, api_key, http_client, asynchronous=False):
+    if provider == "openai":
+        from openai import AsyncOpenAI, OpenAI
+        return (AsyncOpenAI if asynchronous else OpenAI)(api_key=api_key, http_client=http_client)
+    elif provider == "anthropic":
+        import anthropic
+        return (anthropic.AsyncAnthropic if asynchronous else anthropic.Anthropic)(api_key=api_key, http_client=http_client)
+    raise ValueError(f"Unknown API provider: {provider}")
+
+
+def registry_key(provider, api_key):
+    # Never keep raw API keys as dictionary keys
+    return provider, hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def _get_entry(provider, api_key):
+    key = registry_key(provider, api_key)
+    with _registry_lock:
+        entry = _registry.get(key)
+        if entry is not None and not entry.is_healthy():
+            entry.retire()
+            entry = None
+        if entry is None:
+            http_client = _build_http_client()
+            entry = PooledClient(provider, _build_client(provider, api_key, http_client), http_client)
+            _registry[key] = entry
+        return entry
+
+
+def get_client(provider, api_key):
+    """Return the shared, thread-safe client for a provider and API key."""
+    return _get_entry(provider, api_key).client
+
+
+def get_async_client(provider, api_key):
+    """Return the shared async client for a provider and API key on the running event loop.
+
+    Async connections belong to the loop that opened them, so there is one pool per loop.
+    """
+    import asyncio
+    loop = asyncio.get_running_loop()
+    key = registry_key(provider, api_key)
+    with _registry_lock:
+        clients = _async_registry.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = _build_client(provider, api_key, _build_http_client(asynchronous=True), asynchronous=True)
+            clients[key] = client
+        return client
+
+
+def report_success(provider, api_key):
+    """Reset the failure counter after a successful call."""
+    entry = _registry.get(registry_key(provider, api_key))
+    if entry is not None:
+        with entry.lock:
+            entry.consecutive_failures = 0
+
+
+def report_failure(provider, api_key, error):
+    """Count connection-level failures so a broken pool gets recycled on the next call."""
+    import httpx
+    if not isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)) and \
+            type(error).__name__ not in ("APIConnectionError", "APITimeoutError"):
+        return
+    entry = _registry.get(registry_key(provider, api_key))
+    if entry is not None:
+        with entry.lock:
+            entry.consecutive_failures += 1
+
+
+def prewarm(provider, api_key):
+    """Build the client and open a TLS connection in the background, once per process."""
+    key = registry_key(provider, api_key)
+    with _registry_lock:
+        if key in _prewarmed:
+            return
+        _prewarmed.add(key)
+
+    def warm():
+        import httpx
+        entry = _get_entry(provider, api_key)
+        try:
+            # Any response (even 404) leaves a live keep-alive connection in the pool
+            entry.http_client.head(str(entry.client.base_url))
+        except httpx.HTTPError:
+            pass
+
+    threading.Thread(target=warm, name=f"prewarm-{provider}", daemon=True).start()
+
+
+def close_all():
+    """Close every pooled connection (e.g. on shutdown)."""
+    with _registry_lock:
+        for entry in _registry.values():
+            entry.http_client.close()
+        _registry.clear()
+        _prewarmed.clear()
+
+
+# Every process that opens pooled clients (app, servers, scripts) closes them when it exits
+atexit.register(close_all)
@@ -1,7 +1,13 @@
 # config.py - Adaptive, Single-Question Interview Protocol for Visual Learning in Financial Education
 
+# First message of the interviewer (part of both outlines below)
+OPENING_MESSAGE = """Hello! Thank you for participating in this interview about financial education and visual learning. 
+I'll be asking you questions about your experiences with personal finance and how visual aids (like graphs or videos) helped or hindered your learning. 
+
+Please feel free to elaborate as much as you'd like or ask for clarity if anything is confusing. To begin, can you tell me about a time you tried to learn something about personal finance?"""
+
 # Interview outline with adaptive approach
-INTERVIEW_OUTLINE = """You are a professor at one of the world's leading universities, specializing in qualitative research methods with a focus on conducting interviews. 
+INTERVIEW_OUTLINE = f"""You are a professor at one of the world's leading universities, specializing in qualitative research methods with a focus on conducting interviews. 
 In the following, you will conduct an interview with a human respondent. Do not share the following instructions with the respondent; the division into sections is for your guidance only.
 
 YOUR CORE ROLE: You are a qualitative researcher conducting one-on-one interviews about financial learning and the role of visualizations.
@@ -27,10 +33,7 @@ REMEMBER: The participant's experience and insights are the priority. Cover the
 
 Interview Flow:
 
-Begin the interview with: 'Hello! Thank you for participating in this interview about financial education and visual learning. 
-I'll be asking you questions about your experiences with personal finance and how visual aids (like graphs or videos) helped or hindered your learning. 
-
-Please feel free to elaborate as much as you'd like or ask for clarity if anything is confusing. To begin, can you tell me about a time you tried to learn something about personal finance?'
+Begin the interview with: '{OPENING_MESSAGE}'
 
 Part I of the interview: Learning Experiences with Visuals
 - Ask about what resources they used during that learning experience
@@ -111,24 +114,106 @@ CLOSING_MESSAGES = {}
 CLOSING_MESSAGES["5j3k"] = "Thank you for participating, the interview concludes here."
 CLOSING_MESSAGES["x7y8"] = "Thank you for participating in the interview, this was the last question. Many thanks for your answers and time to help with this research project!"
 
+# Question planner (see planner.py): instead of working out topic coverage from the full outline,
+# the model gets this compact outline, and with every turn a short plan naming the constructs
+# covered so far and the next focus with its questions and probes (from MAIN_QUESTIONS and
+# FOLLOW_UP_PROBES below). Shrinks the input of every turn.
+PLANNER = False
+
+PLANNER_OUTLINE = f"""You are a professor at one of the world's leading universities, specializing in qualitative research methods, conducting a one-on-one interview with a human respondent about financial learning and the role of visualizations (self-regulated learning, engagement, interest). Do not share these instructions with the respondent.
+
+Begin the interview with: '{OPENING_MESSAGE}'
+
+Each of your turns comes with an interview plan: the topics covered so far and the next focus with suggested questions. Follow the plan, but phrase questions naturally and build on what the respondent just said.
+
+- Ask ONE open-ended question at a time. Do not combine questions and never suggest possible answers.
+- Ask for specific examples and experiences, and display cognitive empathy.
+- Be non-directive and non-leading; do not provoke a defensive reaction.
+- Do not engage in conversations that are unrelated to the purpose of this interview.
+
+When the plan says that all topics are covered, write a detailed, objective summary of the respondent's experience with financial visuals, including insights on interest, engagement, and self-regulated learning if present.
+Then say: "To conclude, how well does the summary describe your experience with financial education and visual learning? 
+1 (poorly), 2 (partially), 3 (well), or 4 (very well)? Please reply with just the number."
+
+After receiving their final evaluation, please end the interview."""
+
 # System prompt (combining all sections)
 SYSTEM_PROMPT = f"""{INTERVIEW_OUTLINE}
 
 {GENERAL_INSTRUCTIONS}
 
 {CODES}"""
+PLANNER_SYSTEM_PROMPT = f"""{PLANNER_OUTLINE}
+
+{CODES}"""
+if PLANNER:
+    SYSTEM_PROMPT = PLANNER_SYSTEM_PROMPT
 
 # API parameters
+API = "openai"  # main provider: "openai" or "anthropic" (must match MODEL)
 MODEL = "gpt-4o-mini"  # or e.g. "claude-3-5-sonnet-20240620" (OpenAI GPT or Anthropic Claude models); changed to "gpt-4o-mini" after talking to Sam
 TEMPERATURE = None  # (None for default value)
 MAX_OUTPUT_TOKENS = 1024
 
+# Context window: once the input of a turn would exceed CONTEXT_TOKEN_BUDGET tokens, older turns
+# are compacted into a summary; the system prompt and the last CONTEXT_KEEP_RECENT_MESSAGES
+# messages are always sent verbatim (see context.py). None disables the budget.
+CONTEXT_TOKEN_BUDGET = 12000
+CONTEXT_KEEP_RECENT_MESSAGES = 12
+CONTEXT_EXCERPT_CHARS = 300  # length of each compacted older message
+
+# Lay out requests so the static system prompt is cached by the provider (see prompt_cache.py)
+PROMPT_CACHING = True
+
+# HTTP connection pool shared by all sessions of a server process (see clients.py)
+HTTP2 = True  # used only if the optional 'h2' package is installed
+HTTP_MAX_CONNECTIONS = 200
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 50
+HTTP_KEEPALIVE_EXPIRY = 120  # seconds an idle connection is kept open
+HTTP_TIMEOUT = 600  # seconds (streams can be long)
+HTTP_CONNECT_TIMEOUT = 10
+HTTP_CLIENT_MAX_AGE = 6 * 3600  # recycle the pool after this many seconds
+HTTP_CLIENT_MAX_FAILURES = 3  # recycle after this many connection errors in a row
+HTTP_CLIENT_RETIRE_GRACE = HTTP_TIMEOUT  # seconds before a recycled pool is closed; never less than HTTP_TIMEOUT
+
+# Rate limits of each provider's API account, shared by all app processes on this machine (see
+# rate_limit.py). Set them a little below the provider limits; None disables a limit.
+RATE_LIMIT_DB = "../data/rate_limit.sqlite3"
+RATE_LIMIT_REQUESTS_PER_MINUTE = 500
+RATE_LIMIT_TOKENS_PER_MINUTE = 200000
+RATE_LIMIT_MAX_RETRIES = 5  # retries of a turn rejected with 429/overloaded before it fails
+RATE_LIMIT_RETRY_BASE = 1  # seconds; doubled on each retry, with jitter
+RATE_LIMIT_RETRY_MAX = 30
+
+# Failover (see router.py): if the main provider fails, turns continue with the first of these
+# whose API key is set (in .streamlit/secrets.toml or as an environment variable)
+FALLBACK_PROVIDERS = [
+    {"provider": "anthropic", "model": "claude-3-5-sonnet-20240620", "api_key_secret": "ANTHROPIC_API_KEY"},
+]
+PROVIDER_MAX_FAILURES = 3  # failed calls in a row before a provider is skipped
+PROVIDER_COOLDOWN = 60  # seconds a failing provider is skipped
+# Hedging: if no first token has arrived after HEDGE_AFTER seconds, also ask the next provider and
+# keep whichever answers first (costs a second request for slow turns; None disables hedging)
+HEDGE_AFTER = None
+
+# Turn metrics (see metrics.py): Prometheus text on http://127.0.0.1:METRICS_PORT/metrics (None
+# disables the endpoint) and one JSON record per turn in METRICS_LOG, rotated by size
+METRICS_PORT = 9464
+METRICS_LOG = "../data/metrics/turns.jsonl"
+METRICS_LOG_MAX_BYTES = 10 * 1024 * 1024
+METRICS_LOG_BACKUPS = 5
+
 # For OpenAI, we need to adapt how we handle the system prompt
 # The system prompt needs to be the content of a system message
 # This is handled in the interview.py file with:
 # if api == "openai":
 #     st.session_state.messages.append({"role": "system", "content": config.SYSTEM_PROMPT})
 
+# Rendering of streamed replies: send a frame at most every RENDER_INTERVAL_MS milliseconds,
+# or earlier once RENDER_MAX_PENDING_CHARS new characters are waiting (see streaming.py)
+RENDER_INTERVAL_MS = 50
+RENDER_MAX_PENDING_CHARS = 200
+
 # Display login screen with usernames and simple passwords for studies
 LOGINS = False
 
@@ -136,6 +221,70 @@ LOGINS = False
 TRANSCRIPTS_DIRECTORY = "../data/transcripts/"
 TIMES_DIRECTORY = "../data/times/"
 BACKUPS_DIRECTORY = "../data/backups/"
+SESSIONS_DIRECTORY = "../data/sessions/"  # idle sessions moved out of memory (see session_store.py)
+# Registry of interviews (see registry.py): unique usernames, resumption by Qualtrics response ID
+# and completed interviews. Shared by the app processes of one machine; with several machines,
+# serve it from one of them (python registry.py --serve) and set REGISTRY_URL on all of them
+REGISTRY_DB = "../data/registry.sqlite3"
+REGISTRY_URL = None  # e.g. "http://10.0.0.5:8765"
+REGISTRY_TIMEOUT = 10  # seconds
+# Shared secret the registry service requires in the X-Registry-Secret header of every call; set
+# the same long random value on all machines. The service has no TLS, so bind it to a private
+# interface (e.g. --host 10.0.0.5), never to one reachable from the internet
+REGISTRY_SECRET = None
+
+# Columnar store of parsed transcripts for batch analytics (see analytics.py)
+ANALYTICS_STORE = "../data/analytics/transcripts.npz"
+ANALYTICS_WORKERS = None  # parser processes (None: one per core)
+ANALYTICS_MATCH_THRESHOLD = 0.6  # share of a question's keywords an interviewer turn must contain to count as asking it
+
+# Replays of recorded interviews against other models and outlines (see replay.py)
+REPLAY_CACHE_DB = "../data/replay_cache.sqlite3"
+REPLAY_CONCURRENCY = 8  # model calls at once
+
+# Pre-generated opening messages, served instead of a live first turn (see openers.py)
+OPENING_POOL_DIRECTORY = "../data/openings/"
+OPENING_POOL_SIZE = 20
+
+# Per-session journals in BACKUPS_DIRECTORY (see journal.py): fsync after this many records
+# or seconds, whichever comes first, and keep at most this many journal files open per process
+JOURNAL_FSYNC_EVERY = 8
+JOURNAL_FSYNC_INTERVAL = 2.0
+JOURNAL_MAX_OPEN = 256
+
+# Session memory (see session_store.py): interviews without any interaction for this many seconds
+# (e.g. abandoned browser tabs) are moved to SESSIONS_DIRECTORY and reloaded when the respondent
+# returns; checked every SESSION_SPILL_CHECK_INTERVAL seconds. None keeps all sessions in memory.
+SESSION_SPILL_AFTER = 600
+SESSION_SPILL_CHECK_INTERVAL = 60
+# With the same check, engines drop finished sessions idle for SESSION_FINISHED_RETENTION seconds
+# (their final state stays readable over the HTTP service until then) and any session idle for
+# SESSION_EVICT_AFTER seconds (a participant with a UID who returns later continues from the
+# journal). None keeps them for the life of the process.
+SESSION_FINISHED_RETENTION = 300
+SESSION_EVICT_AFTER = 6 * 3600
+
+# Background Google Drive uploads (see upload_queue.py)
+UPLOAD_QUEUE_DB = "../data/upload_queue.sqlite3"
+UPLOAD_WORKERS = 2  # concurrent uploads per app process
+UPLOAD_MAX_ATTEMPTS = 8
+UPLOAD_BACKOFF_BASE = 2  # seconds before the first retry, doubled for each further attempt
+UPLOAD_BACKOFF_MAX = 300
+UPLOAD_LEASE_SECONDS = 300  # an upload still running after this long is assumed lost and retried
+UPLOAD_POLL_INTERVAL = 5
+UPLOAD_CHUNK_SIZE = 8 * 2**20  # bytes per request of a resumable upload (a multiple of 256 KiB)
+
+# Archive mode (see archive.py): instead of one Drive upload per interview, finished transcripts
+# (and with ARCHIVE_BACKUPS their journals) are bundled into one .tar.gz once the oldest has waited
+# ARCHIVE_WINDOW seconds or ARCHIVE_MAX_BYTES are pending. Journals are deleted locally once the
+# archive containing them was uploaded and verified.
+ARCHIVE = False
+ARCHIVE_BACKUPS = True
+ARCHIVE_DIRECTORY = "../data/archives/"
+ARCHIVE_DB = "../data/archive.sqlite3"  # manifest: which archive holds each transcript
+ARCHIVE_WINDOW = 3600
+ARCHIVE_MAX_BYTES = 64 * 2**20  # uncompressed
+ARCHIVE_CHECK_INTERVAL = 60
 
 # Avatars displayed in the chat interface
 AVATAR_INTERVIEWER = "\U0001F393"
@@ -176,3 +325,22 @@ FOLLOW_UP_PROBES = {
     "adaptation": "Can you give an example of how you've changed your approach?",
     "design": "Are there any specific visual features you'd want included (like color, animation, interactivity)?"
 }
+
+# Keywords of each construct in respondent messages, for the question planner (matched as word
+# prefixes, so "understand" also matches "understanding"). A construct counts as covered once the
+# respondent used PLANNER_MIN_KEYWORD_HITS different keywords of it, or answered one of its questions.
+CONSTRUCT_KEYWORDS = {
+    "context": ["resource", "video", "youtube", "book", "blog", "article", "course", "class", "budgeting app", "calculator", "website", "podcast", "bank", "advisor", "guide"],
+    "visualization": ["visual", "chart", "graph", "diagram", "infographic", "picture", "image", "plot", "animation", "illustrat"],
+    "interest": ["interesting", "interested", "memorable", "remember", "caught", "attention", "surpris", "enjoy", "curious", "stood out", "fascinat"],
+    "engagement": ["motivat", "engag", "kept", "keep going", "wanted to learn", "more videos", "explore", "hooked", "continue"],
+    "comprehension": ["understand", "clear", "click", "made sense", "grasp", "follow", "explain", "realiz"],
+    "self_regulated_learning": ["next", "decide", "plan", "focus", "goal", "study", "track", "figure", "look up", "looked up"],
+    "preference": ["prefer", "usually", "rather", "favorite", "like better", "works best", "text"],
+    "difficulty": ["struggl", "difficult", "hard", "confus", "complicated", "misleading", "too many", "overwhelm"],
+    "adaptation": ["changed", "used to", "over time", "anymore", "nowadays", "these days", "started", "approach"],
+    "application": ["decision", "decided", "invest", "saving", "budget", "loan", "retirement", "chose", "contribution", "debt"],
+    "design": ["ideal", "interactive", "slider", "color", "label", "design", "simple", "feature", "customiz"],
+}
+PLANNER_MIN_KEYWORD_HITS = 2
+PLANNER_QUESTION_MATCH = 0.6  # share of a question's keywords an interviewer message must contain to count as asking it
@@ -0,0 +1,87 @@
+#context.py - Token-budgeted context window for long interviews
+#
+# The system prompt and the most recent messages are always sent verbatim. Once the whole
+# history exceeds the input token budget, older turns are compacted into a single summary
+# message of short excerpts (oldest excerpts are dropped first if that is still too long).
+
+import math
+from functools import lru_cache
+
+import config
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character-based estimate
+    tiktoken = None
+
+MESSAGE_OVERHEAD_TOKENS = 4  # role and separators per message
+SUMMARY_HEADER = ("Summary of the earlier part of this interview (older turns are shortened; "
+                  "continue from the most recent messages):")
+ROLE_LABELS = {"assistant": "Interviewer", "user": "Respondent"}
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(config.MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+@lru_cache(maxsize=65536)
+def count_text_tokens(text):
+    """Tokens in a text, cached by content (so each message is only counted once)."""
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(message):
+    return count_text_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _excerpt(message, max_chars):
+    content = " ".join(message["content"].split())
+    if len(content) > max_chars:
+        content = content[:max_chars].rstrip() + "…"
+    return f"{ROLE_LABELS.get(message['role'], message['role'])}: {content}"
+
+
+def fit_to_budget(messages, budget=None, keep_recent=None, reserved_tokens=0):
+    """Return (messages to send, input tokens) for a history under the input token budget.
+
+    `reserved_tokens` counts input sent outside `messages` (e.g. Anthropic's `system`).
+    """
+    budget = config.CONTEXT_TOKEN_BUDGET if budget is None else budget
+    keep_recent = config.CONTEXT_KEEP_RECENT_MESSAGES if keep_recent is None else keep_recent
+
+    total = reserved_tokens + sum(count_message_tokens(m) for m in messages)
+    if budget is None or total <= budget:
+        return list(messages), total
+
+    n_head = 0
+    while n_head < len(messages) and messages[n_head]["role"] == "system":
+        n_head += 1
+    head, rest = messages[:n_head], messages[n_head:]
+    split = max(len(rest) - keep_recent, 0)
+    # Let the verbatim part start with a respondent message (required by Anthropic)
+    while split > 0 and split < len(rest) and rest[split]["role"] != "user":
+        split -= 1
+    if split == 0:
+        return list(messages), total
+    older, recent = rest[:split], rest[split:]
+
+    fixed = reserved_tokens + sum(count_message_tokens(m) for m in head + recent)
+    lines = [_excerpt(m, config.CONTEXT_EXCERPT_CHARS) for m in older]
+    line_tokens = [count_text_tokens(line) + 1 for line in lines]
+    summary_tokens = count_text_tokens(SUMMARY_HEADER) + MESSAGE_OVERHEAD_TOKENS + sum(line_tokens)
+    first = 0
+    while first < len(lines) and fixed + summary_tokens > budget:
+        summary_tokens -= line_tokens[first]
+        first += 1
+
+    summary = {"role": "system", "content": "\n".join([SUMMARY_HEADER] + lines[first:])}
+    return head + [summary] + recent, fixed + summary_tokens
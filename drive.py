@@ -0,0 +1,152 @@
+#drive.py - Google Drive access with a cached, process-wide service object
+
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+
+import config
+
+# The Google client libraries are slow to import and only needed when an interview ends,
+# so they are imported inside the functions below rather than at module load.
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ['https://www.googleapis.com/auth/drive.file']
+FOLDER_ID = "1-y9bGuI0nmK22CPXg804U5nZU3gA--lV"  # Your Google Drive folder ID
+KEY_PATH = "/etc/secrets/service-account.json"
+# Files of this size or larger (e.g. archives, see archive.py) are sent with a resumable upload in
+# chunks of config.UPLOAD_CHUNK_SIZE; smaller ones with a single multipart request.
+RESUMABLE_MIN_BYTES = 256 * 1024
+
+# The service (parsed discovery document) and credentials are built once per process. httplib2
+# is not thread-safe, so every thread executes requests over its own authorized transport; all
+# transports share the same credentials and therefore the same access token and its refreshes.
+_service = None
+_credentials = None
+_service_lock = threading.Lock()
+_thread_local = threading.local()
+# Resumable uploads that failed part-way, by upload key: a retry continues from the last chunk
+# Drive confirmed instead of sending the whole file again
+_resumable = {}
+_resumable_lock = threading.Lock()
+
+
+def get_credentials():
+    """Load the service account credentials once per process."""
+    global _credentials
+    from google.oauth2.service_account import Credentials
+    with _service_lock:
+        if _credentials is None:
+            if not os.path.exists(KEY_PATH):
+                raise FileNotFoundError("Google Drive credentials file not found!")
+            _credentials = Credentials.from_service_account_file(KEY_PATH, scopes=SCOPES)
+        return _credentials
+
+
+def authenticate_google_drive():
+    """Return the cached Google Drive service, building it on first use."""
+    global _service
+    from googleapiclient.discovery import build
+    credentials = get_credentials()
+    with _service_lock:
+        if _service is None:
+            # Bundled (static) discovery document: no discovery fetch, parsed only once
+            _service = build("drive", "v3", credentials=credentials, static_discovery=True, cache_discovery=False)
+        return _service
+
+
+def thread_http():
+    """This thread's authorized HTTP transport (pass to `request.execute(http=...)`)."""
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        import google_auth_httplib2
+        import httplib2
+        http = google_auth_httplib2.AuthorizedHttp(get_credentials(), http=httplib2.Http(timeout=60))
+        _thread_local.http = http
+    return http
+
+
+def upload_file_to_drive(service, file_path, file_name, mimetype='text/plain', upload_key=None):
+    """Upload a file to a specific Google Drive folder.
+
+    With an `upload_key`, a file uploaded earlier under the same key is reused instead of
+    creating a duplicate, so retries are idempotent, and a failed resumable upload is continued.
+    """
+    from googleapiclient.http import MediaIoBaseUpload
+    http = thread_http()
+    if upload_key is not None:
+        existing = service.files().list(
+            q=(f"appProperties has {{ key='upload_key' and value='{upload_key}' }} "
+               f"and '{FOLDER_ID}' in parents and trashed = false"),
+            fields='files(id)',
+            pageSize=1,
+        ).execute(http=http).get('files', [])
+        if existing:
+            return existing[0]['id']
+
+    file_metadata = {
+        'name': file_name,
+        'parents': [FOLDER_ID]  # Upload into the specified folder
+    }
+    if upload_key is not None:
+        file_metadata['appProperties'] = {'upload_key': upload_key}
+
+    if os.path.getsize(file_path) >= RESUMABLE_MIN_BYTES:
+        file, checksum = _resumable_upload(service, http, file_path, file_metadata, mimetype, upload_key)
+    else:
+        with open(file_path, 'rb') as file_data:
+            data = file_data.read()
+        checksum = hashlib.md5(data, usedforsecurity=False).hexdigest()
+        media = MediaIoBaseUpload(io.BytesIO(data), mimetype=mimetype)
+        file = service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id, md5Checksum'
+        ).execute(http=http)
+
+    # Compare the checksum Drive computed with the bytes that were sent
+    if file.get('md5Checksum') not in (None, checksum):
+        service.files().delete(fileId=file['id']).execute(http=http)
+        raise IOError(f"Upload of {file_name} was corrupted in transit")
+    return file['id']
+
+
+def _resumable_upload(service, http, file_path, file_metadata, mimetype, upload_key):
+    """Send a large file in chunks; returns (Drive's response, MD5 of the file)."""
+    from googleapiclient.http import MediaFileUpload
+    md5 = hashlib.md5(usedforsecurity=False)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            md5.update(block)
+    checksum = md5.hexdigest()
+
+    with _resumable_lock:
+        request, started_for = _resumable.pop(upload_key, (None, None))
+    # An interrupted upload is only continued if the file is still the one it started with
+    if request is None or started_for != checksum:
+        media = MediaFileUpload(file_path, mimetype=mimetype, chunksize=config.UPLOAD_CHUNK_SIZE, resumable=True)
+        request = service.files().create(body=file_metadata, media_body=media, fields='id, md5Checksum')
+    response = None
+    try:
+        while response is None:
+            _, response = request.next_chunk(http=http)
+    except Exception:
+        if upload_key is not None:
+            with _resumable_lock:
+                _resumable[upload_key] = (request, checksum)
+        raise
+    return response, checksum
+
+
+def upload_with_cached_service(path, name, mimetype='text/plain', upload_key=None):
+    """Upload using the cached service, logging how long getting the service took."""
+    start = time.perf_counter()
+    service = authenticate_google_drive()
+    setup = time.perf_counter() - start
+    file_id = upload_file_to_drive(service, path, name, mimetype, upload_key=upload_key)
+    logger.info("Uploaded %s (service setup %.1f ms, total %.1f ms)",
+                name, setup * 1000, (time.perf_counter() - start) * 1000)
+    return file_id
@@ -0,0 +1,761 @@
+#engine.py - Headless interview engine: sessions, turns, streaming and persistence
+#
+# The Streamlit page (interview.py) and the HTTP/SSE service (server.py) are thin clients of
+# this module. A turn is consumed as a stream of events (plain dicts with a "type"):
+#   {"type": "delta", "text": ...}      displayable text (closing codes are never part of it)
+#   {"type": "error", "error": ...}     the model call failed; a fallback reply follows
+#   {"type": "end", "message": ..., "closing_code": ..., "closing_message": ..., "active": ...}
+#   {"type": "warning", "message": ...} e.g. a backup could not be written
+#   {"type": "saved", "path": ...}      the final transcript was written (after a closing code)
+# Consumers should iterate to the end: saving happens after the "end" event was delivered.
+
+import itertools
+import logging
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import pytz
+
+import clients
+import config
+import metrics
+from archive import ship_transcript
+from context import count_text_tokens, fit_to_budget
+from journal import (atomic_write, close_journal, format_transcript, journal_path, open_journal, read_journal,
+                     read_transcript)
+from openers import add_opening, get_opening
+from planner import plan_directive
+from prompt_cache import anthropic_messages, anthropic_system_blocks, anthropic_usage, openai_usage
+from rate_limit import PRIORITY_IN_PROGRESS, PRIORITY_NEW, AdmissionCancelled, get_rate_limiter, is_rate_limit_error, retry_delay
+from registry import get_registry
+from router import Route, health, order_routes, route_key
+from session_store import MessageList, get_session_store, read_spill, spill_path, write_spill
+from streaming import closing_code_automaton
+
+logger = logging.getLogger(__name__)
+
+CENTRAL_TZ = pytz.timezone("America/Chicago")
+USERNAME_PREFIXES = {"openai": "OpenAI", "anthropic": "Anthropic"}
+OPENING_ERROR_MESSAGE = "Sorry, there was an error connecting to the interview service. Please try again later."
+TURN_ERROR_MESSAGE = "Sorry, there was an error. Your response was saved, but we couldn't generate a reply."
+CANCEL_MESSAGE = "You have cancelled the interview."
+
+
+def now_ct(fmt="%Y-%m-%d %H:%M:%S %Z"):
+    """Current date and time in Central Time (CT)."""
+    return datetime.now(CENTRAL_TZ).strftime(fmt)
+
+
+def provider_messages(messages, provider):
+    """Session messages in the layout a provider expects, whichever provider started the session.
+
+    OpenAI takes the system prompt as the first message; Anthropic takes it separately and needs
+    the conversation to start with a user message.
+    """
+    if provider == "openai":
+        if messages and messages[0]["role"] == "system":
+            return messages
+        return [{"role": "system", "content": config.SYSTEM_PROMPT}] + messages
+    messages = [m for m in messages if not (m["role"] == "system" and m["content"] == config.SYSTEM_PROMPT)]
+    if not messages or messages[0]["role"] != "user":
+        messages = [{"role": "user", "content": "Hi"}] + messages
+    return messages
+
+
+class StreamAbort:
+    """Stops a route's attempt from another thread (the losing side of a hedged turn).
+
+    Waiting for rate limit admission ends, and the connection of an open stream is shut down, so
+    even a read that is blocked waiting for the first token returns at once (closing the response
+    from another thread would not wake it).
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.response = None
+
+    def attach(self, response):
+        """Register the httpx response of the attempt's stream (shut down at once if already aborted)."""
+        with self.lock:
+            self.response = response
+            aborted = self.event.is_set()
+        if aborted:
+            self._shutdown(response)
+
+    def detach(self):
+        """Forget the response once its stream has ended: its connection may be back in the pool."""
+        with self.lock:
+            self.response = None
+
+    def __call__(self):
+        with self.lock:
+            self.event.set()
+            response = self.response
+        if response is not None:
+            self._shutdown(response)
+
+    @staticmethod
+    def _shutdown(response):
+        try:
+            sock = response.extensions["network_stream"].get_extra_info("socket")
+            if sock is not None:
+                sock.shutdown(socket.SHUT_RDWR)
+        except (KeyError, AttributeError, OSError):
+            pass
+
+
+class InterviewSession:
+    """State of one interview: messages, status and per-turn usage."""
+
+    def __init__(self, username, provider, response_id=None, start_time=None, session_id=None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.username = username
+        self.provider = provider
+        self.model = config.MODEL
+        self.response_id = response_id
+        self.start_time = start_time or now_ct()
+        self._messages = MessageList()
+        self.active = True
+        self.closing_code = None
+        self._turn_usage = []
+        self.transcript_path = None
+        # One turn at a time per session
+        self.lock = threading.Lock()
+        # Idle sessions are moved to disk by the session store and reloaded on the next access
+        self.state_lock = threading.Lock()
+        self.spilled = False
+        self.spill_path = spill_path(self.session_id)
+        self.last_access = time.monotonic()
+        get_session_store().track(self)
+
+    @property
+    def messages(self):
+        self._load()
+        return self._messages
+
+    @messages.setter
+    def messages(self, messages):
+        self._load()
+        self._messages = MessageList(messages)
+
+    @property
+    def turn_usage(self):
+        self._load()
+        return self._turn_usage
+
+    def load(self):
+        """Reload the messages if the session was moved to disk, so that the next accesses do no file I/O."""
+        self._load()
+
+    def _load(self):
+        with self.state_lock:
+            self.last_access = time.monotonic()
+            if self.spilled:
+                self._messages, self._turn_usage = read_spill(self.spill_path)
+                self.spilled = False
+
+    def spill(self):
+        """Write messages and usage to disk and drop them from memory (not during a turn)."""
+        if not self.lock.acquire(blocking=False):
+            return False
+        try:
+            with self.state_lock:
+                if self.spilled:
+                    return False
+                write_spill(self.spill_path, self._messages, self._turn_usage)
+                self._messages = self._turn_usage = None
+                self.spilled = True
+                return True
+        finally:
+            self.lock.release()
+
+    def memory_bytes(self):
+        """Approximate memory held by the messages and usage records (0 once spilled)."""
+        with self.state_lock:
+            if self.spilled:
+                return 0
+            usage = sum(sys.getsizeof(turn) + sum(sys.getsizeof(v) for v in turn.values()) for turn in self._turn_usage)
+            return self._messages.nbytes() + sys.getsizeof(self._turn_usage) + usage
+
+    @property
+    def awaiting_reply(self):
+        """True if the last message is the respondent's and has no reply yet (e.g. after a crash)."""
+        messages = self.messages
+        return bool(messages) and messages[-1]["role"] == "user"
+
+    @property
+    def n_responses(self):
+        return len([m for m in self.messages if m["role"] == "user"])
+
+    def is_visible(self, message, first):
+        """Whether `message` is shown to the respondent; `first`: it is the first non-system message."""
+        if message["role"] == "system":
+            return False
+        if first and self.provider == "anthropic" and message["role"] == "user":
+            return False
+        return not any(code in message["content"] for code in config.CLOSING_MESSAGES)
+
+    def visible_messages(self):
+        """Messages shown to the respondent (no system prompt, no initial 'Hi', no raw codes)."""
+        messages = [m for m in self.messages if m["role"] != "system"]
+        return [m for i, m in enumerate(messages) if self.is_visible(m, i == 0)]
+
+    def routes_used(self):
+        """Providers and models that produced replies, in order of first use."""
+        providers, models = [], []
+        for turn in self.turn_usage:
+            if "provider" in turn and "ttft" in turn:
+                if turn["provider"] not in providers:
+                    providers.append(turn["provider"])
+                if turn["model"] not in models:
+                    models.append(turn["model"])
+        return providers, models
+
+    def metadata(self):
+        """Metadata for the transcript header and the journal."""
+        providers, models = self.routes_used()
+        return {
+            "api": ", ".join(providers) or self.provider,
+            "model": ", ".join(models) or self.model,
+            "start_time": self.start_time,
+            "end_time": now_ct(),
+            "username": self.username,
+            "uid": self.response_id or "None",
+            "turn_usage": self.turn_usage,
+        }
+
+
+class InterviewEngine:
+    """Runs interview turns for a main provider and API key, with optional fallback routes."""
+
+    def __init__(self, provider, api_key, fallbacks=()):
+        self.provider = provider
+        self.api_key = api_key
+        self.routes = (Route(provider, config.MODEL, api_key),) + tuple(fallbacks)
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+        get_session_store().add_sweeper(self.evict)
+
+    @property
+    def client(self):
+        return clients.get_client(self.provider, self.api_key)
+
+    # Sessions
+
+    def start(self, response_id=None, username=None, start_time=None, register=True):
+        """Create a new session (the opening turn is streamed by `stream_turn`).
+
+        The username is claimed in the registry, so it is unique across processes (a taken name
+        gets a suffix). Registered sessions can be looked up by `session_id` (used by the HTTP service).
+        """
+        if username is None:
+            username = f"{USERNAME_PREFIXES.get(self.provider, 'User')}_{now_ct('%Y-%m-%d_%H-%M-%S')}"
+        session = InterviewSession(username, self.provider, response_id=response_id, start_time=start_time)
+        # A username already taken (e.g. a start in the same second) gets a suffix
+        session.username = get_registry().claim(username, response_id, session.session_id, self.provider, session.start_time)
+        if register:
+            self._register(session)
+        return session
+
+    def resume(self, response_id, register=True):
+        """Continue the latest interview of a Qualtrics response ID from its journal, or return None.
+
+        A finalized interview comes back inactive, with its messages for display.
+        """
+        if response_id is None:
+            return None
+        entry = get_registry().lookup(response_id)
+        if entry is None:
+            return None
+        if register:
+            session = self.get(entry["session_id"])
+            if session is not None:
+                return session
+        session = InterviewSession(entry["username"], entry["provider"], response_id=response_id,
+                                   start_time=entry["start_time"], session_id=entry["session_id"])
+        journal = self.journal_file(session)
+        if os.path.exists(journal):
+            system_prompt = config.SYSTEM_PROMPT if entry["provider"] == "openai" else None
+            messages, metadata = read_journal(journal, system_prompt)
+            if any(m["role"] != "system" for m in messages):
+                session.messages = messages
+            if metadata:
+                # The metadata record is written when the interview is finalized
+                session.active = False
+                session.turn_usage.extend(metadata.get("turn_usage", []))
+        elif entry["completed"] and entry["transcript"] and os.path.exists(entry["transcript"]):
+            # The journal of a finished interview may have been archived and deleted (see archive.py)
+            _, messages = read_transcript(entry["transcript"])
+            if entry["provider"] == "openai":
+                messages.insert(0, {"role": "system", "content": config.SYSTEM_PROMPT})
+            session.messages = messages
+        if entry["completed"]:
+            session.active = False
+        logger.info("Resumed %s for response %s with %d messages", session.username, response_id, len(session.messages))
+        if register:
+            self._register(session)
+        return session
+
+    def _register(self, session):
+        with self.sessions_lock:
+            self.sessions[session.session_id] = session
+
+    def get(self, session_id):
+        with self.sessions_lock:
+            return self.sessions.get(session_id)
+
+    def forget(self, session):
+        with self.sessions_lock:
+            self.sessions.pop(session.session_id, None)
+
+    def evict(self, now=None):
+        """Forget finished sessions idle for SESSION_FINISHED_RETENTION seconds and any session idle
+        for SESSION_EVICT_AFTER seconds (run by the session store's sweep); returns how many."""
+        now = time.monotonic() if now is None else now
+        with self.sessions_lock:
+            sessions = list(self.sessions.values())
+        evicted = 0
+        for session in sessions:
+            idle = now - session.last_access
+            limit = config.SESSION_FINISHED_RETENTION if not session.active else config.SESSION_EVICT_AFTER
+            # A session in the middle of a turn is never idle
+            if limit is not None and idle >= limit and not session.lock.locked():
+                self.forget(session)
+                evicted += 1
+        return evicted
+
+    # Requests
+
+    def build_api_kwargs(self, session, turn=None, route=None):
+        """Request kwargs within the input token budget, with a cache-eligible static prefix.
+
+        `route` selects the provider and model (default: the engine's main route). With `turn`,
+        the estimated input tokens are recorded in it (used for rate limiting).
+        """
+        route = route or self.routes[0]
+        messages = provider_messages(session.messages, route.provider)
+        directive = None
+        if config.PLANNER and any(m["role"] == "assistant" for m in messages):
+            # Compact plan for this turn (see planner.py), sent after the conversation so the prompt prefix stays cacheable
+            directive, covered = plan_directive(messages)
+            if turn is not None:
+                turn["constructs_covered"] = covered
+        if route.provider == "openai":
+            if directive is not None:
+                messages = messages + [{"role": "system", "content": directive}]
+            messages, input_tokens = fit_to_budget(messages)
+            api_kwargs = {"stream": True, "stream_options": {"include_usage": True}, "messages": messages}
+        elif route.provider == "anthropic":
+            reserved = count_text_tokens(config.SYSTEM_PROMPT) + (count_text_tokens(directive) if directive else 0)
+            messages, input_tokens = fit_to_budget(messages, reserved_tokens=reserved)
+            # Anthropic takes system content (including a summary of compacted turns) separately
+            system = [config.SYSTEM_PROMPT] + [m["content"] for m in messages if m["role"] == "system"]
+            api_kwargs = {
+                "system": anthropic_system_blocks(system, cache=config.PROMPT_CACHING),
+                "messages": anthropic_messages([m for m in messages if m["role"] != "system"], cache=config.PROMPT_CACHING,
+                                               trailing_text=directive),
+            }
+        else:
+            raise ValueError(f"Unknown API provider: {route.provider}")
+        logger.info("Turn input tokens for %s: %d", session.username, input_tokens)
+        if turn is not None:
+            turn["estimated_input_tokens"] = input_tokens
+
+        api_kwargs.update({
+            "model": route.model,
+            "max_tokens": config.MAX_OUTPUT_TOKENS,
+        })
+        if config.TEMPERATURE is not None:
+            api_kwargs["temperature"] = config.TEMPERATURE
+        return api_kwargs
+
+    def stream_reply(self, session, turn):
+        """Yield raw text deltas of the next reply, recording usage and time to first token in `turn`.
+
+        Routes are tried in order of preference and health until one produces a first token;
+        with config.HEDGE_AFTER, slow routes are raced against the next one instead.
+        """
+        routes = order_routes(self.routes)
+        if config.HEDGE_AFTER is not None and len(routes) > 1:
+            yield from self._hedged_reply(session, turn, routes)
+            return
+        for i, route in enumerate(routes):
+            attempt = self._attempt(turn, route, i)
+            try:
+                yield from self._route_reply(session, attempt, route)
+                return
+            except Exception as e:
+                # Never switch once text was shown: the reply would be duplicated
+                if "ttft" in attempt or i == len(routes) - 1:
+                    raise
+                logger.warning("%s failed for %s, failing over to %s: %s", route.provider, session.username, routes[i + 1].provider, e)
+            finally:
+                turn.update(attempt)
+
+    def _attempt(self, turn, route, failovers):
+        """Usage record of one route's attempt at a turn (merged into the turn if it is used)."""
+        return {"turn": turn["turn"], "provider": route.provider, "model": route.model, "failovers": failovers}
+
+    def _hedged_reply(self, session, turn, routes):
+        """Race routes in threads: the next one starts after HEDGE_AFTER seconds without a first token
+        (or as soon as all running ones failed); the first to produce a token wins, the others stop."""
+        events = queue.Queue()
+        attempts, aborts, threads = [], [], []
+        winner = None
+        failed = 0
+        last_error = None
+
+        def run(i):
+            deltas = self._route_reply(session, attempts[i], routes[i], aborts[i])
+            try:
+                for text_delta in deltas:
+                    if aborts[i].event.is_set():
+                        break
+                    events.put((i, text_delta, None))
+                events.put((i, None, None))
+            except Exception as e:
+                events.put((i, None, e))
+            finally:
+                deltas.close()
+
+        def start_next():
+            attempts.append(self._attempt(turn, routes[len(attempts)], len(attempts)))
+            aborts.append(StreamAbort())
+            threads.append(threading.Thread(target=run, args=(len(attempts) - 1,), daemon=True))
+            threads[-1].start()
+            return time.monotonic() + config.HEDGE_AFTER
+
+        deadline = start_next()
+        try:
+            while True:
+                timeout = None if winner is not None or len(attempts) == len(routes) else max(0, deadline - time.monotonic())
+                try:
+                    i, text_delta, error = events.get(timeout=timeout)
+                except queue.Empty:
+                    logger.info("No first token for %s after %ss, hedging with %s", session.username, config.HEDGE_AFTER, routes[len(attempts)].provider)
+                    deadline = start_next()
+                    continue
+                if winner is None and error is None:
+                    # First token (or an empty reply) decides the race
+                    winner = i
+                    # Stop the others now, not at their next token: they may still be waiting for it
+                    for j, abort in enumerate(aborts):
+                        if j != winner:
+                            abort()
+                if i == winner:
+                    if error is not None:
+                        raise error
+                    if text_delta is None:
+                        return
+                    yield text_delta
+                elif winner is None:
+                    failed += 1
+                    last_error = error
+                    logger.warning("%s failed for %s: %s", routes[i].provider, session.username, error)
+                    if failed == len(attempts):
+                        if len(attempts) == len(routes):
+                            raise last_error
+                        deadline = start_next()
+        finally:
+            # Also the winner: the consumer may stop reading early (closing code, cancel, disconnect)
+            for abort in aborts:
+                abort()
+            if winner is not None:
+                # Its usage is recorded when its stream ends, which the shutdown makes prompt
+                threads[winner].join(config.HTTP_CONNECT_TIMEOUT)
+                turn.update(attempts[winner], hedged=len(attempts) > 1)
+
+    def _route_reply(self, session, attempt, route, abort=None):
+        """Stream one route's reply, waiting for admission by the shared rate limiter.
+
+        Rate limit errors before the first token are retried with jittered backoff instead of
+        failing the turn; the outcome is recorded in the route's health. A StreamAbort `abort`
+        lets another thread stop the attempt (not counted as a failure of the route).
+        """
+        api_kwargs = self.build_api_kwargs(session, attempt, route)
+        tokens, priority = self._admission(attempt)
+        limiter = get_rate_limiter(route.provider)
+        try:
+            for retry in itertools.count():
+                attempt["queue_wait"] = attempt.get("queue_wait", 0) + limiter.acquire(
+                    tokens, priority, cancel=abort.event if abort is not None else None)
+                succeeded = False
+                try:
+                    for text_delta in self._stream_once(api_kwargs, attempt, route, abort):
+                        if not succeeded:
+                            succeeded = self._route_succeeded(attempt, route)
+                        yield text_delta
+                    if not succeeded:
+                        self._route_succeeded(attempt, route)
+                    return
+                except Exception as e:
+                    if abort is not None and abort.event.is_set():
+                        raise
+                    if not self._should_retry(session, attempt, e, retry):
+                        if not succeeded:
+                            self._route_failed(route, e)
+                        raise
+                delay = retry_delay(retry)
+                if abort is None:
+                    time.sleep(delay)
+                elif abort.event.wait(delay):
+                    raise AdmissionCancelled("Stopped before retrying")
+        finally:
+            self._settle(attempt, route, tokens)
+
+    def _route_succeeded(self, attempt, route):
+        """Record a route that produced its first token (or a complete empty reply)."""
+        health(route).record_success(attempt.get("ttft"))
+        clients.report_success(route.provider, route.api_key)
+        return True
+
+    def _route_failed(self, route, error):
+        health(route).record_failure()
+        clients.report_failure(route.provider, route.api_key, error)
+
+    def _admission(self, turn):
+        """Token cost estimate and queue priority of a model call."""
+        tokens = turn["estimated_input_tokens"] + config.MAX_OUTPUT_TOKENS
+        return tokens, PRIORITY_NEW if turn["turn"] == 0 else PRIORITY_IN_PROGRESS
+
+    def _should_retry(self, session, turn, error, retry):
+        # Never retry once text was shown: the reply would be duplicated
+        if "ttft" in turn or not is_rate_limit_error(error) or retry >= config.RATE_LIMIT_MAX_RETRIES:
+            return False
+        turn["rate_limit_retries"] = retry + 1
+        logger.info("Rate limited for %s (retry %d): %s", session.username, retry + 1, error)
+        return True
+
+    def _settle(self, turn, route, tokens):
+        """Correct the limiter's token estimate with the reported usage."""
+        if "input_tokens" in turn:
+            get_rate_limiter(route.provider).refund(tokens - turn["input_tokens"] - turn["output_tokens"])
+
+    def _stream_once(self, api_kwargs, turn, route, abort=None):
+        client = clients.get_client(route.provider, route.api_key)
+        start = time.perf_counter()
+        try:
+            if route.provider == "openai":
+                stream = client.chat.completions.create(**api_kwargs)
+                if abort is not None:
+                    abort.attach(stream.response)
+                for chunk in stream:
+                    if chunk.usage is not None:
+                        turn.update(openai_usage(chunk.usage))
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        turn.setdefault("ttft", time.perf_counter() - start)
+                        yield chunk.choices[0].delta.content
+            elif route.provider == "anthropic":
+                with client.messages.stream(**api_kwargs) as stream:
+                    if abort is not None:
+                        abort.attach(stream.response)
+                    started = False
+                    try:
+                        for event in stream:
+                            if event.type == "message_start":
+                                started = True
+                            elif event.type == "content_block_delta" and event.delta.type == "text_delta" and event.delta.text:
+                                turn.setdefault("ttft", time.perf_counter() - start)
+                                yield event.delta.text
+                    finally:
+                        # Input and cache usage arrive with message_start, so they are known even after a break;
+                        # a stream that failed before it (e.g. overloaded) has no snapshot to read
+                        if started:
+                            turn.update(anthropic_usage(stream.current_message_snapshot.usage))
+        finally:
+            if abort is not None:
+                abort.detach()
+            turn["stream_seconds"] = time.perf_counter() - start
+
+    # Turns
+
+    def stream_turn(self, session, user_message=None):
+        """Run the next turn and yield its events.
+
+        Without messages this is the opening turn; otherwise `user_message` is the respondent's reply.
+        """
+        with session.lock:
+            turn, opening = self._begin_turn(session, user_message)
+            started = time.perf_counter()
+            if not opening:
+                # Journal the respondent's message before the model call, so a crash cannot lose it
+                yield from self._backup(session)
+            pooled = get_opening(self.provider) if opening else None
+            message_interviewer = ""
+            # Detects closing codes incrementally and holds back partial codes from display
+            closing_matcher = closing_code_automaton(config.CLOSING_MESSAGES.keys()).matcher()
+
+            if pooled is not None:
+                # Pre-generated opening for the current config: no model round trip
+                turn["opening_pool"] = True
+                message_interviewer = pooled
+                yield {"type": "delta", "text": pooled}
+            else:
+                try:
+                    deltas = self.stream_reply(session, turn)
+                    for text_delta in deltas:
+                        message_interviewer += text_delta
+                        visible = closing_matcher.feed(text_delta)
+                        if closing_matcher.matched:
+                            break
+                        if visible:
+                            yield {"type": "delta", "text": visible}
+                    deltas.close()
+                    yield from self._flush_event(closing_matcher)
+                    self._reply_succeeded(session, turn, opening, message_interviewer)
+                except Exception as e:
+                    message_interviewer = self._reply_failed(session, turn, opening, e)
+                    yield {"type": "error", "error": str(e)}
+
+            yield from self._finish_turn(session, turn, message_interviewer, closing_matcher.matched, started)
+
+    def _begin_turn(self, session, user_message):
+        """Append the opening prompt or the respondent's message; returns (turn record, is opening)."""
+        if not session.active:
+            raise ValueError("The interview is no longer active.")
+        opening = not session.messages
+        if opening:
+            if self.provider == "openai":
+                session.messages.append({"role": "system", "content": config.SYSTEM_PROMPT})
+            else:
+                session.messages.append({"role": "user", "content": "Hi"})
+        elif user_message is None:
+            # Only a resumed interview whose last respondent message was never answered
+            if not session.awaiting_reply:
+                raise ValueError("A respondent message is required after the opening turn.")
+        else:
+            session.messages.append({"role": "user", "content": user_message})
+        return {"turn": 0 if opening else session.n_responses}, opening
+
+    def _flush_event(self, closing_matcher):
+        if not closing_matcher.matched:
+            remainder = closing_matcher.flush()
+            if remainder:
+                yield {"type": "delta", "text": remainder}
+
+    def _reply_succeeded(self, session, turn, opening, message_interviewer):
+        # The pool holds openings of the main route only (see openers.py)
+        if opening and turn.get("provider") == self.provider and turn.get("model") == config.MODEL:
+            add_opening(self.provider, message_interviewer)
+
+    def _reply_failed(self, session, turn, opening, error):
+        """Log a failed model call and return the fallback reply."""
+        turn["error"] = str(error)
+        logger.warning("API error for %s: %s", session.username, error)
+        return OPENING_ERROR_MESSAGE if opening else TURN_ERROR_MESSAGE
+
+    def _finish_turn(self, session, turn, message_interviewer, closing_code, started):
+        """Store the reply (or close on a closing code) and yield the remaining events."""
+        turn["reply_seconds"] = time.perf_counter() - started
+        self.record_turn_usage(session, turn)
+        if closing_code is None:
+            session.messages.append({"role": "assistant", "content": message_interviewer})
+            yield self._end_event(session, message_interviewer)
+            backup_started = time.perf_counter()
+            yield from self._backup(session)
+            turn["backup_seconds"] = time.perf_counter() - backup_started
+        else:
+            yield from self._close(session, closing_code, config.CLOSING_MESSAGES[closing_code])
+        metrics.record_turn(turn, session.username)
+
+    def _end_event(self, session, message, closing_code=None):
+        return {
+            "type": "end",
+            "message": message,
+            "closing_code": closing_code,
+            "closing_message": config.CLOSING_MESSAGES.get(closing_code),
+            "active": session.active,
+        }
+
+    def _close(self, session, closing_code, display_message):
+        session.messages.append({"role": "assistant", "content": display_message})
+        session.active = False
+        session.closing_code = closing_code
+        yield self._end_event(session, display_message, closing_code)
+        try:
+            finalize_started = time.perf_counter()
+            session.transcript_path = self.finalize(session)
+            metrics.observe("interview_finalize_seconds", time.perf_counter() - finalize_started)
+            yield {"type": "saved", "path": session.transcript_path}
+        except Exception as e:
+            yield {"type": "warning", "message": f"Error saving transcript: {str(e)}"}
+
+    def cancel(self, session):
+        """End the interview at the respondent's request and yield the closing events."""
+        with session.lock:
+            if not session.active:
+                return
+            yield from self._close(session, None, CANCEL_MESSAGE)
+
+    def record_turn_usage(self, session, turn):
+        """Keep cache hits and token counts of each turn (saved with the transcript)."""
+        if "input_tokens" in turn:
+            turn["cache_hit"] = turn["cached_input_tokens"] > 0
+        if turn.get("output_tokens") and "ttft" in turn and turn["stream_seconds"] > turn["ttft"]:
+            turn["output_tokens_per_second"] = turn["output_tokens"] / (turn["stream_seconds"] - turn["ttft"])
+        session.turn_usage.append(turn)
+        logger.info("Turn usage for %s: %s", session.username, turn)
+
+    # Persistence
+
+    def journal_file(self, session):
+        return journal_path(config.BACKUPS_DIRECTORY, session.username)
+
+    def _backup(self, session):
+        try:
+            open_journal(self.journal_file(session)).sync_messages(session.messages)
+        except Exception as e:
+            yield {"type": "warning", "message": f"Failed to save backup: {str(e)}"}
+
+    def finalize(self, session, transcripts_directory=None):
+        """Write the final transcript once and hand it to the background upload (see archive.ship_transcript).
+
+        The transcript is rendered from the session's messages (the journal is only completed
+        with its metadata record) and written atomically; the checksum of the written bytes is
+        verified by the upload queue instead of reading the file back here.
+        """
+        transcripts_directory = transcripts_directory or config.TRANSCRIPTS_DIRECTORY
+        transcript_file = os.path.join(transcripts_directory, f"{session.username}.txt")
+        metadata = session.metadata()
+        data = format_transcript(session.messages, metadata).encode("utf-8")
+        try:
+            journal = open_journal(self.journal_file(session))
+            journal.sync_messages(session.messages)
+            journal.write_metadata(metadata)
+            journal.sync()
+        except Exception as e:
+            logger.error("Could not complete the journal of %s: %s", session.username, e)
+        try:
+            checksum = atomic_write(transcript_file, data)
+        except Exception as e:
+            # Create emergency local transcript
+            logger.error("Transcript could not be saved to %s (%s); writing an emergency transcript", transcript_file, e)
+            transcript_file = f"emergency_transcript_{session.username}.txt"
+            checksum = atomic_write(transcript_file, data)
+
+        close_journal(self.journal_file(session))
+        get_registry().complete(session.username, os.path.abspath(transcript_file))
+        ship_transcript(transcript_file, checksum, self.journal_file(session))
+        return transcript_file
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(provider, api_key, fallbacks=()):
+    """Process-wide engine per provider, API key and fallback routes (shared by all sessions and reruns)."""
+    key = (clients.registry_key(provider, api_key),) + tuple(route_key(route) for route in fallbacks)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = InterviewEngine(provider, api_key, fallbacks)
+            _engines[key] = engine
+        return engine
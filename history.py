@@ -0,0 +1,53 @@
+#history.py - Incremental rendering of the chat history on Streamlit reruns
+#
+# Streamlit re-runs the page script on every submit, and every message of the history has to be
+# emitted again to stay on screen. What is decided per message (shown or not: no system prompt, no
+# initial "Hi", no raw closing code; and with which avatar) is cached, so a rerun only scans the
+# messages added since the previous one. The markdown itself is rendered by the browser; the cache
+# keeps indices and content hashes rather than the texts, so spilled sessions stay off the heap.
+
+import config
+
+
+class HistoryRenderer:
+    """Cached render decisions for the visible messages of one interview session."""
+
+    def __init__(self):
+        self.session_id = None
+        self.scanned = 0          # messages already decided
+        self.seen_first = False   # whether the first non-system message was among them
+        self.entries = []         # (message index, role, avatar, hash of the content)
+
+    def reset(self, session):
+        self.session_id = session.session_id
+        self.scanned = 0
+        self.seen_first = False
+        self.entries = []
+
+    def _update(self, session, messages):
+        if session.session_id != self.session_id or len(messages) < self.scanned:
+            self.reset(session)
+        for i in range(self.scanned, len(messages)):
+            message = messages[i]
+            if message["role"] == "system":
+                continue
+            first = not self.seen_first
+            self.seen_first = True
+            if session.is_visible(message, first):
+                avatar = config.AVATAR_INTERVIEWER if message["role"] == "assistant" else config.AVATAR_RESPONDENT
+                self.entries.append((i, message["role"], avatar, hash(message["content"])))
+        self.scanned = len(messages)
+
+    def visible(self, session):
+        """(role, avatar, content) of each message to display, deciding only the new messages."""
+        messages = session.messages
+        self._update(session, messages)
+        rendered = []
+        for i, role, avatar, digest in self.entries:
+            content = messages[i]["content"]
+            if hash(content) != digest:
+                # The history was replaced in place (e.g. restored from the journal): decide again
+                self.session_id = None
+                return self.visible(session)
+            rendered.append((role, avatar, content))
+        return rendered
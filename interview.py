@@ -1,20 +1,26 @@
 #interview.py - OpenAI (Saving to Google Drive)
 
 import streamlit as st
-import time
 from utils import (
     check_password,
     check_if_interview_completed,
-    save_interview_data,
-    save_interview_data_to_drive,
 )
+from archive import get_archiver
+from upload_queue import get_upload_queue
 import os
 import config
+import clients
+import metrics
 import pytz
+import logging
+from engine import USERNAME_PREFIXES, get_engine
+from history import HistoryRenderer
+from router import fallback_routes
+from streaming import RenderScheduler
 
 from datetime import datetime
-from openai import OpenAI
-api = "openai"
+api = config.API
+logger = logging.getLogger("interview")
 
 # Capture UID from Qualtrics URL parameter
 try:
@@ -55,211 +61,104 @@ current_datetime = datetime.now(central_tz).strftime("%Y-%m-%d_%H-%M-%S")
 
 # Set the username with date and time
 if "username" not in st.session_state or st.session_state.username is None:
-    st.session_state.username = f"OpenAI_{current_datetime}"
+    st.session_state.username = f"{USERNAME_PREFIXES[api]}_{current_datetime}"
     st.session_state.interview_start_time = datetime.now(central_tz).strftime("%Y-%m-%d %H:%M:%S %Z")
 
 # Create directories if they do not already exist
 for directory in [config.TRANSCRIPTS_DIRECTORY, config.TIMES_DIRECTORY, config.BACKUPS_DIRECTORY]:
     os.makedirs(directory, exist_ok=True)
 
-# Initialise session state
-st.session_state.setdefault("interview_active", True)
-st.session_state.setdefault("messages", [])
+# Start the background Drive upload workers (also resumes uploads queued before a restart)
+get_upload_queue()
+# With config.ARCHIVE, also bundle finished interviews into archives in the background
+if config.ARCHIVE:
+    get_archiver()
+# Serve turn metrics on the local metrics port (once per process)
+metrics.start_server()
+
+# The interview logic lives in engine.py; this page only renders its events. The engine is
+# shared by all sessions of the process, the interview session itself lives in session state.
+clients.prewarm(api, st.secrets["API_KEY"])
+# Turns fail over to the providers in config.FALLBACK_PROVIDERS whose API keys are set
+engine = get_engine(api, st.secrets["API_KEY"], fallback_routes(api))
+if "interview" not in st.session_state:
+    # A participant returning after a page refresh or a server restart continues their interview
+    session = engine.resume(st.session_state.response_id, register=False)
+    if session is None:
+        session = engine.start(
+            response_id=st.session_state.response_id,
+            username=st.session_state.username,
+            start_time=st.session_state.get("interview_start_time"),
+            register=False,
+        )
+    st.session_state.interview = session
+    st.session_state.username = session.username
+    st.session_state.interview_start_time = session.start_time
+session = st.session_state.interview
+if st.session_state.response_id is not None:
+    session.response_id = st.session_state.response_id
 
 # Check if interview previously completed
 interview_previously_completed = check_if_interview_completed(
-    config.TRANSCRIPTS_DIRECTORY, st.session_state.username
+    st.session_state.username, st.session_state.response_id
     )
 
 # If app started but interview was previously completed
-if interview_previously_completed and not st.session_state.messages:
-    st.session_state.interview_active = False
+if interview_previously_completed and not session.messages:
+    session.active = False
     completed_message = "Interview already completed."
+    st.info(completed_message)
+    st.stop()
+
+def render_turn(events):
+    """Stream the events of one interviewer turn into the chat."""
+    with st.chat_message("assistant", avatar=config.AVATAR_INTERVIEWER):
+        message_placeholder = st.empty()
+        message_displayed = ""
+        # Batches deltas into frames instead of re-sending the whole reply on every token
+        renderer = RenderScheduler(lambda text: message_placeholder.markdown(text + "▌"))
+        for event in events:
+            if event["type"] == "delta":
+                message_displayed += event["text"]
+                renderer.update(message_displayed)
+            elif event["type"] == "error":
+                st.error(f"API Error: {event['error']}")
+            elif event["type"] == "end":
+                message_placeholder.markdown(event["message"])
+            elif event["type"] == "warning":
+                st.warning(event["message"])
+        render_stats = renderer.stats()
+        metrics.observe("interview_render_seconds", render_stats["render_seconds"])
+        logger.info("Rendered %d frames for %d deltas", render_stats["frames"], render_stats["deltas"])
     
 # Add 'Quit' button to dashboard
 col1, col2 = st.columns([0.85, 0.15])
 with col2:
-    if st.session_state.interview_active and st.button("Quit", help="End the interview."):
-        st.session_state.interview_active = False
-        st.session_state.messages.append({"role": "assistant", "content": "You have cancelled the interview."})
-        try:
-            transcript_path = save_interview_data(st.session_state.username, config.TRANSCRIPTS_DIRECTORY)
-            if transcript_path:
-                save_interview_data_to_drive(transcript_path)
-        except Exception as e:
-            st.error(f"Error saving data: {str(e)}")
+    if session.active and st.button("Quit", help="End the interview."):
+        for event in engine.cancel(session):
+            if event["type"] == "warning":
+                st.error(event["message"])
 
 # Display previous conversation (except system prompt)
-for message in st.session_state.messages[1:]:
-    avatar = config.AVATAR_INTERVIEWER if message["role"] == "assistant" else config.AVATAR_RESPONDENT
-    if not any(code in message["content"] for code in config.CLOSING_MESSAGES.keys()):
-        with st.chat_message(message["role"], avatar=avatar):
-            st.markdown(message["content"])
-
-# Load API client
-if api == "openai":
-    client = OpenAI(api_key=st.secrets["API_KEY"])
-    api_kwargs = {"stream": True}
-elif api == "anthropic":
-    client = anthropic.Anthropic(api_key=st.secrets["API_KEY"])
-    api_kwargs = {"system": config.SYSTEM_PROMPT}
-
-# API kwargs
-api_kwargs.update({
-    "messages": st.session_state.messages,
-    "model": config.MODEL,
-    "max_tokens": config.MAX_OUTPUT_TOKENS,
-})
-if config.TEMPERATURE is not None:
-    api_kwargs["temperature"] = config.TEMPERATURE
+# (render decisions are cached per message, so a rerun only decides the messages added since the last one)
+if "history" not in st.session_state:
+    st.session_state.history = HistoryRenderer()
+for role, avatar, content in st.session_state.history.visible(session):
+    with st.chat_message(role, avatar=avatar):
+        st.markdown(content)
 
-# Initialize first system message if history is empty
-if not st.session_state.messages:
-    if api == "openai":
-        st.session_state.messages.append({"role": "system", "content": config.SYSTEM_PROMPT})
-        with st.chat_message("assistant", avatar=config.AVATAR_INTERVIEWER):
-            try:
-                stream = client.chat.completions.create(**api_kwargs)
-                message_interviewer = st.write_stream(stream)
-            except Exception as e:
-                st.error(f"API Error: {str(e)}")
-                message_interviewer = "Sorry, there was an error connecting to the interview service. Please try again later."
+# Opening turn if history is empty (served from the pre-generated pool when possible)
+if not session.messages and session.active:
+    render_turn(engine.stream_turn(session))
 
-    elif api == "anthropic":
-        st.session_state.messages.append({"role": "user", "content": "Hi"})
-        with st.chat_message("assistant", avatar=config.AVATAR_INTERVIEWER):
-            message_placeholder = st.empty()
-            message_interviewer = ""
-            try:
-                with client.messages.stream(**api_kwargs) as stream:
-                    for text_delta in stream.text_stream:
-                        if text_delta:
-                            message_interviewer += text_delta
-                        message_placeholder.markdown(message_interviewer + "▌")
-                message_placeholder.markdown(message_interviewer)
-            except Exception as e:
-                st.error(f"API Error: {str(e)}")
-                message_interviewer = "Sorry, there was an error connecting to the interview service. Please try again later."
-                message_placeholder.markdown(message_interviewer)
+# Reply to the last respondent message if the interview was interrupted before it was answered
+if session.active and session.awaiting_reply:
+    render_turn(engine.stream_turn(session))
 
-    st.session_state.messages.append({"role": "assistant", "content": message_interviewer})
-
-    # Store initial backup
-    try:
-        save_interview_data(
-            username=st.session_state.username,
-            transcripts_directory=config.BACKUPS_DIRECTORY,
-        )
-    except Exception as e:
-        st.error(f"Error saving backup: {str(e)}")
-        
 # Main chat if interview is active
-if st.session_state.interview_active:
+if session.active:
     if message_respondent := st.chat_input("Your message here"):
-        st.session_state.messages.append({"role": "user", "content": message_respondent})
-
         with st.chat_message("user", avatar=config.AVATAR_RESPONDENT):
             st.markdown(message_respondent)
 
-        with st.chat_message("assistant", avatar=config.AVATAR_INTERVIEWER):
-            message_placeholder = st.empty()
-            message_interviewer = ""
-
-            try:
-                if api == "openai":
-                    stream = client.chat.completions.create(**api_kwargs)
-                    for message in stream:
-                        text_delta = message.choices[0].delta.content
-                        if text_delta:
-                            message_interviewer += text_delta
-                        if len(message_interviewer) > 5:
-                            message_placeholder.markdown(message_interviewer + "▌")
-                        if any(code in message_interviewer for code in config.CLOSING_MESSAGES.keys()):
-                            message_placeholder.empty()
-                            break
-
-                elif api == "anthropic":
-                    with client.messages.stream(**api_kwargs) as stream:
-                        for text_delta in stream.text_stream:
-                            if text_delta:
-                                message_interviewer += text_delta
-                            if len(message_interviewer) > 5:
-                                message_placeholder.markdown(message_interviewer + "▌")
-                            if any(code in message_interviewer for code in config.CLOSING_MESSAGES.keys()):
-                                message_placeholder.empty()
-                                break
-            except Exception as e:
-                st.error(f"API Error: {str(e)}")
-                message_interviewer = "Sorry, there was an error. Your response was saved, but we couldn't generate a reply."
-                
-            if not any(code in message_interviewer for code in config.CLOSING_MESSAGES.keys()):
-                message_placeholder.markdown(message_interviewer)
-                st.session_state.messages.append({"role": "assistant", "content": message_interviewer})
-
-                try:
-                    save_interview_data(
-                        username=st.session_state.username,
-                        transcripts_directory=config.BACKUPS_DIRECTORY,
-                    )
-                except Exception as e:
-                    st.warning(f"Failed to save backup: {str(e)}")
-
-            for code in config.CLOSING_MESSAGES.keys():
-                if code in message_interviewer:
-                    display_message = config.CLOSING_MESSAGES[code]
-                    st.session_state.messages.append({"role": "assistant", "content": display_message})
-                    st.session_state.interview_active = False
-                    st.markdown(display_message)
-
-                    final_transcript_stored = False
-                    retries = 0
-                    max_retries = 10
-                    transcript_path = None
-                    
-                    while not final_transcript_stored and retries < max_retries:
-                        try:
-                            transcript_path = save_interview_data(
-                                username=st.session_state.username,
-                                transcripts_directory=config.TRANSCRIPTS_DIRECTORY,
-                            )
-                            if os.path.exists(transcript_path) and os.path.getsize(transcript_path) > 0:
-                                final_transcript_stored = True
-                            else:
-                                final_transcript_stored = False
-                        except Exception as e:
-                            st.warning(f"Retry {retries+1}/{max_retries}: Error saving transcript - {str(e)}")
-                        
-                        time.sleep(0.1)
-                        retries += 1
-
-                    if retries == max_retries and not final_transcript_stored:
-                        st.error("Error: Interview transcript could not be saved properly after multiple attempts!")
-                        # Create emergency local transcript
-                        emergency_file = f"emergency_transcript_{st.session_state.username}.txt"
-                        try:
-                            with open(emergency_file, "w") as t:
-                                # Skip the system prompt when saving
-                                for message in st.session_state.messages[1:]:
-                                    t.write(f"{message['role']}: {message['content']}\n\n")
-                            transcript_path = emergency_file
-                            st.success(f"Created emergency transcript: {emergency_file}")
-                        except Exception as e:
-                            st.error(f"Failed to create emergency transcript: {str(e)}")
-
-                    if transcript_path:
-                        try:
-                            # Debug output to check file content before upload
-                            with open(transcript_path, "r") as f:
-                                file_content = f.read()
-                                if len(file_content.strip()) < 10:  # Check if file is practically empty
-                                    st.warning(f"Warning: Transcript file appears to be nearly empty before upload!")
-                                    
-                                    # Try to write the file again with full content
-                                    with open(transcript_path, "w") as t:
-                                        for message in st.session_state.messages[1:]:
-                                            t.write(f"{message['role']}: {message['content']}\n\n")
-                            
-                            # Now upload to Google Drive
-                            save_interview_data_to_drive(transcript_path)
-                        except Exception as e:
-                            st.error(f"Failed to upload to Google Drive: {str(e)}")
+        render_turn(engine.stream_turn(session, message_respondent))
@@ -0,0 +1,199 @@
+#journal.py - Append-only per-session transcript journal (JSON Lines)
+#
+# Each line is one record: {"type": "message", "seq": <index in messages>, "role": ..., "content": ...}
+# or {"type": "metadata", ...}. Messages are only ever appended, so saving a turn costs one line
+# instead of rewriting the whole transcript. The latest metadata record wins when reading.
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+_open_journals_lock = threading.Lock()
+_open_journals = OrderedDict()
+
+
+class TranscriptJournal:
+    """An open journal file with batched fsync."""
+
+    def __init__(self, path, fsync_every=None, fsync_interval=None):
+        self.path = path
+        self.fsync_every = config.JOURNAL_FSYNC_EVERY if fsync_every is None else fsync_every
+        self.fsync_interval = config.JOURNAL_FSYNC_INTERVAL if fsync_interval is None else fsync_interval
+        self.lock = threading.Lock()
+        self.next_seq = _next_seq(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+        self.unsynced = 0
+        self.last_fsync = time.monotonic()
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # Flush to the OS on every record so a process crash loses nothing; fsync is batched
+        self.file.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every or time.monotonic() - self.last_fsync >= self.fsync_interval:
+            self._fsync()
+
+    def _fsync(self):
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_fsync = time.monotonic()
+
+    def sync_messages(self, messages):
+        """Append all messages that are not in the journal yet (system prompts are skipped)."""
+        with self.lock:
+            for seq in range(self.next_seq, len(messages)):
+                message = messages[seq]
+                if message.get("role") != "system":
+                    self._write({"type": "message", "seq": seq, "role": message["role"], "content": message["content"]})
+            self.next_seq = max(self.next_seq, len(messages))
+
+    def write_metadata(self, metadata):
+        with self.lock:
+            self._write({"type": "metadata", **metadata})
+
+    def sync(self):
+        with self.lock:
+            if self.unsynced:
+                self._fsync()
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                if self.unsynced:
+                    self._fsync()
+                self.file.close()
+
+
+def _next_seq(path):
+    """Sequence number following the last message record of an existing journal."""
+    if not os.path.exists(path):
+        return 0
+    next_seq = 0
+    for record in _iter_records(path):
+        if record.get("type") == "message":
+            next_seq = max(next_seq, record["seq"] + 1)
+    return next_seq
+
+
+def _iter_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A torn last line after a crash; everything before it is intact
+                break
+
+
+def journal_path(directory, username):
+    return os.path.join(directory, f"{username}.jsonl")
+
+
+def open_journal(path):
+    """Return the shared open journal for `path`, closing the least recently used ones if needed."""
+    with _open_journals_lock:
+        journal = _open_journals.get(path)
+        if journal is None or journal.file.closed:
+            journal = TranscriptJournal(path)
+            _open_journals[path] = journal
+        _open_journals.move_to_end(path)
+        while len(_open_journals) > config.JOURNAL_MAX_OPEN:
+            _, evicted = _open_journals.popitem(last=False)
+            evicted.close()
+        return journal
+
+
+def close_journal(path):
+    with _open_journals_lock:
+        journal = _open_journals.pop(path, None)
+    if journal is not None:
+        journal.close()
+
+
+def read_journal(path, system_prompt=None):
+    """Rebuild (messages, metadata) from a journal.
+
+    Pass `system_prompt` to restore the leading system message that is not journaled (OpenAI).
+    """
+    by_seq = {}
+    metadata = {}
+    for record in _iter_records(path):
+        if record.get("type") == "message":
+            by_seq[record["seq"]] = {"role": record["role"], "content": record["content"]}
+        elif record.get("type") == "metadata":
+            metadata = {k: v for k, v in record.items() if k != "type"}
+    messages = [by_seq[seq] for seq in sorted(by_seq)]
+    if system_prompt is not None:
+        messages.insert(0, {"role": "system", "content": system_prompt})
+    return messages, metadata
+
+
+def format_transcript(messages, metadata):
+    """Render messages and metadata in the plain-text transcript format."""
+    lines = [
+        "=== INTERVIEW METADATA ===",
+        f"API: {metadata.get('api', 'Unknown')}",
+        f"Model: {metadata.get('model', 'Unknown')}",
+        f"Start Time (CT): {metadata.get('start_time', 'Unknown')}",
+        f"End Time (CT): {metadata.get('end_time', 'Unknown')}",
+        f"Username: {metadata.get('username', 'Unknown')}",
+        f"UID: {metadata.get('uid', 'None')}",
+        f"Number of Responses: {len([m for m in messages if m['role'] == 'user'])}",
+        "========================",
+        "",
+        "",
+    ]
+    body = "".join(f"{message['role']}: {message['content']}\n\n" for message in messages if message.get("role") != "system")
+    return "\n".join(lines) + body
+
+
+TRANSCRIPT_BLOCK = re.compile(r"^(assistant|user): ", re.MULTILINE)
+
+
+def read_transcript(path):
+    """Header fields and messages of a transcript written by `format_transcript`."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    header, _, body = text.partition("========================\n")
+    fields = {}
+    for line in header.splitlines():
+        key, sep, value = line.partition(": ")
+        if sep:
+            fields[key] = value
+    starts = [m.start() for m in TRANSCRIPT_BLOCK.finditer(body)] + [len(body)]
+    messages = []
+    for begin, end in zip(starts, starts[1:]):
+        role, _, content = body[begin:end].partition(": ")
+        messages.append({"role": role, "content": content.rstrip("\n")})
+    return fields, messages
+
+
+def atomic_write(path, data):
+    """Write bytes to `path` via a temporary file and a rename; returns their MD5 checksum.
+
+    Readers see either the old file or the complete new one, never a partial write, so the
+    file does not need to be read back to check it.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return hashlib.md5(data, usedforsecurity=False).hexdigest()
@@ -0,0 +1,208 @@
+#metrics.py - Per-turn instrumentation: histograms and counters in Prometheus text format
+#
+# The engine times each stage of a turn (rate limit admission, time to first token, the whole
+# reply, backup, finalization) and reports token usage; interview.py adds render time and the
+# upload queue adds Drive upload time. Metrics live in the memory of the process and are served
+# as Prometheus text on http://127.0.0.1:METRICS_PORT/metrics. Every turn is also appended as one
+# JSON record to METRICS_LOG (rotated by size), for SLO analysis after a study.
+
+import json
+import logging
+import logging.handlers
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+RATE_BUCKETS = (5, 10, 20, 40, 80, 160, 320)
+
+HISTOGRAMS = {
+    "interview_queue_wait_seconds": ("Time a model call waited for rate limit admission.", LATENCY_BUCKETS),
+    "interview_ttft_seconds": ("Time from the request to the first token of a reply.", LATENCY_BUCKETS),
+    "interview_reply_seconds": ("Time from the start of a turn to the end of the reply.", LATENCY_BUCKETS),
+    "interview_output_tokens_per_second": ("Output tokens per second after the first token.", RATE_BUCKETS),
+    "interview_backup_seconds": ("Time to append a turn to the session journal.", LATENCY_BUCKETS),
+    "interview_finalize_seconds": ("Time to write the final transcript at the end of an interview.", LATENCY_BUCKETS),
+    "interview_render_seconds": ("Time spent rendering a streamed reply in Streamlit.", LATENCY_BUCKETS),
+    "interview_upload_seconds": ("Time of one Google Drive upload.", LATENCY_BUCKETS),
+}
+COUNTERS = {
+    "interview_turns_total": "Interviewer turns by outcome (ok, error, pooled).",
+    "interview_tokens_total": "Tokens reported by the provider by kind (input, cached_input, cache_write, output).",
+    "interview_rate_limit_retries_total": "Model calls retried after a rate limit error.",
+    "interview_failovers_total": "Turns answered by a fallback route.",
+    "interview_hedged_turns_total": "Turns where a hedged second request was sent.",
+    "interview_uploads_total": "Google Drive upload attempts by outcome (ok, error).",
+}
+
+_lock = threading.Lock()
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+_counters = {}  # (name, labels) -> value
+_gauges = {}  # name -> (help, function returning the value)
+_turn_log = None
+_server = None
+_server_attempted = False
+
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def observe(name, value, **labels):
+    """Add an observation to a histogram of HISTOGRAMS."""
+    if value is None:
+        return
+    buckets = HISTOGRAMS[name][1]
+    with _lock:
+        series = _histograms.setdefault((name, _labels(labels)), [0] * (len(buckets) + 2))
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+
+def inc(name, amount=1, **labels):
+    """Increase a counter of COUNTERS."""
+    if name not in COUNTERS:
+        raise KeyError(name)
+    with _lock:
+        key = (name, _labels(labels))
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def register_gauge(name, help_text, function):
+    """Value computed when the metrics are scraped (e.g. the upload queue depth)."""
+    with _lock:
+        _gauges[name] = (help_text, function)
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+def _format_value(value):
+    return "+Inf" if value == math.inf else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {key: list(series) for key, series in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            for bound, count in zip(buckets, series):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_value(bound))])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(series[-2])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {series[-1]}")
+    for name, help_text in COUNTERS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (series_name, labels), value in sorted(counters.items()):
+            if series_name == name:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    for name, (help_text, function) in sorted(gauges.items()):
+        try:
+            value = function()
+        except Exception as e:
+            logger.warning("Gauge %s failed: %s", name, e)
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {_format_value(value)}"]
+    return "\n".join(lines) + "\n"
+
+
+def _log_turn(record):
+    """Append a record to the rolling JSONL log."""
+    global _turn_log
+    if not config.METRICS_LOG:
+        return
+    with _lock:
+        if _turn_log is None:
+            os.makedirs(os.path.dirname(config.METRICS_LOG) or ".", exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                config.METRICS_LOG, maxBytes=config.METRICS_LOG_MAX_BYTES,
+                backupCount=config.METRICS_LOG_BACKUPS, encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _turn_log = logging.getLogger("interview.metrics.turns")
+            _turn_log.propagate = False
+            _turn_log.setLevel(logging.INFO)
+            _turn_log.addHandler(handler)
+    _turn_log.info(json.dumps(record, ensure_ascii=False))
+
+
+def record_turn(turn, username=None):
+    """Update the metrics with a finished turn and append it to the JSONL log."""
+    provider, model = turn.get("provider"), turn.get("model")
+    if turn.get("opening_pool"):
+        outcome = "pooled"
+    elif turn.get("error"):
+        outcome = "error"
+    else:
+        outcome = "ok"
+    inc("interview_turns_total", outcome=outcome, provider=provider, model=model)
+    observe("interview_queue_wait_seconds", turn.get("queue_wait"), provider=provider)
+    observe("interview_ttft_seconds", turn.get("ttft"), provider=provider, model=model)
+    observe("interview_reply_seconds", turn.get("reply_seconds"), provider=provider, model=model)
+    observe("interview_output_tokens_per_second", turn.get("output_tokens_per_second"), provider=provider, model=model)
+    observe("interview_backup_seconds", turn.get("backup_seconds"))
+    for kind in ("input", "cached_input", "cache_write", "output"):
+        if turn.get(f"{kind}_tokens"):
+            inc("interview_tokens_total", turn[f"{kind}_tokens"], kind=kind, provider=provider, model=model)
+    if turn.get("rate_limit_retries"):
+        inc("interview_rate_limit_retries_total", turn["rate_limit_retries"], provider=provider)
+    if turn.get("failovers"):
+        inc("interview_failovers_total", provider=provider)
+    if turn.get("hedged"):
+        inc("interview_hedged_turns_total")
+    _log_turn({"time": time.time(), "username": username, **turn})
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=None, host="127.0.0.1"):
+    """Serve /metrics in a background thread, once per process (no-op if disabled or taken)."""
+    global _server, _server_attempted
+    port = config.METRICS_PORT if port is None else port
+    with _lock:
+        # Streamlit calls this on every rerun: a port taken by another process is tried only once
+        if _server_attempted or port is None:
+            return _server
+        _server_attempted = True
+        try:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError as e:
+            logger.warning("Metrics endpoint not started on port %s: %s", port, e)
+            return None
+    threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("Metrics on http://%s:%d/metrics", host, port)
+    return _server
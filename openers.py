@@ -0,0 +1,145 @@
+#openers.py - Pool of pre-generated opening messages, so new participants see the greeting instantly
+#
+# The first interviewer turn only depends on the provider, model and system prompt, so greetings
+# can be generated ahead of time and served from disk. Pools are keyed by a hash of that
+# configuration, so editing config.SYSTEM_PROMPT or MODEL automatically starts a new pool.
+# Live-generated greetings are added to the pool until it holds OPENING_POOL_SIZE entries.
+#
+# Pre-generate from the command line: python openers.py --count 10
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import config
+
+_pool_lock = threading.Lock()
+_pools = {}  # path -> (mtime, openings)
+
+
+def opening_config_hash(provider):
+    """Hash of everything the opening turn depends on."""
+    key = json.dumps([provider, config.MODEL, config.TEMPERATURE, config.SYSTEM_PROMPT])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def pool_path(provider):
+    return os.path.join(config.OPENING_POOL_DIRECTORY, f"{provider}_{opening_config_hash(provider)}.jsonl")
+
+
+def load_pool(provider):
+    """Openings for the current configuration (re-read only when the file changed)."""
+    with _pool_lock:
+        return _read_pool(pool_path(provider))
+
+
+def _read_pool(path):
+    # Callers hold _pool_lock
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return []
+    cached = _pools.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    openings = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                openings.append(json.loads(line)["content"])
+            except (json.JSONDecodeError, KeyError):
+                continue
+    _pools[path] = (mtime, openings)
+    return openings
+
+
+def get_opening(provider):
+    """A pre-generated opening for the current configuration, or None if the pool is empty."""
+    openings = load_pool(provider)
+    return random.choice(openings) if openings else None
+
+
+def add_opening(provider, content):
+    """Store a generated opening in the pool, unless the pool is already full."""
+    if not content or any(code in content for code in config.CLOSING_MESSAGES):
+        return False
+    path = pool_path(provider)
+    os.makedirs(config.OPENING_POOL_DIRECTORY, exist_ok=True)
+    # Checked and appended under the lock, so concurrent generators cannot overfill the pool
+    with _pool_lock:
+        openings = _read_pool(path)
+        if len(openings) >= config.OPENING_POOL_SIZE:
+            return False
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"content": content, "model": config.MODEL, "created": time.time()}) + "\n")
+        # The file may keep its mtime within the timestamp resolution, so update the cached copy too
+        _pools[path] = (os.path.getmtime(path), openings + [content])
+    return True
+
+
+def prune_stale_pools(provider):
+    """Delete pools of earlier configurations."""
+    current = pool_path(provider)
+    for path in glob.glob(os.path.join(config.OPENING_POOL_DIRECTORY, f"{provider}_*.jsonl")):
+        if os.path.abspath(path) != os.path.abspath(current):
+            os.remove(path)
+
+
+def generate_opening(client, provider):
+    """Generate one opening with the same inputs as a live first turn."""
+    kwargs = {"model": config.MODEL, "max_tokens": config.MAX_OUTPUT_TOKENS}
+    if config.TEMPERATURE is not None:
+        kwargs["temperature"] = config.TEMPERATURE
+    if provider == "openai":
+        response = client.chat.completions.create(
+            messages=[{"role": "system", "content": config.SYSTEM_PROMPT}], **kwargs
+        )
+        return response.choices[0].message.content
+    elif provider == "anthropic":
+        response = client.messages.create(
+            system=config.SYSTEM_PROMPT, messages=[{"role": "user", "content": "Hi"}], **kwargs
+        )
+        return "".join(block.text for block in response.content if block.type == "text")
+    raise ValueError(f"Unknown API provider: {provider}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate opening messages for the current config.")
+    parser.add_argument("--provider", default="openai", choices=["openai", "anthropic"])
+    parser.add_argument("--count", type=int, default=config.OPENING_POOL_SIZE)
+    parser.add_argument("--max-attempts", type=int, default=None,
+                        help="API calls to make at most (default: twice the openings missing)")
+    parser.add_argument("--api-key", default=os.environ.get("API_KEY"),
+                        help="defaults to $API_KEY or API_KEY in .streamlit/secrets.toml")
+    args = parser.parse_args()
+
+    api_key = args.api_key
+    if api_key is None:
+        import streamlit as st
+        api_key = st.secrets["API_KEY"]
+
+    import clients
+    client = clients.get_client(args.provider, api_key)
+    prune_stale_pools(args.provider)
+    target = min(args.count, config.OPENING_POOL_SIZE)
+    # Empty replies or replies with a closing code are rejected; stop instead of paying for them forever
+    max_attempts = args.max_attempts if args.max_attempts is not None else 2 * max(0, target - len(load_pool(args.provider)))
+    attempts = rejected = 0
+    while len(load_pool(args.provider)) < target and attempts < max_attempts:
+        attempts += 1
+        if not add_opening(args.provider, generate_opening(client, args.provider)):
+            rejected += 1
+    print(f"{len(load_pool(args.provider))} openings in {pool_path(args.provider)} "
+          f"({attempts} API calls, {rejected} replies rejected)")
+    if len(load_pool(args.provider)) < target:
+        sys.exit(f"Stopped after {attempts} attempts without reaching {target} openings")
+
+
+if __name__ == "__main__":
+    main()
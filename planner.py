@@ -0,0 +1,116 @@
+#planner.py - Construct-tracking question planner
+#
+# Tracks which constructs of config.MAIN_QUESTIONS and FOLLOW_UP_PROBES a session has covered,
+# with plain keyword matching: a construct is covered once the respondent used enough of its
+# CONSTRUCT_KEYWORDS, or answered one of its questions. The next focus is a construct the
+# respondent just touched on without covering it (its follow-up probe), otherwise the next
+# uncovered construct in outline order (its main questions). With config.PLANNER, the engine sends
+# this plan as a short system message after the conversation, and config.PLANNER_SYSTEM_PROMPT
+# replaces the full outline (see engine.build_api_kwargs).
+
+import re
+from functools import lru_cache
+
+import config
+
+WORD = re.compile(r"[a-z]+")
+# Words that say nothing about the construct a question is about
+STOPWORDS = frozenset("""
+a about an and any are can did do does ever for from has have how in is it like look make
+me more or out that the there this time to up usually was were what when which would you your
+""".split())
+
+
+def coverage_items():
+    """(construct, kind, text) of every main question and follow-up probe, in a fixed order."""
+    items = [(construct, "question", q["text"]) for q in config.MAIN_QUESTIONS for construct in q["constructs"]]
+    items += [(construct, "probe", text) for construct, text in config.FOLLOW_UP_PROBES.items()]
+    return items
+
+
+def question_keywords(text):
+    """Content words of a question, to recognise it in an interviewer message."""
+    return frozenset(WORD.findall(text.lower())) - STOPWORDS
+
+
+def match_score(keywords, words):
+    """Share of a question's keywords among the words of a message."""
+    return len(keywords & words) / len(keywords) if keywords else 0
+
+
+@lru_cache(maxsize=1)
+def _tables():
+    items = coverage_items()
+    constructs = list(dict.fromkeys(construct for construct, _, _ in items))
+    patterns = {
+        construct: re.compile(r"\b(?:" + "|".join(map(re.escape, keywords)) + ")")
+        for construct, keywords in config.CONSTRUCT_KEYWORDS.items() if keywords
+    }
+    return constructs, [(construct, kind, text, question_keywords(text)) for construct, kind, text in items], patterns
+
+
+def keyword_hits(text):
+    """Keywords of each construct found in a respondent message."""
+    _, _, patterns = _tables()
+    text = text.lower()
+    return {construct: set(pattern.findall(text)) for construct, pattern in patterns.items()}
+
+
+def coverage(messages):
+    """Per construct: whether the conversation in `messages` covered it."""
+    constructs, items, _ = _tables()
+    hits = {construct: set() for construct in constructs}
+    answered = set()
+    asked = ()
+    for message in messages:
+        if message["role"] == "assistant":
+            words = set(WORD.findall(message["content"].lower()))
+            asked = {construct for construct, _, _, keywords in items
+                     if match_score(keywords, words) >= config.PLANNER_QUESTION_MATCH}
+        elif message["role"] == "user" and message["content"] != "Hi":
+            answered |= asked
+            for construct, found in keyword_hits(message["content"]).items():
+                hits.setdefault(construct, set()).update(found)
+    return {construct: construct in answered or len(hits.get(construct, ())) >= config.PLANNER_MIN_KEYWORD_HITS
+            for construct in constructs}
+
+
+def next_focus(messages, covered=None):
+    """(construct, kind) to explore next: "probe" to follow up on the last answer, "question" for a
+    new construct; None once all constructs are covered."""
+    constructs, items, _ = _tables()
+    covered = coverage(messages) if covered is None else covered
+    last_answer = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    touched = [construct for construct, found in keyword_hits(last_answer).items() if found]
+    probes = {construct for construct, kind, _, _ in items if kind == "probe"}
+    for construct in constructs:
+        if construct in touched and not covered[construct] and construct in probes:
+            return construct, "probe"
+    for construct in constructs:
+        if not covered[construct]:
+            return construct, "question"
+    return None
+
+
+def plan_directive(messages):
+    """The interview plan for the next interviewer turn, and the number of constructs covered."""
+    constructs, items, _ = _tables()
+    covered = coverage(messages)
+    done = [construct for construct in constructs if covered[construct]]
+    focus = next_focus(messages, covered)
+    lines = ["Interview plan (not visible to the respondent).",
+             f"Covered so far: {', '.join(done) if done else 'nothing yet'}."]
+    if focus is None:
+        lines.append("All topics are covered: write the summary and ask for the evaluation as instructed.")
+    else:
+        construct, kind = focus
+        texts = [text for c, k, text, _ in items if c == construct and k == kind]
+        if kind == "probe":
+            lines.append(f"Next focus: follow up on {construct.replace('_', ' ')} in the last answer, e.g. \"{texts[0]}\"")
+        else:
+            lines.append(f"Next focus: {construct.replace('_', ' ')}. Ask in your own words, one at a time: "
+                         + " / ".join(f'"{text}"' for text in texts))
+        remaining = [c for c in constructs if not covered[c] and c != construct]
+        if remaining:
+            lines.append(f"Still to cover afterwards: {', '.join(remaining)}.")
+    return "\n".join(lines), len(done)
@@ -0,0 +1,59 @@
+#prompt_cache.py - Cache-eligible request layout and per-turn usage accounting
+#
+# SYSTEM_PROMPT is identical for every participant and turn. Providers can reuse the processed
+# prefix of a request if it is byte-identical across requests:
+# - OpenAI caches prompt prefixes automatically, so the system prompt must stay the very first
+#   message and anything that varies (e.g. the summary of compacted turns) must come after it.
+# - Anthropic caches up to explicit `cache_control` breakpoints: one after the system prompt
+#   (shared by all sessions) and one on the latest message (the conversation so far, reused by
+#   the same session's next turn).
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def anthropic_system_blocks(system_texts, cache=True):
+    """System blocks with a cache breakpoint after the first (static) text."""
+    blocks = [{"type": "text", "text": text} for text in system_texts]
+    if cache and blocks:
+        blocks[0]["cache_control"] = CACHE_CONTROL
+    return blocks
+
+
+def anthropic_messages(messages, cache=True, trailing_text=None):
+    """Copy of `messages` with a cache breakpoint on the last message.
+
+    `trailing_text` (e.g. the planner's directive for this turn) is added to the last message
+    after the breakpoint, so the next turn still reuses the cached conversation.
+    """
+    messages = [{"role": m["role"], "content": m["content"]} for m in messages]
+    if messages and (cache or trailing_text):
+        last = messages[-1]
+        last["content"] = [{"type": "text", "text": last["content"]}]
+        if cache:
+            last["content"][0]["cache_control"] = CACHE_CONTROL
+        if trailing_text:
+            last["content"].append({"type": "text", "text": trailing_text})
+    return messages
+
+
+def openai_usage(usage):
+    """Normalize an OpenAI `CompletionUsage` (from the final chunk of a stream)."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "input_tokens": usage.prompt_tokens,
+        "cached_input_tokens": (getattr(details, "cached_tokens", None) or 0),
+        "cache_write_tokens": 0,
+        "output_tokens": usage.completion_tokens,
+    }
+
+
+def anthropic_usage(usage):
+    """Normalize an Anthropic `Usage`; its input_tokens exclude cached and cache-write tokens."""
+    cached = getattr(usage, "cache_read_input_tokens", None) or 0
+    written = getattr(usage, "cache_creation_input_tokens", None) or 0
+    return {
+        "input_tokens": usage.input_tokens + cached + written,
+        "cached_input_tokens": cached,
+        "cache_write_tokens": written,
+        "output_tokens": usage.output_tokens,
+    }
@@ -0,0 +1,241 @@
+#rate_limit.py - Shared admission control for model API calls
+#
+# Token buckets for requests/min and tokens/min are stored in a local SQLite database, so all
+# app processes on a machine draw from the same budget. Callers wait in a shared queue ordered
+# by priority, then arrival: interviews already in progress go before new ones, so a panel
+# launch cannot starve participants who are mid-interview, and batch jobs go last. The token cost of a call is estimated
+# from the prompt size plus MAX_OUTPUT_TOKENS and corrected with the real usage afterwards.
+
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import config
+
+PRIORITY_IN_PROGRESS = 0
+PRIORITY_NEW = 1
+PRIORITY_BATCH = 2  # offline work such as replay.py, admitted after all interviews
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    level REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS waiters (
+    id TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    enqueued REAL NOT NULL,
+    heartbeat REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS waiters_order ON waiters (scope, priority, enqueued);
+"""
+
+WAITER_STALE_SECONDS = 10  # waiters of crashed processes are skipped after this long
+HEARTBEAT_SECONDS = 2  # how often a waiter refreshes its heartbeat (the only write while it is not at the head)
+MAX_POLL_SECONDS = 0.5
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a call could not be admitted within the timeout."""
+
+
+class AdmissionCancelled(Exception):
+    """Raised when a caller stopped waiting for admission (see `acquire`'s `cancel`)."""
+
+
+class RateLimiter:
+    """Requests/min and tokens/min token buckets shared through SQLite.
+
+    Limiters with different `scope` (one per provider account) share the database but not budgets.
+    """
+
+    def __init__(self, db_path, requests_per_minute, tokens_per_minute, scope="default"):
+        self.db_path = db_path
+        self.scope = scope
+        # Bucket name -> (capacity, refill per second)
+        self.buckets = {}
+        if requests_per_minute:
+            self.buckets["requests"] = (requests_per_minute, requests_per_minute / 60)
+        if tokens_per_minute:
+            self.buckets["tokens"] = (tokens_per_minute, tokens_per_minute / 60)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _levels(self, db, now):
+        """Current bucket levels after refilling."""
+        levels = {}
+        for name, (capacity, rate) in self.buckets.items():
+            row = db.execute(
+                "SELECT level, updated FROM buckets WHERE name = ?", (f"{self.scope}:{name}",)
+            ).fetchone()
+            level = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            levels[name] = level
+        return levels
+
+    def _store(self, db, levels, now):
+        db.executemany(
+            "INSERT INTO buckets (name, level, updated) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET level = excluded.level, updated = excluded.updated",
+            [(f"{self.scope}:{name}", level, now) for name, level in levels.items()],
+        )
+
+    def _costs(self, tokens):
+        costs = {"requests": 1, "tokens": tokens}
+        # A single call larger than a whole bucket would wait forever
+        return {name: min(costs[name], capacity) for name, (capacity, _) in self.buckets.items()}
+
+    def _head(self, db, now):
+        row = db.execute(
+            "SELECT id FROM waiters WHERE scope = ? AND heartbeat >= ? ORDER BY priority, enqueued, id LIMIT 1",
+            (self.scope, now - WAITER_STALE_SECONDS),
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def try_acquire(self, waiter_id, tokens, priority, enqueued, heartbeat=True):
+        """Take capacity if this waiter is at the head of the queue; returns 0 or seconds to wait.
+
+        The waiter's heartbeat is only written with `heartbeat` (at least every HEARTBEAT_SECONDS,
+        see `acquire`), so waiters behind the head poll with a read-only query.
+        """
+        now = time.time()
+        with self._connect() as db:
+            if heartbeat:
+                db.execute(
+                    "INSERT INTO waiters (id, scope, priority, enqueued, heartbeat) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                    (waiter_id, self.scope, priority, enqueued, now),
+                )
+            if self._head(db, now) != waiter_id:
+                return MAX_POLL_SECONDS / 5
+
+            db.execute("BEGIN IMMEDIATE")
+            # Confirm inside the transaction: a waiter that arrived since may now be the head
+            if self._head(db, now) != waiter_id:
+                db.execute("ROLLBACK")
+                return MAX_POLL_SECONDS / 5
+            levels = self._levels(db, now)
+            costs = self._costs(tokens)
+            deficits = [
+                (costs[name] - levels[name]) / self.buckets[name][1]
+                for name in self.buckets if levels[name] < costs[name]
+            ]
+            if deficits:
+                db.execute("ROLLBACK")
+                return min(max(deficits), MAX_POLL_SECONDS)
+            for name in self.buckets:
+                levels[name] -= costs[name]
+            self._store(db, levels, now)
+            db.execute("DELETE FROM waiters WHERE id = ? OR heartbeat < ?", (waiter_id, now - WAITER_STALE_SECONDS))
+            db.execute("COMMIT")
+            return 0
+
+    def leave(self, waiter_id):
+        with self._connect() as db:
+            db.execute("DELETE FROM waiters WHERE id = ?", (waiter_id,))
+
+    def acquire(self, tokens, priority=PRIORITY_NEW, timeout=None, cancel=None):
+        """Block until the call is admitted; returns the seconds waited.
+
+        Setting the threading.Event `cancel` ends the wait with AdmissionCancelled.
+        """
+        if not self.buckets:
+            return 0
+        waiter_id, start = uuid.uuid4().hex, time.time()
+        beat = 0
+        try:
+            while True:
+                heartbeat = time.time() - beat >= HEARTBEAT_SECONDS
+                if heartbeat:
+                    beat = time.time()
+                if (wait := self.try_acquire(waiter_id, tokens, priority, start, heartbeat)) <= 0:
+                    break
+                if timeout is not None and time.time() - start + wait > timeout:
+                    raise RateLimitTimeout(f"Not admitted within {timeout} seconds")
+                if cancel is None:
+                    time.sleep(wait * random.uniform(0.8, 1.2))
+                elif cancel.wait(wait * random.uniform(0.8, 1.2)):
+                    raise AdmissionCancelled("Stopped waiting for admission")
+        except BaseException:
+            self.leave(waiter_id)
+            raise
+        return time.time() - start
+
+    async def acquire_async(self, tokens, priority=PRIORITY_NEW, timeout=None):
+        """Async version of `acquire` (database access runs in a worker thread)."""
+        if not self.buckets:
+            return 0
+        waiter_id, start = uuid.uuid4().hex, time.time()
+        beat = 0
+        try:
+            while True:
+                heartbeat = time.time() - beat >= HEARTBEAT_SECONDS
+                if heartbeat:
+                    beat = time.time()
+                if (wait := await asyncio.to_thread(self.try_acquire, waiter_id, tokens, priority, start, heartbeat)) <= 0:
+                    break
+                if timeout is not None and time.time() - start + wait > timeout:
+                    raise RateLimitTimeout(f"Not admitted within {timeout} seconds")
+                await asyncio.sleep(wait * random.uniform(0.8, 1.2))
+        except BaseException:
+            await asyncio.to_thread(self.leave, waiter_id)
+            raise
+        return time.time() - start
+
+    def refund(self, tokens):
+        """Return over-estimated tokens to the tokens bucket (negative values charge extra)."""
+        if "tokens" not in self.buckets or not tokens:
+            return
+        now = time.time()
+        capacity = self.buckets["tokens"][0]
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            levels = self._levels(db, now)
+            levels["tokens"] = max(-capacity, min(capacity, levels["tokens"] + tokens))
+            self._store(db, levels, now)
+            db.execute("COMMIT")
+
+
+def is_rate_limit_error(error):
+    """True for provider errors that mean 'slow down' (429 and Anthropic's 529 overloaded)."""
+    if type(error).__name__ in ("RateLimitError", "OverloadedError"):
+        return True
+    return getattr(error, "status_code", None) in (429, 529)
+
+
+def retry_delay(attempt):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(config.RATE_LIMIT_RETRY_MAX, config.RATE_LIMIT_RETRY_BASE * 2 ** attempt))
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider="openai"):
+    """Process-wide limiter of a provider's account, using the limits in config.py."""
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = RateLimiter(
+                config.RATE_LIMIT_DB,
+                config.RATE_LIMIT_REQUESTS_PER_MINUTE,
+                config.RATE_LIMIT_TOKENS_PER_MINUTE,
+                scope=provider,
+            )
+        return _limiters[provider]
@@ -0,0 +1,251 @@
+#registry.py - Shared registry of interviews: unique usernames, resumption and completion
+#
+# Every interview claims its username here when it starts, so two participants who start in the
+# same second never share transcript and backup files (the second one gets a "_2" suffix). The
+# registry also records the Qualtrics response ID of each interview, so a participant who refreshes
+# the page or returns after a server restart continues from their journal (one indexed query, no
+# scan of the backups directory), and marks interviews as completed for repeat participant checks.
+#
+# The registry is a SQLite database (WAL mode) shared by all app processes on a machine. For
+# several machines behind a load balancer, run it as a small HTTP service on one of them:
+#   python registry.py --serve --host 10.0.0.5 --port 8765
+# and set REGISTRY_URL = "http://<host>:8765" and the same REGISTRY_SECRET in config.py on every
+# machine. Calls without that secret are refused; bind the service to a private interface only.
+
+import argparse
+import hmac
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interviews (
+    username TEXT PRIMARY KEY,
+    response_id TEXT,
+    session_id TEXT,
+    provider TEXT,
+    start_time TEXT,
+    created REAL NOT NULL,
+    completed REAL,
+    transcript TEXT
+);
+CREATE INDEX IF NOT EXISTS interviews_response ON interviews (response_id, created);
+"""
+
+
+class InterviewRegistry:
+    """Registry in a SQLite database shared by the app processes of one machine."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def claim(self, username, response_id=None, session_id=None, provider=None, start_time=None):
+        """Register a new interview under `username`, or the first free `username_<n>`; returns the name."""
+        with self._connect() as db:
+            for n in itertools.count(1):
+                candidate = username if n == 1 else f"{username}_{n}"
+                try:
+                    db.execute(
+                        "INSERT INTO interviews (username, response_id, session_id, provider, start_time, created) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (candidate, response_id, session_id, provider, start_time, time.time()),
+                    )
+                    return candidate
+                except sqlite3.IntegrityError:
+                    continue
+
+    def lookup(self, response_id):
+        """The latest interview of `response_id` as a dict, or None."""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT * FROM interviews WHERE response_id = ? ORDER BY created DESC LIMIT 1", (response_id,)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def complete(self, username, transcript=None):
+        """Mark an interview as completed."""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE interviews SET completed = ?, transcript = ? WHERE username = ?",
+                (time.time(), transcript, username),
+            )
+
+    def is_completed(self, username=None, response_id=None):
+        """True if an interview of this username or response ID was completed."""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT 1 FROM interviews WHERE completed IS NOT NULL AND (username = ? OR response_id = ?) LIMIT 1",
+                (username, response_id),
+            ).fetchone()
+        return row is not None
+
+    def import_transcripts(self, directory):
+        """Register the completed transcripts of `directory` (written before the registry existed)."""
+        imported = 0
+        with self._connect() as db:
+            for entry in os.scandir(directory):
+                if not entry.name.endswith(".txt"):
+                    continue
+                header = _transcript_header(entry.path)
+                username = header.get("Username") or entry.name[:-4]
+                uid = header.get("UID")
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO interviews (username, response_id, start_time, created, completed, transcript) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (username, None if uid in (None, "None") else uid, header.get("Start Time (CT)"),
+                     entry.stat().st_mtime, entry.stat().st_mtime, os.path.abspath(entry.path)),
+                )
+                imported += cursor.rowcount
+        return imported
+
+
+def _transcript_header(path):
+    """Fields of the metadata header of a transcript (see journal.format_transcript)."""
+    header = {}
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith("==="):
+                if header:
+                    break
+                continue
+            key, sep, value = line.rstrip("\n").partition(": ")
+            if not sep:
+                break
+            header[key] = value
+    return header
+
+
+SECRET_HEADER = "X-Registry-Secret"
+
+
+class RemoteRegistry:
+    """Client of a registry served over HTTP by `python registry.py --serve` (for several machines)."""
+
+    def __init__(self, url):
+        import httpx
+        headers = {SECRET_HEADER: config.REGISTRY_SECRET} if config.REGISTRY_SECRET else {}
+        self.http = httpx.Client(base_url=url.rstrip("/"), headers=headers, timeout=config.REGISTRY_TIMEOUT)
+
+    def _call(self, method, **params):
+        response = self.http.post(f"/{method}", json=params)
+        response.raise_for_status()
+        return response.json()["result"]
+
+    def claim(self, username, response_id=None, session_id=None, provider=None, start_time=None):
+        return self._call("claim", username=username, response_id=response_id, session_id=session_id,
+                          provider=provider, start_time=start_time)
+
+    def lookup(self, response_id):
+        return self._call("lookup", response_id=response_id)
+
+    def complete(self, username, transcript=None):
+        return self._call("complete", username=username, transcript=transcript)
+
+    def is_completed(self, username=None, response_id=None):
+        return self._call("is_completed", username=username, response_id=response_id)
+
+
+class RegistryServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # many app processes start interviews at once during a panel launch
+
+    def __init__(self, address, registry, secret):
+        super().__init__(address, RegistryHandler)
+        self.registry = registry
+        self.secret = secret.encode("utf-8")
+
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    METHODS = ("claim", "lookup", "complete", "is_completed")
+
+    def do_POST(self):
+        secret = self.headers.get(SECRET_HEADER, "").encode("utf-8")
+        if not hmac.compare_digest(secret, self.server.secret):
+            self.send_error(401)
+            return
+        method = urlparse(self.path).path.strip("/")
+        if method not in self.METHODS:
+            self.send_error(404)
+            return
+        params = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        try:
+            result = getattr(self.server.registry, method)(**params)
+        except TypeError as e:
+            self.send_error(400, str(e))
+            return
+        body = json.dumps({"result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # Health check for the load balancer
+        if urlparse(self.path).path != "/health":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """The process-wide registry: remote if config.REGISTRY_URL is set, else the local database."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = RemoteRegistry(config.REGISTRY_URL) if config.REGISTRY_URL else InterviewRegistry(config.REGISTRY_DB)
+        return _registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Interview registry: serve it to other machines or import old transcripts.")
+    parser.add_argument("--serve", action="store_true", help="serve the local registry database over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--import-transcripts", action="store_true",
+                        help="mark the transcripts in TRANSCRIPTS_DIRECTORY as completed interviews")
+    args = parser.parse_args()
+
+    registry = InterviewRegistry(config.REGISTRY_DB)
+    if args.import_transcripts:
+        print(f"Imported {registry.import_transcripts(config.TRANSCRIPTS_DIRECTORY)} transcripts")
+    if args.serve:
+        if not config.REGISTRY_SECRET:
+            sys.exit("Set REGISTRY_SECRET in config.py before serving the registry")
+        server = RegistryServer((args.host, args.port), registry, config.REGISTRY_SECRET)
+        print(f"Interview registry on http://{args.host}:{args.port}", flush=True)
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#replay.py - Replay recorded interviews against other models and prompts
+#
+# Every interviewer turn of the recorded transcripts is generated again from the recorded history
+# up to it: the respondent side is fixed, so the interviewer turns of different configurations
+# (model, interview outline) can be compared turn by turn. Requests are built by
+# InterviewEngine.build_api_kwargs and sent through the engine's rate-limited routes, like live
+# turns. Replies are cached in a SQLite database keyed by model, prompt hash and history hash, so
+# rerunning a comparison only calls the model for cases it has not seen.
+#
+#   python replay.py --model gpt-4o-mini --model gpt-4o [--outline new_outline.txt] [--limit 50]
+#
+# Configurations run one after another (the outline of a configuration is config.SYSTEM_PROMPT
+# while it runs); within a configuration, --concurrency cases run at once. With --planner, each
+# model is also run with the question planner (config.PLANNER_SYSTEM_PROMPT, see planner.py); the
+# planner has its own outline, so --outline cannot be combined with it. To test without an API,
+# point the SDKs at benchmarks/fake_llm.py with OPENAI_BASE_URL / ANTHROPIC_BASE_URL.
+
+import argparse
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import config
+from engine import InterviewEngine
+from journal import read_transcript
+from rate_limit import PRIORITY_BATCH
+from router import Route
+from streaming import stored_closing_code
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS replies (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    history_hash TEXT NOT NULL,
+    reply TEXT NOT NULL,
+    usage TEXT NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+Configuration = collections.namedtuple("Configuration", ["name", "provider", "model", "system_prompt", "planner"],
+                                       defaults=[False])
+# What build_api_kwargs needs of a session
+ReplaySession = collections.namedtuple("ReplaySession", ["username", "messages"])
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def system_prompt(outline):
+    """The system prompt for an interview outline, assembled as in config.py."""
+    return f"{outline}\n\n{config.GENERAL_INSTRUCTIONS}\n\n{config.CODES}"
+
+
+def provider_for(model):
+    return "anthropic" if model.startswith("claude") else "openai"
+
+
+class ReplyCache:
+    """Replies by (model, prompt hash, history hash), shared by all replay runs on a machine."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def key(model, prompt_hash, history_hash):
+        return f"{model}:{prompt_hash}:{history_hash}"
+
+    def get(self, model, prompt_hash, history_hash):
+        with self._connect() as db:
+            row = db.execute("SELECT reply, usage FROM replies WHERE key = ?",
+                             (self.key(model, prompt_hash, history_hash),)).fetchone()
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def put(self, model, prompt_hash, history_hash, reply, usage):
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO replies (key, model, prompt_hash, history_hash, reply, usage, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.key(model, prompt_hash, history_hash), model, prompt_hash, history_hash, reply,
+                 json.dumps(usage), time.time()),
+            )
+
+
+def load_cases(directory, limit=None):
+    """Replay cases of the transcripts in `directory`: each interviewer turn with the history before it."""
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".txt"))[:limit]
+    cases = []
+    for name in names:
+        fields, messages = read_transcript(os.path.join(directory, name))
+        # The initial "Hi" sent to Anthropic models is added again by provider_messages if needed
+        if fields.get("API") == "anthropic" and messages and messages[0] == {"role": "user", "content": "Hi"}:
+            messages = messages[1:]
+        for i, message in enumerate(messages):
+            if message["role"] == "assistant" and (i == 0 or messages[i - 1]["role"] == "user"):
+                cases.append({"transcript": name, "turn": i, "history": messages[:i], "recorded": message["content"]})
+    return cases
+
+
+class ReplayEngine(InterviewEngine):
+    """Engine for replayed turns: same requests and routes, admitted after live interviews."""
+
+    def _admission(self, turn):
+        tokens, _ = super()._admission(turn)
+        return tokens, PRIORITY_BATCH
+
+    def reply(self, session, route, turn):
+        """The complete reply of `route` to the session's messages, with usage recorded in `turn`."""
+        attempt = self._attempt(turn, route, 0)
+        start = time.perf_counter()
+        reply = "".join(self._route_reply(session, attempt, route))
+        attempt["reply_seconds"] = time.perf_counter() - start
+        return reply, attempt
+
+
+class ReplayRunner:
+    """Generates the interviewer turns of the replay cases for one configuration at a time."""
+
+    def __init__(self, api_key, cache, concurrency=8):
+        self.api_key = api_key
+        self.cache = cache
+        self.concurrency = concurrency
+        self.engines = {}
+
+    def run(self, configuration, cases):
+        """Results of all cases for `configuration` (one dict per case, in order)."""
+        engine = self.engines.setdefault(configuration.provider, ReplayEngine(configuration.provider, self.api_key))
+        route = Route(configuration.provider, configuration.model, self.api_key)
+        original = config.SYSTEM_PROMPT, config.PLANNER
+        config.SYSTEM_PROMPT, config.PLANNER = configuration.system_prompt, configuration.planner
+        try:
+            # Keyed by the system prompt the engine sends while this configuration runs
+            prompt = config.SYSTEM_PROMPT
+            if config.PLANNER:
+                # The plan sent with each turn depends on the questions, probes and keywords
+                prompt += json.dumps([config.MAIN_QUESTIONS, config.FOLLOW_UP_PROBES, config.CONSTRUCT_KEYWORDS,
+                                      config.PLANNER_MIN_KEYWORD_HITS, config.PLANNER_QUESTION_MATCH])
+            prompt_hash = text_hash(prompt)
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                return list(pool.map(lambda case: self._run_case(engine, route, prompt_hash, case), cases))
+        finally:
+            config.SYSTEM_PROMPT, config.PLANNER = original
+
+    def _run_case(self, engine, route, prompt_hash, case):
+        history_hash = text_hash(json.dumps(case["history"]))
+        result = {"transcript": case["transcript"], "turn": case["turn"], "recorded": case["recorded"]}
+        cached = self.cache.get(route.model, prompt_hash, history_hash)
+        if cached is not None:
+            result["reply"], result["usage"] = cached
+            result["cached"] = True
+            return result
+
+        session = ReplaySession(f"replay_{case['transcript'][:-4]}", [{"role": "system", "content": config.SYSTEM_PROMPT}] + case["history"])
+        try:
+            reply, usage = engine.reply(session, route, {"turn": case["turn"]})
+        except Exception as e:
+            result.update(reply=None, usage={}, error=str(e), cached=False)
+            return result
+        self.cache.put(route.model, prompt_hash, history_hash, reply, usage)
+        result.update(reply=reply, usage=usage, cached=False)
+        return result
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] if values else float("nan")
+
+
+def report(configuration, results):
+    """Printable summary of one configuration's results."""
+    done = [r for r in results if r["reply"] is not None]
+    latency = [r["usage"]["reply_seconds"] for r in done if "reply_seconds" in r["usage"]]
+    ttft = [r["usage"]["ttft"] for r in done if "ttft" in r["usage"]]
+    input_tokens = [r["usage"]["input_tokens"] for r in done if "input_tokens" in r["usage"]]
+    output_tokens = [r["usage"]["output_tokens"] for r in done if "output_tokens" in r["usage"]]
+    closes = [stored_closing_code(r["reply"]) is not None for r in done]
+    # Recorded turns hold the closing message the engine stored, replies the code itself
+    recorded = [stored_closing_code(r["recorded"]) is not None for r in done]
+    multi = [r["reply"].count("?") > 1 for r in done]
+    lines = [
+        f"{configuration.name}: {len(done)}/{len(results)} turns ({sum(r['cached'] for r in results)} from cache, "
+        f"{len(results) - len(done)} failed)",
+        f"  latency p50 {percentile(latency, 50):.2f} s, p95 {percentile(latency, 95):.2f} s; "
+        f"first token p50 {percentile(ttft, 50):.2f} s",
+        f"  input tokens mean {sum(input_tokens) / max(1, len(input_tokens)):.0f}, "
+        f"output tokens mean {sum(output_tokens) / max(1, len(output_tokens)):.0f}, "
+        f"replies with several questions {sum(multi) / max(1, len(done)):.0%}",
+        f"  closing code: {sum(closes)} replies ({sum(c and r for c, r in zip(closes, recorded))} where recorded, "
+        f"{sum(c and not r for c, r in zip(closes, recorded))} early, {sum(r and not c for c, r in zip(closes, recorded))} missed)",
+    ]
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded interviews against other models and interview outlines.")
+    parser.add_argument("--directory", default=config.TRANSCRIPTS_DIRECTORY)
+    parser.add_argument("--model", action="append", help="model to compare (repeatable; default: config.MODEL)")
+    parser.add_argument("--outline", action="append", help="text file with an alternative INTERVIEW_OUTLINE (repeatable)")
+    parser.add_argument("--planner", action="store_true", help="also run each model with the question planner")
+    parser.add_argument("--limit", type=int, default=None, help="number of transcripts to replay")
+    parser.add_argument("--concurrency", type=int, default=config.REPLAY_CONCURRENCY)
+    parser.add_argument("--cache", default=config.REPLAY_CACHE_DB)
+    parser.add_argument("--output", help="write each case's recorded and replayed turn to this JSON Lines file")
+    args = parser.parse_args()
+    if args.outline and (args.planner or config.PLANNER):
+        # The planner prompt has its own outline (config.PLANNER_OUTLINE) and takes its questions from
+        # config.MAIN_QUESTIONS, so an alternative INTERVIEW_OUTLINE would not be what the model sees
+        parser.error("--outline cannot be combined with the question planner (--planner or config.PLANNER)")
+
+    prompts = [("config.py", config.SYSTEM_PROMPT, config.PLANNER)]
+    for path in args.outline or []:
+        with open(path, "r", encoding="utf-8") as f:
+            prompts.append((os.path.basename(path), system_prompt(f.read().strip()), False))
+    if args.planner and not config.PLANNER:
+        prompts.append(("planner", config.PLANNER_SYSTEM_PROMPT, True))
+    configurations = [Configuration(f"{model} / {prompt_name}", provider_for(model), model, prompt, planner)
+                      for model in args.model or [config.MODEL] for prompt_name, prompt, planner in prompts]
+
+    api_key = os.environ.get("API_KEY")
+    if api_key is None:
+        import streamlit as st
+        api_key = st.secrets["API_KEY"]
+    cases = load_cases(args.directory, args.limit)
+    runner = ReplayRunner(api_key, ReplyCache(args.cache), args.concurrency)
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    try:
+        for configuration in configurations:
+            results = runner.run(configuration, cases)
+            print("\n".join(report(configuration, results)), flush=True)
+            for result in results if output else []:
+                output.write(json.dumps({"configuration": configuration.name, **result}) + "\n")
+    finally:
+        if output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#router.py - Provider routing: failover between OpenAI and Anthropic, health tracking, hedging
+#
+# An engine has a list of routes (provider, model, API key) in order of preference: the main
+# provider from config.API and config.MODEL, then config.FALLBACK_PROVIDERS whose API key is set.
+# Each turn tries the healthy routes in that order. A route that fails PROVIDER_MAX_FAILURES times
+# in a row is skipped for PROVIDER_COOLDOWN seconds (used only as a last resort meanwhile).
+# With config.HEDGE_AFTER, the next route is also asked when no first token has arrived by then;
+# the first to produce a token wins and the other request is cancelled (see engine.py).
+
+import collections
+import logging
+import os
+import threading
+import time
+
+import clients
+import config
+
+logger = logging.getLogger(__name__)
+
+Route = collections.namedtuple("Route", ["provider", "model", "api_key"])
+
+
+def route_key(route):
+    """Hashable identity of a route without the raw API key."""
+    return clients.registry_key(route.provider, route.api_key) + (route.model,)
+
+
+class ProviderHealth:
+    """Recent outcomes of one route, shared by all sessions of the process."""
+
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.skip_until = 0
+        self.ttft = None  # moving average of the time to first token
+        self.lock = threading.Lock()
+
+    def available(self):
+        return time.monotonic() >= self.skip_until
+
+    def record_success(self, ttft=None):
+        with self.lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            if ttft is not None:
+                self.ttft = ttft if self.ttft is None else 0.8 * self.ttft + 0.2 * ttft
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= config.PROVIDER_MAX_FAILURES:
+                self.skip_until = time.monotonic() + config.PROVIDER_COOLDOWN
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def health(route):
+    key = route_key(route)
+    with _health_lock:
+        if key not in _health:
+            _health[key] = ProviderHealth()
+        return _health[key]
+
+
+def order_routes(routes):
+    """Routes to try for a turn: available ones in order of preference, then those in cooldown."""
+    available = [route for route in routes if health(route).available()]
+    return available + [route for route in routes if route not in available]
+
+
+def secret(name):
+    """API key from the environment or .streamlit/secrets.toml (None if not set)."""
+    value = os.environ.get(name)
+    if value is None:
+        try:
+            import streamlit as st
+            value = st.secrets.get(name)
+        except Exception:
+            value = None
+    return value
+
+
+def fallback_routes(primary_provider=None):
+    """Routes of config.FALLBACK_PROVIDERS whose API key is available."""
+    routes = []
+    for fallback in config.FALLBACK_PROVIDERS:
+        if fallback["provider"] == primary_provider and fallback["model"] == config.MODEL:
+            continue
+        api_key = secret(fallback["api_key_secret"])
+        if api_key:
+            routes.append(Route(fallback["provider"], fallback["model"], api_key))
+        else:
+            logger.info("No API key %s: fallback %s is disabled", fallback["api_key_secret"], fallback["provider"])
+    return tuple(routes)
@@ -0,0 +1,125 @@
+#server.py - HTTP/SSE service for running interviews without Streamlit (e.g. embedded in Qualtrics)
+#
+# Start with: python server.py [--host 0.0.0.0] [--port 8000]   (API key from $API_KEY or
+# .streamlit/secrets.toml). Sessions are held in memory by the process, so run one process per
+# load-balancer backend with sticky routing on the session ID.
+#
+# Endpoints:
+#   POST /sessions                    {"uid": optional Qualtrics UID} -> {"session_id", "username"}
+#                                     (a known uid continues its latest interview)
+#   POST /sessions/<id>/turns         {"content": respondent message; omit for the opening turn
+#                                     or to answer the last message of a resumed interview}
+#                                     -> text/event-stream of engine events (see engine.py)
+#   GET  /sessions/<id>               -> {"messages", "active", "awaiting_reply", "closing_code"}
+#   POST /sessions/<id>/cancel        -> text/event-stream of the closing events
+
+import argparse
+import json
+import os
+
+from flask import Flask, Response, abort, jsonify, request, stream_with_context
+
+import config
+import metrics
+from engine import get_engine
+from router import fallback_routes
+
+app = Flask(__name__)
+
+
+def api_key():
+    key = os.environ.get("API_KEY")
+    if key is None:
+        import streamlit as st
+        key = st.secrets["API_KEY"]
+    return key
+
+
+def current_engine():
+    provider = app.config.get("API_PROVIDER", config.API)
+    return get_engine(provider, api_key(), fallback_routes(provider))
+
+
+def session_or_404(session_id):
+    session = current_engine().get(session_id)
+    if session is None:
+        abort(404, description="Unknown interview session.")
+    return session
+
+
+def sse(events):
+    """Format engine events as Server-Sent Events."""
+    for event in events:
+        yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def event_stream(events):
+    return Response(
+        stream_with_context(sse(events)),
+        mimetype="text/event-stream",
+        # Disable proxy buffering so deltas reach the browser as they are produced
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/sessions")
+def create_session():
+    body = request.get_json(silent=True) or {}
+    # A returning participant (same uid) continues their interview, also after a restart
+    engine = current_engine()
+    session = engine.resume(body.get("uid")) or engine.start(response_id=body.get("uid"))
+    return jsonify({"session_id": session.session_id, "username": session.username}), 201
+
+
+@app.get("/sessions/<session_id>")
+def get_session(session_id):
+    session = session_or_404(session_id)
+    return jsonify({
+        "messages": session.visible_messages(),
+        "active": session.active,
+        "awaiting_reply": session.awaiting_reply,
+        "closing_code": session.closing_code,
+    })
+
+
+@app.post("/sessions/<session_id>/turns")
+def create_turn(session_id):
+    session = session_or_404(session_id)
+    if not session.active:
+        abort(409, description="The interview is no longer active.")
+    content = (request.get_json(silent=True) or {}).get("content")
+    if session.messages and not session.awaiting_reply and not content:
+        abort(400, description="'content' is required after the opening turn.")
+    if not session.messages or session.awaiting_reply:
+        content = None
+    return event_stream(current_engine().stream_turn(session, content))
+
+
+@app.post("/sessions/<session_id>/cancel")
+def cancel_session(session_id):
+    session = session_or_404(session_id)
+    return event_stream(current_engine().cancel(session))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the interview HTTP/SSE service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--provider", default=config.API, choices=["openai", "anthropic"])
+    args = parser.parse_args()
+
+    for directory in [config.TRANSCRIPTS_DIRECTORY, config.BACKUPS_DIRECTORY]:
+        os.makedirs(directory, exist_ok=True)
+    app.config["API_PROVIDER"] = args.provider
+    # Resume uploads queued before a restart
+    from upload_queue import get_upload_queue
+    get_upload_queue()
+    if config.ARCHIVE:
+        from archive import get_archiver
+        get_archiver()
+    metrics.start_server()
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#session_store.py - Bounded memory for interview sessions: compact messages and spill-to-disk
+#
+# Messages are stored as one role code per message plus a list of contents instead of one dict per
+# message, and texts that every session contains (the system prompt, the initial "Hi", closing
+# messages) are kept once per process. Sessions idle for config.SESSION_SPILL_AFTER seconds (e.g.
+# abandoned browser tabs) are written to SESSIONS_DIRECTORY and dropped from memory; the next
+# access to their messages reloads them transparently (see InterviewSession in engine.py).
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import weakref
+from collections.abc import MutableSequence
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ROLES = ("system", "user", "assistant")
+_ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+_shared_texts = {}
+
+
+def shared_text(text):
+    """The process-wide copy of a text that every session contains (e.g. the system prompt)."""
+    if not _shared_texts:
+        for shared in (config.SYSTEM_PROMPT, "Hi", *config.CLOSING_MESSAGES.values()):
+            _shared_texts[shared] = shared
+    return _shared_texts.get(text, text)
+
+
+class MessageList(MutableSequence):
+    """A list of {"role", "content"} messages in compact form.
+
+    Items are returned as new dicts, so changing a returned dict does not change the list.
+    """
+
+    __slots__ = ("_roles", "_contents")
+
+    def __init__(self, messages=()):
+        self._roles = bytearray()
+        self._contents = []
+        self.extend(messages)
+
+    def __len__(self):
+        return len(self._roles)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [{"role": ROLES[r], "content": c} for r, c in zip(self._roles[index], self._contents[index])]
+        return {"role": ROLES[self._roles[index]], "content": self._contents[index]}
+
+    def __iter__(self):
+        for role, content in zip(self._roles, self._contents):
+            yield {"role": ROLES[role], "content": content}
+
+    def __setitem__(self, index, message):
+        if isinstance(index, slice):
+            raise TypeError("MessageList does not support slice assignment")
+        self._roles[index] = _ROLE_CODES[message["role"]]
+        self._contents[index] = shared_text(message["content"])
+
+    def __delitem__(self, index):
+        del self._roles[index]
+        del self._contents[index]
+
+    def insert(self, index, message):
+        self._roles.insert(index, _ROLE_CODES[message["role"]])
+        self._contents.insert(index, shared_text(message["content"]))
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, MessageList)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"MessageList({list(self)!r})"
+
+    def nbytes(self):
+        """Approximate memory held by the list (shared texts are not counted)."""
+        size = sys.getsizeof(self._roles) + sys.getsizeof(self._contents)
+        return size + sum(sys.getsizeof(c) for c in self._contents if _shared_texts.get(c) is not c)
+
+
+def spill_path(session_id):
+    return os.path.join(config.SESSIONS_DIRECTORY, f"{session_id}.json")
+
+
+def write_spill(path, messages, turn_usage):
+    """Write a session's messages and usage atomically (the system prompt is not written)."""
+    record = {
+        "messages": [[m["role"], None if m["content"] == config.SYSTEM_PROMPT else m["content"]] for m in messages],
+        "turn_usage": turn_usage,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def read_spill(path):
+    """Return (messages, turn usage) of a spilled session and remove the file."""
+    with open(path, "r", encoding="utf-8") as f:
+        record = json.load(f)
+    messages = MessageList(
+        {"role": role, "content": config.SYSTEM_PROMPT if content is None else content}
+        for role, content in record["messages"]
+    )
+    os.remove(path)
+    return messages, record["turn_usage"]
+
+
+def discard_spill(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class SessionStore:
+    """Tracks the sessions of a process and spills the idle ones in a background thread."""
+
+    def __init__(self, spill_after=None, check_interval=None):
+        self.spill_after = config.SESSION_SPILL_AFTER if spill_after is None else spill_after
+        self.check_interval = config.SESSION_SPILL_CHECK_INTERVAL if check_interval is None else check_interval
+        # Weak references: a session whose browser tab is gone is freed as usual
+        self.sessions = weakref.WeakValueDictionary()
+        self.lock = threading.Lock()
+        self.thread = None
+        # Called as sweeper(now) with each sweep (e.g. InterviewEngine.evict), held weakly
+        self.sweepers = []
+
+    def _start(self):
+        # Callers hold self.lock
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="session-spill", daemon=True)
+            self.thread.start()
+
+    def track(self, session):
+        with self.lock:
+            self.sessions[session.session_id] = session
+            if self.spill_after is not None:
+                self._start()
+        # Remove the spill file once the session itself is gone
+        weakref.finalize(session, discard_spill, session.spill_path)
+
+    def add_sweeper(self, method):
+        """Run a bound method with every sweep, for as long as its object exists."""
+        with self.lock:
+            self.sweepers.append(weakref.WeakMethod(method))
+            self._start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.check_interval)
+            self.sweep()
+
+    def sweep(self, now=None):
+        """Run the sweepers and spill the sessions idle for longer than `spill_after`; returns how many were spilled."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.sweepers = [ref for ref in self.sweepers if ref() is not None]
+            sweepers = [ref() for ref in self.sweepers]
+        for sweeper in sweepers:
+            if sweeper is not None:
+                try:
+                    sweeper(now)
+                except Exception as e:
+                    logger.warning("Session sweep failed: %s", e)
+        if self.spill_after is None:
+            return 0
+        with self.lock:
+            sessions = list(self.sessions.values())
+        spilled = 0
+        for session in sessions:
+            if not session.spilled and now - session.last_access >= self.spill_after:
+                try:
+                    spilled += session.spill()
+                except OSError as e:
+                    logger.warning("Could not spill session %s: %s", session.username, e)
+        return spilled
+
+    def stats(self):
+        with self.lock:
+            sessions = list(self.sessions.values())
+        resident = [s for s in sessions if not s.spilled]
+        memory = sum(s.memory_bytes() for s in resident)
+        return {
+            "resident": len(resident),
+            "spilled": len(sessions) - len(resident),
+            "memory_bytes": memory,
+            "memory_bytes_per_session": memory / len(resident) if resident else 0,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """The process-wide session store (registers its gauges on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore()
+            metrics.register_gauge("interview_sessions_resident", "Interview sessions held in memory.",
+                                   lambda: _store.stats()["resident"])
+            metrics.register_gauge("interview_sessions_spilled", "Idle interview sessions moved to disk.",
+                                   lambda: _store.stats()["spilled"])
+            metrics.register_gauge("interview_session_memory_bytes", "Estimated memory of the messages and usage of an in-memory session (mean).",
+                                   lambda: _store.stats()["memory_bytes_per_session"])
+        return _store
@@ -0,0 +1,161 @@
+#streaming.py - Helpers for processing streamed model replies
+
+import time
+from collections import deque
+from functools import lru_cache
+
+import config
+
+
+class ClosingCodeAutomaton:
+    """Aho-Corasick automaton over the closing codes, built once and shared by all streams."""
+
+    def __init__(self, codes):
+        self.codes = tuple(code for code in codes if code)
+        # Trie: per state a dict of transitions, its depth and the code ending there (if any)
+        self.goto = [{}]
+        self.depth = [0]
+        self.output = [None]
+        for code in self.codes:
+            state = 0
+            for char in code:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.depth.append(self.depth[state] + 1)
+                    self.output.append(None)
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            if self.output[state] is None:
+                self.output[state] = code
+
+        # Failure links (breadth-first), inheriting outputs of shorter codes
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                if self.output[next_state] is None:
+                    self.output[next_state] = self.output[self.fail[next_state]]
+
+    def step(self, state, char):
+        """Advance the automaton by one character."""
+        while state and char not in self.goto[state]:
+            state = self.fail[state]
+        return self.goto[state].get(char, 0)
+
+    def matcher(self):
+        return ClosingCodeMatcher(self)
+
+
+@lru_cache(maxsize=8)
+def _cached_automaton(codes):
+    return ClosingCodeAutomaton(codes)
+
+
+def closing_code_automaton(codes):
+    """Return the (process-wide cached) automaton for an iterable of closing codes."""
+    return _cached_automaton(tuple(codes))
+
+
+def stored_closing_code(text):
+    """The closing code behind an interviewer turn as stored in a transcript or journal, or None.
+
+    The engine stores config.CLOSING_MESSAGES[code] in place of the reply that contained the code,
+    so the message is matched first; a raw code (e.g. a replayed model reply) still counts.
+    """
+    text = text.strip()
+    for code, message in config.CLOSING_MESSAGES.items():
+        if text == message.strip():
+            return code
+    return next((code for code in config.CLOSING_MESSAGES if code and code in text), None)
+
+
+class ClosingCodeMatcher:
+    """Streaming matcher that consumes only new deltas.
+
+    `feed` returns the text that is safe to display: any trailing characters that could still
+    be the start of a closing code are held back until they are ruled out, so a code never
+    flashes on screen. Once a code is found, `matched` holds it and further input is ignored.
+    """
+
+    def __init__(self, automaton):
+        self.automaton = automaton
+        self.state = 0
+        self.pending = ""
+        self.matched = None
+
+    def feed(self, delta):
+        if self.matched is not None or not delta:
+            return ""
+        automaton = self.automaton
+        state = self.state
+        for char in delta:
+            state = automaton.step(state, char)
+            if automaton.output[state] is not None:
+                self.matched = automaton.output[state]
+                self.state = state
+                self.pending = ""
+                return ""
+        self.state = state
+        text = self.pending + delta
+        held = automaton.depth[state]
+        self.pending = text[len(text) - held:] if held else ""
+        return text[:len(text) - held]
+
+    def flush(self):
+        """Release held-back text at the end of a stream without a closing code."""
+        if self.matched is not None:
+            return ""
+        text, self.pending = self.pending, ""
+        return text
+
+
+class RenderScheduler:
+    """Coalesces streamed deltas into a limited number of frames.
+
+    Every frame re-sends the whole reply over the Streamlit websocket, so instead of rendering
+    on every delta, `update` only calls `render` once `interval_ms` have passed since the last
+    frame or `max_chars` new characters are waiting. The first text is rendered immediately.
+    """
+
+    def __init__(self, render, interval_ms=None, max_chars=None, clock=time.monotonic):
+        self.render = render
+        self.interval = (config.RENDER_INTERVAL_MS if interval_ms is None else interval_ms) / 1000
+        self.max_chars = config.RENDER_MAX_PENDING_CHARS if max_chars is None else max_chars
+        self.clock = clock
+        self.last_frame = None
+        self.rendered_chars = 0
+        self.deltas = 0
+        self.frames = 0
+        self.render_seconds = 0.0
+
+    def update(self, text):
+        """Register one delta; `text` is everything displayable so far."""
+        self.deltas += 1
+        pending = len(text) - self.rendered_chars
+        if pending <= 0:
+            return
+        now = self.clock()
+        if self.last_frame is None or pending >= self.max_chars or now - self.last_frame >= self.interval:
+            self._frame(text, now)
+
+    def flush(self, text):
+        """Render `text` if it has not been rendered yet (e.g. at the end of a stream)."""
+        if len(text) != self.rendered_chars:
+            self._frame(text, self.clock())
+
+    def _frame(self, text, now):
+        started = time.perf_counter()
+        self.render(text)
+        self.render_seconds += time.perf_counter() - started
+        self.last_frame = now
+        self.rendered_chars = len(text)
+        self.frames += 1
+
+    def stats(self):
+        return {"deltas": self.deltas, "frames": self.frames, "render_seconds": self.render_seconds}
@@ -0,0 +1,64 @@
+#conftest.py - Shared fixtures: the fake model API of the benchmarks and interviews run by the engine
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import config  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def fake_api():
+    """benchmarks/fake_llm.py, replying with the closing code after the first respondent message."""
+    pytest.importorskip("tornado")
+    from fake_llm import spawn
+    process, port = spawn("--ttft", 0, "--tokens-per-second", 2000, "--tokens", 20, "--close-after", 1)
+    yield port
+    process.terminate()
+    process.wait()
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch, fake_api):
+    """Point all data paths of config.py into a temporary directory and the SDKs at the fake API."""
+    from fake_llm import base_urls
+    for name, path in [("TRANSCRIPTS_DIRECTORY", "transcripts"), ("BACKUPS_DIRECTORY", "backups"),
+                       ("SESSIONS_DIRECTORY", "sessions"), ("OPENING_POOL_DIRECTORY", "openings"),
+                       ("UPLOAD_QUEUE_DB", "upload_queue.sqlite3"), ("RATE_LIMIT_DB", "rate_limit.sqlite3"),
+                       ("REGISTRY_DB", "registry.sqlite3"), ("REPLAY_CACHE_DB", "replay_cache.sqlite3")]:
+        monkeypatch.setattr(config, name, str(tmp_path / path))
+    monkeypatch.setattr(config, "OPENING_POOL_SIZE", 0)
+    monkeypatch.setattr(config, "RATE_LIMIT_REQUESTS_PER_MINUTE", None)
+    monkeypatch.setattr(config, "RATE_LIMIT_TOKENS_PER_MINUTE", None)
+    monkeypatch.setattr(config, "METRICS_LOG", None)
+    monkeypatch.setattr(config, "ARCHIVE", False)
+    for name, url in base_urls(fake_api).items():
+        monkeypatch.setenv(name, url)
+    os.makedirs(config.TRANSCRIPTS_DIRECTORY)
+    os.makedirs(config.BACKUPS_DIRECTORY)
+    # Fresh process-wide registry, rate limiters and upload queue (nothing is uploaded)
+    import rate_limit
+    import registry
+    import upload_queue
+    monkeypatch.setattr(registry, "_registry", None)
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    monkeypatch.setattr(upload_queue, "_queue", upload_queue.UploadQueue(config.UPLOAD_QUEUE_DB, None, workers=0))
+    return tmp_path
+
+
+@pytest.fixture
+def engine_transcript(data_dir):
+    """Path of the transcript of an interview run to its closing code by InterviewEngine."""
+    from engine import InterviewEngine
+    engine = InterviewEngine("openai", "sk-test")
+    session = engine.start(response_id="R_test", username="test_user")
+    events = []
+    for message in (None, "I read about it in a blog post."):
+        events += engine.stream_turn(session, message)
+    assert not session.active, events
+    return session.transcript_path
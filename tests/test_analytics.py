@@ -0,0 +1,12 @@
+#test_analytics.py - Parsing of transcripts written by the engine
+
+import config
+from analytics import parse_transcript
+from journal import read_transcript
+
+
+def test_closing_code_of_engine_transcript(engine_transcript):
+    _, messages = read_transcript(engine_transcript)
+    # The engine stores the closing message, not the code the model replied with
+    assert messages[-1]["content"] == config.CLOSING_MESSAGES["x7y8"]
+    assert parse_transcript(engine_transcript)["closing_code"] == "x7y8"
@@ -0,0 +1,15 @@
+#test_replay.py - Replaying interviews recorded by the engine
+
+import config
+from replay import Configuration, ReplayRunner, ReplyCache, load_cases, report
+
+
+def test_report_matches_recorded_closing_codes(engine_transcript):
+    cases = load_cases(config.TRANSCRIPTS_DIRECTORY)
+    assert cases[-1]["recorded"] == config.CLOSING_MESSAGES["x7y8"]
+
+    # The fake API closes after the first respondent message, as it did in the recorded interview
+    configuration = Configuration("gpt-4o-mini / config.py", "openai", "gpt-4o-mini", config.SYSTEM_PROMPT)
+    results = ReplayRunner("sk-test", ReplyCache(config.REPLAY_CACHE_DB)).run(configuration, cases)
+    assert all(result["reply"] is not None for result in results)
+    assert report(configuration, results)[-1] == "  closing code: 1 replies (1 where recorded, 0 early, 0 missed)"
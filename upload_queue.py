@@ -0,0 +1,288 @@
+#upload_queue.py - Durable background queue for Google Drive uploads
+#
+# Interviews only enqueue a finished transcript; a small pool of worker threads uploads it.
+# Jobs live in a local SQLite database, so pending uploads survive crashes and restarts and
+# several app processes can drain the same queue.
+
+import argparse
+import hashlib
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_queue = None
+_queue_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    upload_key TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    mimetype TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    lease_until REAL,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    file_id TEXT,
+    last_error TEXT,
+    checksum TEXT
+);
+CREATE INDEX IF NOT EXISTS uploads_due ON uploads (status, next_attempt);
+"""
+
+
+def upload_key_for(name):
+    """Idempotency key for an upload; retries of the same file name map to the same key."""
+    return hashlib.sha256(name.encode("utf-8")).hexdigest()[:32]
+
+
+class ChecksumMismatch(Exception):
+    """A queued file no longer matches the checksum it was enqueued with."""
+
+
+def file_checksum(path):
+    with open(path, "rb") as f:
+        return hashlib.md5(f.read(), usedforsecurity=False).hexdigest()
+
+
+class UploadQueue:
+    """SQLite-backed upload queue drained by a pool of worker threads.
+
+    `upload` is called as upload(path, name, mimetype, upload_key) and must return the remote
+    file ID. It should use `upload_key` to detect an earlier attempt that reached the server,
+    so a retry after a lost response does not create a duplicate.
+    """
+
+    def __init__(self, db_path, upload, workers=None, max_attempts=None):
+        self.db_path = db_path
+        self.upload = upload
+        self.workers = config.UPLOAD_WORKERS if workers is None else workers
+        self.max_attempts = config.UPLOAD_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.threads = []
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            columns = [row[1] for row in db.execute("PRAGMA table_info(uploads)")]
+            if "checksum" not in columns:
+                # Queues created before checksums were recorded
+                db.execute("ALTER TABLE uploads ADD COLUMN checksum TEXT")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation: sqlite3 connections are not shared across threads
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        if self.threads:
+            return self
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"drive-upload-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def enqueue(self, path, name=None, mimetype="text/plain", checksum=None):
+        """Add a file to the queue; enqueuing the same name twice is a no-op. Returns the key.
+
+        With the MD5 `checksum` of the file as written, a file that changed or was damaged on
+        disk before its upload is reported instead of uploaded.
+        """
+        name = name or os.path.basename(path)
+        key = upload_key_for(name)
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR IGNORE INTO uploads (upload_key, path, name, mimetype, next_attempt, enqueued_at, checksum) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, os.path.abspath(path), name, mimetype, now, now, checksum),
+            )
+        self.wakeup.set()
+        return key
+
+    def _claim(self):
+        """Atomically take the next due job (also across processes), or return None."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            # Jobs whose worker died mid-upload become due again once their lease expires
+            db.execute(
+                "UPDATE uploads SET status = 'pending' WHERE status = 'in_progress' AND lease_until < ?", (now,)
+            )
+            row = db.execute(
+                "SELECT id, path, name, mimetype, upload_key, attempts, checksum FROM uploads "
+                "WHERE status = 'pending' AND next_attempt <= ? ORDER BY next_attempt, id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is not None:
+                db.execute(
+                    "UPDATE uploads SET status = 'in_progress', lease_until = ?, started_at = ? WHERE id = ?",
+                    (now + config.UPLOAD_LEASE_SECONDS, now, row[0]),
+                )
+            db.execute("COMMIT")
+            return row
+
+    def _backoff(self, attempts):
+        delay = min(config.UPLOAD_BACKOFF_BASE * 2 ** (attempts - 1), config.UPLOAD_BACKOFF_MAX)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _work(self):
+        while not self.stopping.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                logger.warning("Upload queue unavailable: %s", e)
+                job = None
+            if job is None:
+                self.wakeup.wait(config.UPLOAD_POLL_INTERVAL)
+                self.wakeup.clear()
+                continue
+            self._run(*job)
+
+    def _run(self, job_id, path, name, mimetype, upload_key, attempts, checksum):
+        attempts += 1
+        started = time.perf_counter()
+        try:
+            if checksum is not None and file_checksum(path) != checksum:
+                raise ChecksumMismatch(f"{path} does not match the checksum it was written with")
+            file_id = self.upload(path, name, mimetype, upload_key)
+        except Exception as e:
+            metrics.inc("interview_uploads_total", outcome="error")
+            if isinstance(e, ChecksumMismatch):
+                # Retrying cannot make the file match again, so don't spend the backoff on it
+                status, next_attempt = "failed", time.time()
+                logger.error("Not uploading %s, it changed on disk after it was queued: %s", name, e)
+            elif attempts >= self.max_attempts:
+                status, next_attempt = "failed", time.time()
+                logger.error("Giving up on upload of %s after %d attempts: %s", name, attempts, e)
+            else:
+                status, next_attempt = "pending", time.time() + self._backoff(attempts)
+                logger.warning("Upload of %s failed (attempt %d), retrying: %s", name, attempts, e)
+            with self._connect() as db:
+                db.execute(
+                    "UPDATE uploads SET status = ?, attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                    (status, attempts, next_attempt, str(e), job_id),
+                )
+            return
+        metrics.observe("interview_upload_seconds", time.perf_counter() - started)
+        metrics.inc("interview_uploads_total", outcome="ok")
+        with self._connect() as db:
+            db.execute(
+                "UPDATE uploads SET status = 'done', attempts = ?, finished_at = ?, file_id = ?, last_error = NULL "
+                "WHERE id = ?",
+                (attempts, time.time(), file_id, job_id),
+            )
+
+    def job(self, upload_key):
+        """(status, Drive file ID) of the upload with this key, or None if it was never enqueued."""
+        with self._connect() as db:
+            return db.execute("SELECT status, file_id FROM uploads WHERE upload_key = ?", (upload_key,)).fetchone()
+
+    def retry_failed(self):
+        """Put permanently failed jobs back into the queue; returns their upload keys."""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            keys = [row[0] for row in db.execute("SELECT upload_key FROM uploads WHERE status = 'failed'")]
+            db.execute(
+                "UPDATE uploads SET status = 'pending', attempts = 0, next_attempt = ? WHERE status = 'failed'",
+                (time.time(),),
+            )
+            db.execute("COMMIT")
+        self.wakeup.set()
+        return keys
+
+    def failed(self):
+        """(name, last error) of each permanently failed upload."""
+        with self._connect() as db:
+            return db.execute("SELECT name, last_error FROM uploads WHERE status = 'failed' ORDER BY id").fetchall()
+
+    def stats(self, recent=100):
+        """Queue depth per status and latency of the most recent completed uploads (seconds)."""
+        with self._connect() as db:
+            counts = dict(db.execute("SELECT status, COUNT(*) FROM uploads GROUP BY status").fetchall())
+            rows = db.execute(
+                "SELECT finished_at - enqueued_at, finished_at - started_at FROM uploads "
+                "WHERE status = 'done' ORDER BY finished_at DESC LIMIT ?",
+                (recent,),
+            ).fetchall()
+        stats = {
+            "depth": counts.get("pending", 0) + counts.get("in_progress", 0),
+            "pending": counts.get("pending", 0),
+            "in_progress": counts.get("in_progress", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+        }
+        for label, column in (("latency", 0), ("upload_time", 1)):
+            values = sorted(row[column] for row in rows)
+            if values:
+                stats[f"{label}_p50"] = values[len(values) // 2]
+                stats[f"{label}_max"] = values[-1]
+        return stats
+
+
+def _upload_to_drive(path, name, mimetype, upload_key):
+    from drive import upload_with_cached_service
+    return upload_with_cached_service(path, name, mimetype, upload_key=upload_key)
+
+
+def get_upload_queue():
+    """Return the process-wide Drive upload queue, starting its workers on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = UploadQueue(config.UPLOAD_QUEUE_DB, _upload_to_drive).start()
+            metrics.register_gauge(
+                "interview_upload_queue_depth", "Uploads waiting or in progress.", lambda: _queue.stats()["depth"]
+            )
+        return _queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the Google Drive upload queue and retry failed uploads.")
+    parser.add_argument("--retry-failed", action="store_true", help="upload the permanently failed files again")
+    args = parser.parse_args()
+
+    if args.retry_failed:
+        queue = get_upload_queue()
+        keys = queue.retry_failed()
+        print(f"Retrying {len(keys)} failed uploads")
+        # Upload here rather than waiting for an app process
+        while any(queue.job(key)[0] in ("pending", "in_progress") for key in keys):
+            time.sleep(1)
+    else:
+        # Only reading the queue: no worker threads
+        queue = UploadQueue(config.UPLOAD_QUEUE_DB, _upload_to_drive)
+    print("\n".join(f"{key}: {value}" for key, value in queue.stats().items()))
+    for name, error in queue.failed():
+        print(f"failed: {name}: {error}")
+
+
+if __name__ == "__main__":
+    main()